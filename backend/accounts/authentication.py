@@ -0,0 +1,108 @@
+"""
+JWT authentication with process-local caches.
+
+Verifying a token signature and loading the user row are the bulk of the work
+for small endpoints. ``CachedJWTAuthentication`` keeps:
+
+- a bounded LRU of verified tokens keyed by the SHA-256 of the raw token; an
+  entry is only served until the token's ``exp``
+- a short-TTL cache of users, dropped on every ``User.save``
+
+Both caches count hits and misses; see ``cache_stats``.
+"""
+
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+
+class _LRUCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._data),
+        }
+
+
+_tokens = _LRUCache(settings.JWT_TOKEN_CACHE_SIZE)
+_users = _LRUCache(settings.JWT_USER_CACHE_SIZE)
+
+
+def invalidate_user(user_id):
+    _users.delete(user_id)
+
+
+def cache_stats():
+    return {"tokens": _tokens.stats(), "users": _users.stats()}
+
+
+def clear_caches():
+    _tokens.clear()
+    _users.clear()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """Drop-in ``JWTAuthentication`` backed by the token and user caches."""
+
+    def get_validated_token(self, raw_token):
+        key = hashlib.sha256(raw_token).digest()
+        validated_token = _tokens.get(key, time.time())
+        if validated_token is None:
+            validated_token = super().get_validated_token(raw_token)
+            _tokens.set(key, validated_token, validated_token["exp"])
+        return validated_token
+
+    def get_user(self, validated_token):
+        now = time.monotonic()
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = _users.get(user_id, now) if user_id is not None else None
+        if user is None:
+            user = super().get_user(validated_token)
+            _users.set(user.pk, user, now + settings.JWT_USER_CACHE_TTL)
+        # Views may modify request.user; never hand out the cached instance.
+        return copy.copy(user)
@@ -0,0 +1,164 @@
+"""
+Outbound mail queue.
+
+Request handlers call ``enqueue_mail`` instead of ``send_mail`` so a slow SMTP
+server never shows up in request latency. The ``send_queued_mail`` management
+command drains the queue: each batch goes out over one SMTP connection,
+failed messages are retried with exponential backoff, and a circuit breaker
+stops hammering a server that keeps refusing connections.
+
+Bodies can carry credentials (an invite includes a temporary password), so
+a message's body is blanked once it is sent or has run out of attempts.
+"""
+
+import logging
+import smtplib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the connection itself is unusable (as opposed to a single
+# message being rejected).
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError)
+
+
+def enqueue_mail(subject, message, recipient_list, from_email=None):
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+    )
+
+
+class CircuitBreaker:
+    """Opens after ``threshold`` consecutive connection failures.
+
+    While open, ``allow()`` is false until ``reset_timeout`` seconds have
+    passed; then a single attempt is let through (half-open) and its outcome
+    closes or re-opens the circuit.
+    """
+
+    def __init__(self, threshold=None, reset_timeout=None, clock=time.monotonic):
+        self.threshold = threshold or settings.MAIL_QUEUE_BREAKER_THRESHOLD
+        self.reset_timeout = reset_timeout or settings.MAIL_QUEUE_BREAKER_RESET
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        return self.clock() - self.opened_at >= self.reset_timeout
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = self.clock()
+
+
+def _backoff(attempts):
+    delay = settings.MAIL_QUEUE_BACKOFF_SECONDS * (2 ** (attempts - 1))
+    return timedelta(seconds=min(delay, settings.MAIL_QUEUE_BACKOFF_MAX_SECONDS))
+
+
+def _claim_batch(batch_size):
+    """Lease up to ``batch_size`` due messages to this worker."""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status="queued", next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        if batch:
+            # Another worker (or this one after a crash) picks the rows up
+            # again once the lease runs out.
+            lease_until = now + timedelta(seconds=settings.MAIL_QUEUE_LEASE_SECONDS)
+            OutboundEmail.objects.filter(id__in=[m.id for m in batch]).update(
+                next_attempt_at=lease_until
+            )
+    return batch
+
+
+def _record_failure(outbound, error):
+    outbound.attempts += 1
+    outbound.last_error = str(error)[:2000]
+    if outbound.attempts >= settings.MAIL_QUEUE_MAX_ATTEMPTS:
+        outbound.status = "failed"
+        outbound.body = ""
+    else:
+        outbound.next_attempt_at = timezone.now() + _backoff(outbound.attempts)
+    outbound.save(
+        update_fields=["attempts", "last_error", "status", "next_attempt_at", "body"]
+    )
+
+
+def send_queued_mail(batch_size=None, breaker=None, connection=None):
+    """Deliver one batch of due messages. Returns ``(sent, failed)`` counts."""
+    breaker = breaker or CircuitBreaker()
+    if not breaker.allow():
+        return 0, 0
+    batch = _claim_batch(batch_size or settings.MAIL_QUEUE_BATCH_SIZE)
+    if not batch:
+        return 0, 0
+
+    connection = connection or get_connection(fail_silently=False)
+    sent = failed = 0
+    try:
+        connection.open()
+    except CONNECTION_ERRORS as exc:
+        logger.warning("Mail queue: could not connect to mail server: %s", exc)
+        breaker.record_failure()
+        for outbound in batch:
+            _record_failure(outbound, exc)
+        return 0, len(batch)
+
+    try:
+        for index, outbound in enumerate(batch):
+            message = EmailMessage(
+                subject=outbound.subject,
+                body=outbound.body,
+                from_email=outbound.from_email,
+                to=outbound.recipients,
+                connection=connection,
+            )
+            try:
+                connection.send_messages([message])
+            except CONNECTION_ERRORS as exc:
+                logger.warning("Mail queue: connection lost: %s", exc)
+                breaker.record_failure()
+                for pending in batch[index:]:
+                    _record_failure(pending, exc)
+                failed += len(batch) - index
+                break
+            except smtplib.SMTPException as exc:
+                _record_failure(outbound, exc)
+                failed += 1
+                continue
+            outbound.status = "sent"
+            outbound.sent_at = timezone.now()
+            outbound.body = ""
+            outbound.save(update_fields=["status", "sent_at", "body"])
+            sent += 1
+        else:
+            breaker.record_success()
+    finally:
+        connection.close()
+    return sent, failed
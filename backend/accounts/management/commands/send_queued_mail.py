@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.mail import CircuitBreaker, send_queued_mail
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbound email (once, or continuously with --loop)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None, help="Messages per SMTP connection")
+        parser.add_argument("--loop", action="store_true", help="Keep polling the queue")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds to sleep when idle (with --loop)")
+
+    def handle(self, *args, **options):
+        breaker = CircuitBreaker()
+        while True:
+            sent, failed = send_queued_mail(batch_size=options["batch_size"], breaker=breaker)
+            if sent or failed:
+                self.stdout.write(f"Sent {sent}, failed {failed}")
+            if not options["loop"]:
+                break
+            if breaker.is_open:
+                self.stderr.write(self.style.WARNING("Mail server unavailable; circuit open"))
+            if not (sent or failed) or breaker.is_open:
+                time.sleep(options["interval"])
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.13 on 2026-10-18 04:25
+
+from django.db import migrations
+
+
+def blank_bodies(apps, schema_editor):
+    OutboundEmail = apps.get_model("accounts", "OutboundEmail")
+    OutboundEmail.objects.filter(status__in=["sent", "failed"]).update(body="")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_outboundemail'),
+    ]
+
+    operations = [
+        migrations.RunPython(blank_bodies, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,12 @@
 from django.contrib.auth import authenticate
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
 from .models import User
+from .tokens import CoupleRefreshToken, stamp_membership
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -49,3 +55,29 @@ class LoginSerializer(serializers.Serializer):
             raise serializers.ValidationError("Invalid credentials")
         attrs["user"] = user
         return attrs
+
+
+class CoupleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = CoupleRefreshToken
+
+
+class CoupleTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = CoupleRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        # Re-stamp so refreshed access tokens pick up membership changes.
+        stamp_membership(refresh, refresh[api_settings.USER_ID_CLAIM])
+
+        data = {"access": str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    pass
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data["refresh"] = str(refresh)
+        return data
@@ -1,8 +1,14 @@
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 from unittest import mock
-from .models import User
+import smtplib
+from django.core import mail
+from django.test import override_settings
+from .mail import CircuitBreaker, send_queued_mail
+from .authentication import cache_stats, clear_caches
+from .models import OutboundEmail, User
 from planner.models import CoupleMember, CoupleInvite, Couple
 
 
@@ -93,3 +99,93 @@ class InviteFlowTests(APITestCase):
         self.assertEqual(res_fail.status_code, status.HTTP_400_BAD_REQUEST)
         res_ok = self.client.post(reverse("login"), {"email": user.email, "password": "new-pass"}, format="json")
         self.assertEqual(res_ok.status_code, status.HTTP_200_OK)
+
+
+class CachedAuthenticationTests(APITestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(email="cached@example.com", password="old-pass")
+        # plain token without couple claims, so the user row is actually needed
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(self.user)}"}
+
+    def test_token_and_user_served_from_cache(self):
+        self.client.get("/api/notifications/", **self.auth)
+        with self.assertNumQueries(1):
+            res = self.client.get("/api/notifications/", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        stats = cache_stats()
+        self.assertEqual(stats["tokens"]["hits"], 1)
+        self.assertEqual(stats["tokens"]["misses"], 1)
+        self.assertEqual(stats["users"]["hits"], 1)
+
+    def test_password_change_drops_cached_user(self):
+        self.client.get("/api/notifications/", **self.auth)
+        res = self.client.post(
+            reverse("password-change"),
+            {"old_password": "old-pass", "new_password": "new-pass"},
+            format="json",
+            **self.auth,
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(cache_stats()["users"]["size"], 0)
+        res = self.client.post(
+            reverse("password-change"),
+            {"old_password": "old-pass", "new_password": "other-pass"},
+            format="json",
+            **self.auth,
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MailQueueTests(APITestCase):
+    def _signup(self):
+        payload = {
+            "email": "queue@example.com",
+            "password": "password123",
+            "first_name": "Queue",
+            "role": "bride",
+            "partner_email": "queue-partner@example.com",
+        }
+        res = self.client.post(reverse("signup"), payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_signup_enqueues_invite_and_worker_delivers(self):
+        self._signup()
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.recipients, ["queue-partner@example.com"])
+
+        sent, failed = send_queued_mail()
+        self.assertEqual((sent, failed), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["queue-partner@example.com"])
+        self.assertIn("Temporary password:", mail.outbox[0].body)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, "sent")
+        # The temporary password is not kept once delivered.
+        self.assertEqual(queued.body, "")
+        self.assertEqual(send_queued_mail(), (0, 0))
+
+    def test_connection_failure_backs_off_and_opens_circuit(self):
+        self._signup()
+        connection = mock.Mock()
+        connection.open.side_effect = smtplib.SMTPConnectError(421, "busy")
+        breaker = CircuitBreaker(threshold=1, reset_timeout=60)
+
+        self.assertEqual(send_queued_mail(breaker=breaker, connection=connection), (0, 1))
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.status, "queued")
+        self.assertEqual(queued.attempts, 1)
+        self.assertGreater(queued.next_attempt_at, queued.created_at)
+        self.assertTrue(breaker.is_open)
+        self.assertFalse(breaker.allow())
+
+    @override_settings(MAIL_QUEUE_MAX_ATTEMPTS=1)
+    def test_giving_up_blanks_the_body(self):
+        self._signup()
+        connection = mock.Mock()
+        connection.open.side_effect = smtplib.SMTPConnectError(421, "busy")
+        self.assertEqual(send_queued_mail(connection=connection), (0, 1))
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.status, "failed")
+        self.assertEqual(queued.body, "")
@@ -0,0 +1,32 @@
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from planner.membership import active_membership, membership_version
+
+COUPLE_ID_CLAIM = "couple_id"
+COUPLE_ROLE_CLAIM = "couple_role"
+MEMBERSHIP_VERSION_CLAIM = "mv"
+
+
+def stamp_membership(token, user_id):
+    """Embed the user's active couple, role and membership version in ``token``."""
+    # Read the version first: if the membership changes in between, the token
+    # carries the older version and is simply not trusted.
+    version = membership_version(user_id)
+    couple_id, role = active_membership(user_id)
+    token[COUPLE_ID_CLAIM] = couple_id
+    token[COUPLE_ROLE_CLAIM] = role
+    token[MEMBERSHIP_VERSION_CLAIM] = version
+    return token
+
+
+class CoupleRefreshToken(RefreshToken):
+    """
+    Refresh token carrying couple membership claims. Access tokens derived from
+    it copy the claims, letting ``CoupleJWTAuthentication`` authorize planner
+    requests without touching the database.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        return stamp_membership(token, user.pk)
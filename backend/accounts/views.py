@@ -6,12 +6,13 @@ from rest_framework import permissions, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenRefreshView
-from django.core.mail import send_mail
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from .authentication import CachedJWTAuthentication
+from .mail import enqueue_mail
 from .serializers import SignupSerializer, LoginSerializer, UserSerializer
+from .tokens import CoupleRefreshToken
 from .models import User
+from planner.membership import membership_changed
 from planner.models import Couple, CoupleMember, CoupleInvite
 
 
@@ -32,7 +33,8 @@ def _set_refresh_cookie(response: Response, refresh_token: str):
 
 
 def _activate_invites_for_user(user: User):
-    CoupleMember.objects.filter(user=user, status="invited").update(status="active")
+    if CoupleMember.objects.filter(user=user, status="invited").update(status="active"):
+        membership_changed(user.id)
     CoupleInvite.objects.filter(email=user.email, status="pending").update(status="accepted")
 
 
@@ -112,15 +114,13 @@ class SignupView(APIView):
                     body_lines.append(
                         "Log in with your existing account to start planning together."
                     )
-                send_mail(
+                enqueue_mail(
                     subject="You've been invited to plan on Muse",
                     message="\n".join(body_lines),
-                    from_email=settings.DEFAULT_FROM_EMAIL,
                     recipient_list=[partner_email],
-                    fail_silently=True,
                 )
 
-        refresh = RefreshToken.for_user(user)
+        refresh = CoupleRefreshToken.for_user(user)
         data = {
             "user": UserSerializer(user).data,
             "access": str(refresh.access_token),
@@ -141,7 +141,7 @@ class LoginView(APIView):
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data["user"]
         _activate_invites_for_user(user)
-        refresh = RefreshToken.for_user(user)
+        refresh = CoupleRefreshToken.for_user(user)
         data = {
             "user": UserSerializer(user).data,
             "access": str(refresh.access_token),
@@ -185,7 +185,7 @@ class LogoutView(APIView):
 
 
 class ChangePasswordView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
@@ -196,7 +196,8 @@ class ChangePasswordView(APIView):
                 {"data": None, "error": "old_password and new_password are required"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        user = request.user
+        # request.user may come from the auth cache; check against the stored hash.
+        user = User.objects.get(pk=request.user.pk)
         if not user.check_password(old_password):
             return Response(
                 {"data": None, "error": "Invalid current password"},
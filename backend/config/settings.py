@@ -5,6 +5,7 @@ Environment-driven configuration:
 - SECRET_KEY (required in production)
 - DEBUG (default False)
 - DATABASE_URL (defaults to local sqlite)
+- CACHE_URL (defaults to per-process local memory)
 - ALLOWED_HOSTS (comma-separated)
 - CORS_ALLOWED_ORIGINS / CSRF_TRUSTED_ORIGINS
 - FRONTEND_URL (optional reference)
@@ -12,7 +13,9 @@ Environment-driven configuration:
 
 from datetime import timedelta
 from pathlib import Path
+from urllib.parse import urlsplit
 import environ
+from django.core.exceptions import ImproperlyConfigured
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 env = environ.Env(DEBUG=(bool, False))
@@ -72,6 +75,10 @@ DATABASES = {
     'default': env.db(default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}")
 }
 
+CACHES = {
+    'default': env.cache("CACHE_URL", default="locmemcache://")
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -88,13 +95,106 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Media storage (planner.storage): "local" (MEDIA_ROOT) or "s3" (any
+# S3-compatible service through django-storages, e.g. MinIO in development)
+MEDIA_STORAGE_BACKEND = env("MEDIA_STORAGE_BACKEND", default="local")
+if MEDIA_STORAGE_BACKEND == "s3":
+    _MEDIA_STORAGE = {
+        "BACKEND": "storages.backends.s3.S3Storage",
+        "OPTIONS": {
+            "bucket_name": env("MEDIA_S3_BUCKET", default="muse-media"),
+            "endpoint_url": env("MEDIA_S3_ENDPOINT_URL", default=None),
+            "access_key": env("MEDIA_S3_ACCESS_KEY", default=None),
+            "secret_key": env("MEDIA_S3_SECRET_KEY", default=None),
+            "region_name": env("MEDIA_S3_REGION", default=None),
+            # Presigned by S3 unless a CDN base / our own signing is configured
+            "querystring_auth": env.bool("MEDIA_S3_QUERYSTRING_AUTH", default=True),
+            # Like the filesystem: a save never replaces a file media_gc may be
+            # about to delete (planner.media)
+            "file_overwrite": False,
+        },
+    }
+else:
+    _MEDIA_STORAGE = {"BACKEND": "django.core.files.storage.FileSystemStorage"}
+STORAGES = {
+    "default": _MEDIA_STORAGE,
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+# Media URLs are built per response from the storage key: MEDIA_CDN_BASE_URL
+# + key (else the storage's URL), HMAC-signed when MEDIA_URL_SIGNING_KEY is set
+# and valid for MEDIA_URL_TTL to 2 * MEDIA_URL_TTL seconds. Signed URLs go to
+# /api/media/signed/, which verifies them; a CDN base must use it as origin
+MEDIA_CDN_BASE_URL = env("MEDIA_CDN_BASE_URL", default="")
+# Origin this backend is reached at; URLs that would otherwise be bare paths
+# (the signed route, the storage's MEDIA_URL) are made absolute with it, since
+# the frontend runs on another origin
+MEDIA_PUBLIC_ORIGIN = env("MEDIA_PUBLIC_ORIGIN", default="http://127.0.0.1:4000")
+MEDIA_URL_SIGNING_KEY = env("MEDIA_URL_SIGNING_KEY", default="")
+MEDIA_URL_TTL = env.int("MEDIA_URL_TTL", default=6 * 3600)
+if MEDIA_URL_SIGNING_KEY and MEDIA_CDN_BASE_URL and (
+    urlsplit(MEDIA_CDN_BASE_URL).path.rstrip("/") == MEDIA_URL.rstrip("/")
+):
+    raise ImproperlyConfigured(
+        "MEDIA_CDN_BASE_URL points at MEDIA_URL, which does not check signatures; "
+        "unset it or front /api/media/signed/ with the CDN"
+    )
+
+# Media bytes (planner.serving) leave through "python" (FileResponse with
+# Range support), "nginx" (X-Accel-Redirect to an internal location aliasing
+# MEDIA_ROOT at MEDIA_ACCEL_REDIRECT_PREFIX) or "sendfile" (X-Sendfile)
+MEDIA_SERVE_BACKEND = env("MEDIA_SERVE_BACKEND", default="python")
+MEDIA_ACCEL_REDIRECT_PREFIX = env("MEDIA_ACCEL_REDIRECT_PREFIX", default="/protected-media/")
+MEDIA_CACHE_MAX_AGE = env.int("MEDIA_CACHE_MAX_AGE", default=365 * 24 * 3600)
+
+# Multipart uploads are SHA-256 hashed as they stream in, so planner.media can
+# deduplicate them by content
+FILE_UPLOAD_HANDLERS = [
+    "planner.media.HashingMemoryFileUploadHandler",
+    "planner.media.HashingTemporaryFileUploadHandler",
+]
+
+# Image derivatives (planner.derivatives): target widths, worker processes and
+# whether to render them in the background after upload
+MEDIA_DERIVATIVE_WIDTHS = env.list("MEDIA_DERIVATIVE_WIDTHS", cast=int, default=[320, 640, 1280])
+MEDIA_DERIVATIVE_WORKERS = env.int("MEDIA_DERIVATIVE_WORKERS", default=2)
+MEDIA_DERIVATIVES_ASYNC = env.bool("MEDIA_DERIVATIVES_ASYNC", default=True)
+
+# Media quota per couple in bytes (0 = unlimited), and how long unreferenced
+# media is kept before collect_orphan_media deletes it
+MEDIA_COUPLE_QUOTA_BYTES = env.int("MEDIA_COUPLE_QUOTA_BYTES", default=10 * 1024**3)
+MEDIA_GC_GRACE_SECONDS = env.int("MEDIA_GC_GRACE_SECONDS", default=7 * 24 * 3600)
+
+# Mood board images whose difference hashes differ in at most this many of
+# 64 bits count as near-duplicates (planner.similarity)
+MEDIA_SIMILARITY_THRESHOLD = env.int("MEDIA_SIMILARITY_THRESHOLD", default=10)
+
+# Reactions accepted on mood board items (at most 20 characters each)
+MOODBOARD_REACTION_TYPES = env.list("MOODBOARD_REACTION_TYPES", default=["heart", "like"])
+
+# Gallery feed (planner.gallery): items per page by default and at most
+GALLERY_PAGE_SIZE = env.int("GALLERY_PAGE_SIZE", default=24)
+GALLERY_MAX_PAGE_SIZE = env.int("GALLERY_MAX_PAGE_SIZE", default=100)
+
+# Batch uploads (planner.media.store_media_batch): files per request and the
+# threads writing them to storage
+MEDIA_BATCH_UPLOAD_MAX_FILES = env.int("MEDIA_BATCH_UPLOAD_MAX_FILES", default=50)
+MEDIA_BATCH_UPLOAD_WORKERS = env.int("MEDIA_BATCH_UPLOAD_WORKERS", default=4)
+
+# Resumable uploads (planner.uploads): chunks are appended to files here,
+# outside MEDIA_ROOT, until the upload is finalized
+MEDIA_UPLOAD_TEMP_DIR = env("MEDIA_UPLOAD_TEMP_DIR", default=str(BASE_DIR / "upload_tmp"))
+MEDIA_UPLOAD_MAX_BYTES = env.int("MEDIA_UPLOAD_MAX_BYTES", default=2 * 1024**3)
+MEDIA_UPLOAD_MAX_CHUNK_BYTES = env.int("MEDIA_UPLOAD_MAX_CHUNK_BYTES", default=16 * 1024**2)
+# Idle sessions expire after this many seconds (cleanup_upload_sessions)
+MEDIA_UPLOAD_SESSION_TTL = env.int("MEDIA_UPLOAD_SESSION_TTL", default=24 * 3600)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'accounts.User'
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "planner.authentication.CoupleJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
@@ -115,8 +215,40 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": False,
     "AUTH_HEADER_TYPES": ("Bearer",),
+    "TOKEN_OBTAIN_SERIALIZER": "accounts.serializers.CoupleTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "accounts.serializers.CoupleTokenRefreshSerializer",
 }
 
+# Process-local caches used by accounts.authentication.CachedJWTAuthentication
+JWT_TOKEN_CACHE_SIZE = env.int("JWT_TOKEN_CACHE_SIZE", default=4096)
+JWT_USER_CACHE_SIZE = env.int("JWT_USER_CACHE_SIZE", default=4096)
+JWT_USER_CACHE_TTL = env.int("JWT_USER_CACHE_TTL", default=30)
+
+# Active couple resolution cache (seconds): shared cache and per-process copy
+ACTIVE_COUPLE_CACHE_TTL = env.int("ACTIVE_COUPLE_CACHE_TTL", default=300)
+ACTIVE_COUPLE_LOCAL_TTL = env.int("ACTIVE_COUPLE_LOCAL_TTL", default=5)
+
+# Per-couple write versions backing ETags (planner.versioning), cache seconds
+COUPLE_VERSION_CACHE_TTL = env.int("COUPLE_VERSION_CACHE_TTL", default=3600)
+
+# Dashboard snapshots are rebuilt on read once older than this (seconds)
+DASHBOARD_SNAPSHOT_MAX_AGE = env.int("DASHBOARD_SNAPSHOT_MAX_AGE", default=900)
+# Opt-in: build dashboard sections concurrently on a bounded thread pool
+DASHBOARD_PARALLEL_SECTIONS = env.bool("DASHBOARD_PARALLEL_SECTIONS", default=False)
+DASHBOARD_SECTION_WORKERS = env.int("DASHBOARD_SECTION_WORKERS", default=8)
+DASHBOARD_SECTION_TIMEOUT = env.float("DASHBOARD_SECTION_TIMEOUT", default=2.0)
+
+# Largest number of operations accepted by the budget line item batch endpoint
+BUDGET_BATCH_MAX_OPERATIONS = env.int("BUDGET_BATCH_MAX_OPERATIONS", default=500)
+# Rows fetched per round trip while streaming the budget CSV export
+BUDGET_EXPORT_CHUNK_SIZE = env.int("BUDGET_EXPORT_CHUNK_SIZE", default=2000)
+
+# Currency dashboard budget totals are converted into (see planner.currency)
+BUDGET_REPORTING_CURRENCY = env("BUDGET_REPORTING_CURRENCY", default="USD")
+
+# Budget spend analytics cache (seconds); entries are also keyed on versions
+BUDGET_ANALYTICS_CACHE_TTL = env.int("BUDGET_ANALYTICS_CACHE_TTL", default=3600)
+
 # Email (console by default; override via env)
 EMAIL_BACKEND = env("EMAIL_BACKEND", default="django.core.mail.backends.console.EmailBackend")
 EMAIL_HOST = env("EMAIL_HOST", default="")
@@ -126,6 +258,15 @@ EMAIL_HOST_PASSWORD = env("EMAIL_HOST_PASSWORD", default="")
 EMAIL_USE_TLS = env.bool("EMAIL_USE_TLS", default=True)
 DEFAULT_FROM_EMAIL = env("DEFAULT_FROM_EMAIL", default="noreply@muse.local")
 
+# Outbound mail queue (accounts.mail / manage.py send_queued_mail)
+MAIL_QUEUE_BATCH_SIZE = env.int("MAIL_QUEUE_BATCH_SIZE", default=50)
+MAIL_QUEUE_MAX_ATTEMPTS = env.int("MAIL_QUEUE_MAX_ATTEMPTS", default=6)
+MAIL_QUEUE_BACKOFF_SECONDS = env.int("MAIL_QUEUE_BACKOFF_SECONDS", default=30)
+MAIL_QUEUE_BACKOFF_MAX_SECONDS = env.int("MAIL_QUEUE_BACKOFF_MAX_SECONDS", default=3600)
+MAIL_QUEUE_LEASE_SECONDS = env.int("MAIL_QUEUE_LEASE_SECONDS", default=300)
+MAIL_QUEUE_BREAKER_THRESHOLD = env.int("MAIL_QUEUE_BREAKER_THRESHOLD", default=3)
+MAIL_QUEUE_BREAKER_RESET = env.int("MAIL_QUEUE_BREAKER_RESET", default=60)
+
 CORS_ALLOW_CREDENTIALS = True
 _default_origins = [
     "http://127.0.0.1:5173",
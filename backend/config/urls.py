@@ -35,5 +35,6 @@ urlpatterns = [
     path('api/', include('planner.urls')),
 ]
 
-if settings.DEBUG:
+# Signed media URLs are only honoured by /api/media/signed/.
+if settings.DEBUG and not settings.MEDIA_URL_SIGNING_KEY:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
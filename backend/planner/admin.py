@@ -3,6 +3,7 @@ from .models import (
     Couple,
     CoupleMember,
     EventType,
+    ExchangeRate,
     Event,
     MediaFile,
     MoodBoard,
@@ -13,6 +14,7 @@ from .models import (
 admin.site.register(Couple)
 admin.site.register(CoupleMember)
 admin.site.register(EventType)
+admin.site.register(ExchangeRate)
 admin.site.register(Event)
 admin.site.register(MediaFile)
 admin.site.register(MoodBoard)
@@ -0,0 +1,154 @@
+"""
+Budget spend analytics.
+
+The spend series is computed in the database: line items are bucketed by
+``paid_on`` with ``TruncWeek``/``TruncMonth`` and two window functions give
+each bucket's spend and the running total per currency; ``DISTINCT`` then
+leaves one row per bucket and currency. Python only converts those few rows
+into the reporting currency and projects the burn rate to the wedding date.
+
+Results are cached per couple, keyed on the couple's ``budget`` and
+``profile`` versions (see ``planner.versioning``) and the exchange-rate
+version, so any line item write or wedding date change invalidates them.
+"""
+
+import hashlib
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Sum, Window
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+
+from . import currency, rollups, versioning
+from .models import BudgetLineItem, Couple
+
+BUCKETS = {"week": TruncWeek, "month": TruncMonth}
+# Spend over this many trailing days sets the burn rate.
+BURN_RATE_DAYS = 90
+
+CACHE_KEY = "planner:spend:{couple_id}:{bucket}:{fingerprint}"
+
+
+def _money(value):
+    return str(value.quantize(Decimal("0.01")))
+
+
+def _paid_items(couple_id):
+    return BudgetLineItem.objects.filter(
+        event_budget_category__event_budget__event__couple_id=couple_id,
+        event_budget_category__event_budget__event__is_deleted=False,
+        is_deleted=False,
+        paid_on__isnull=False,
+        actual_amount__isnull=False,
+    ).annotate(currency_code=F("event_budget_category__event_budget__currency_code"))
+
+
+def _series_rows(couple_id, bucket):
+    """``(period, currency_code, spent, cumulative)`` rows in period order."""
+    return (
+        _paid_items(couple_id)
+        .annotate(period=BUCKETS[bucket]("paid_on"))
+        .annotate(
+            spent=Window(Sum("actual_amount"), partition_by=[F("period"), F("currency_code")]),
+            cumulative=Window(
+                Sum("actual_amount"),
+                partition_by=[F("currency_code")],
+                order_by=F("period").asc(),
+            ),
+        )
+        .values_list("period", "currency_code", "spent", "cumulative")
+        .distinct()
+        .order_by("period", "currency_code")
+    )
+
+
+def _series(rows, rates):
+    series, unconverted = [], set()
+    running = {}  # currency -> converted cumulative spend so far
+    for period, currency_code, spent, cumulative in rows:
+        rate = rates.get(currency_code)
+        if rate is None:
+            unconverted.add(currency_code)
+            continue
+        if not series or series[-1]["period"] != period:
+            series.append({"period": period, "spent": Decimal(0)})
+        series[-1]["spent"] += spent * rate
+        running[currency_code] = cumulative * rate
+        series[-1]["cumulative"] = sum(running.values())
+    return series, unconverted
+
+
+def spend_analytics(couple_id, bucket="month"):
+    today = timezone.now().date()
+    versions = versioning.versions(couple_id)
+    parts = (
+        versions["budget"],
+        # Soft-deleting an event drops its spend without a budget write.
+        versions["events"],
+        versions["profile"],
+        currency.rates_version(),
+        today,
+    )
+    fingerprint = hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()[:16]
+    key = CACHE_KEY.format(couple_id=couple_id, bucket=bucket, fingerprint=fingerprint)
+    data = cache.get(key)
+    if data is None:
+        data = _compute(couple_id, bucket, today)
+        cache.set(key, data, settings.BUDGET_ANALYTICS_CACHE_TTL)
+    return data
+
+
+def _compute(couple_id, bucket, today):
+    rates = currency.rates()
+    series, unconverted = _series(_series_rows(couple_id, bucket), rates)
+    planned, _, missing = currency.convert_totals(rollups.totals_by_currency(couple_id))
+    unconverted.update(missing)
+
+    spent = series[-1]["cumulative"] if series else Decimal(0)
+    recent = (
+        _paid_items(couple_id)
+        .filter(paid_on__gt=today - timedelta(days=BURN_RATE_DAYS), paid_on__lte=today)
+        .order_by()
+        .values("currency_code")
+        .annotate(total=Sum("actual_amount"))
+        .values_list("currency_code", "total")
+    )
+    recent_spend = sum(
+        (total * rates[code] for code, total in recent if code in rates), Decimal(0)
+    )
+    burn_rate = recent_spend / BURN_RATE_DAYS
+
+    wedding_date = (
+        Couple.objects.filter(id=couple_id).values_list("wedding_date", flat=True).first()
+    )
+    projected = None
+    if wedding_date is not None and wedding_date >= today:
+        projected_spend = spent + burn_rate * (wedding_date - today).days
+        projected = {
+            "days_remaining": (wedding_date - today).days,
+            "spend": _money(projected_spend),
+            "variance": _money(projected_spend - planned),
+        }
+
+    return {
+        "bucket": bucket,
+        "currency": settings.BUDGET_REPORTING_CURRENCY,
+        "series": [
+            {
+                "period": point["period"],
+                "spent": _money(point["spent"]),
+                "cumulative": _money(point["cumulative"]),
+                "cumulative_vs_planned": _money(point["cumulative"] - planned),
+            }
+            for point in series
+        ],
+        "planned": _money(planned),
+        "spent": _money(spent),
+        "burn_rate_per_day": _money(burn_rate),
+        "wedding_date": wedding_date,
+        "projection": projected,
+        "unconverted": sorted(unconverted),
+    }
@@ -0,0 +1,50 @@
+from django.db.models.base import DEFERRED
+from rest_framework_simplejwt.settings import api_settings
+
+from accounts.authentication import CachedJWTAuthentication
+from accounts.tokens import COUPLE_ID_CLAIM, MEMBERSHIP_VERSION_CLAIM
+from .membership import active_couple_id, membership_version
+
+
+class CoupleJWTAuthentication(CachedJWTAuthentication):
+    """
+    JWT authentication that also resolves the user's active couple once per
+    request and exposes it as ``request.couple_id`` (``None`` without one).
+
+    Tokens issued by ``accounts.tokens.CoupleRefreshToken`` carry the couple
+    and a membership version. While that version is current the claims are
+    trusted and the user is a deferred instance that only hits the database if
+    a view reads one of its fields. Deactivated users never have a current
+    version (see ``planner.membership``). Older tokens (or a stale version)
+    fall back to the (cached) user lookup plus the cached membership lookup.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+
+        user = self.get_user_from_claims(validated_token)
+        if user is not None:
+            request.couple_id = validated_token[COUPLE_ID_CLAIM]
+        else:
+            user = self.get_user(validated_token)
+            request.couple_id = active_couple_id(user.id)
+        return user, validated_token
+
+    def get_user_from_claims(self, validated_token):
+        version = validated_token.get(MEMBERSHIP_VERSION_CLAIM)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if version is None or user_id is None:
+            return None
+        if COUPLE_ID_CLAIM not in validated_token:
+            return None
+        if version != membership_version(user_id):
+            return None
+        fields = self.user_model._meta.concrete_fields
+        values = [user_id if f.attname == api_settings.USER_ID_FIELD else DEFERRED for f in fields]
+        return self.user_model.from_db(None, [api_settings.USER_ID_FIELD], values)
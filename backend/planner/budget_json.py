@@ -0,0 +1,183 @@
+"""
+Budget read path built by the database.
+
+``EventBudgetView.get`` used to load a budget, prefetch its categories and
+line items and run the nested serializers over every row. ``budget_json``
+returns the same structure from a single SQL statement: the database builds
+the nested document (``json_build_object``/``json_agg`` on PostgreSQL,
+``json_object``/``json_group_array`` on SQLite) and Python only parses it.
+
+The SQL formats values the way the serializers do (decimals as strings with
+two places, datetimes in ISO 8601 with a ``Z`` suffix), so responses are
+byte-identical to ``EventBudgetSerializer``. Keep the field lists below in
+step with ``EventBudgetSerializer``, ``EventBudgetCategorySerializer``,
+``BudgetLineItemSerializer`` and ``BudgetCategorySerializer``.
+"""
+
+import json
+
+from django.conf import settings
+from django.db import connection
+
+from .models import BudgetCategory, BudgetLineItem, Event, EventBudget, EventBudgetCategory
+
+# (json key, model field name, kind)
+LINE_ITEM_FIELDS = (
+    ("id", "id", "int"),
+    ("event_budget_category", "event_budget_category", "int"),
+    ("label", "label", "text"),
+    ("planned_amount", "planned_amount", "money"),
+    ("actual_amount", "actual_amount", "money"),
+    ("notes", "notes", "text"),
+    ("paid_on", "paid_on", "date"),
+    ("receipt_media", "receipt_media", "int"),
+    ("created_by", "created_by", "int"),
+    ("created_at", "created_at", "datetime"),
+    ("updated_at", "updated_at", "datetime"),
+)
+CATEGORY_FIELDS = (
+    ("id", "id", "int"),
+    ("key", "key", "text"),
+    ("label", "label", "text"),
+    ("sort_order", "sort_order", "int"),
+    ("is_default_for_omani", "is_default_for_omani", "bool"),
+)
+BUDGET_CATEGORY_FIELDS = (
+    ("id", "id", "int"),
+    ("event_budget", "event_budget", "int"),
+    # "category" and "line_items" are nested; see _category_object.
+    ("planned_amount", "planned_amount", "money"),
+    ("spent_amount", "spent_amount", "money"),
+)
+BUDGET_FIELDS = (
+    ("id", "id", "int"),
+    ("event", "event", "int"),
+    ("currency_code", "currency_code", "text"),
+    ("total_planned", "total_planned", "money"),
+    ("total_spent", "total_spent", "money"),
+)
+
+
+def supported():
+    # Datetimes are rendered in UTC by the database; other time zones (and
+    # other backends) use the serializer path.
+    return connection.vendor in ("postgresql", "sqlite") and settings.TIME_ZONE == "UTC"
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def _column(model, alias, field_name):
+    column = model._meta.get_field(field_name).column
+    return f"{alias}.{connection.ops.quote_name(column)}"
+
+
+def _value(kind, column):
+    # Literal "%" is doubled: the statement is run with query parameters.
+    if connection.vendor == "postgresql":
+        if kind == "money":
+            return f"{column}::text"
+        if kind == "date":
+            return f"to_char({column}, 'YYYY-MM-DD')"
+        if kind == "datetime":
+            # isoformat() leaves out the fraction when it is zero.
+            return (
+                f"to_char({column} AT TIME ZONE 'UTC', 'YYYY-MM-DD\"T\"HH24:MI:SS')"
+                f" || CASE WHEN date_part('microseconds', {column})::int %% 1000000 = 0"
+                f" THEN '' ELSE to_char({column} AT TIME ZONE 'UTC', '.US') END || 'Z'"
+            )
+        return column
+    # SQLite stores datetimes as UTC text ("2024-01-01 10:00:00[.ffffff]") and
+    # decimals as numbers.
+    if kind == "money":
+        return f"CASE WHEN {column} IS NULL THEN NULL ELSE printf('%%.2f', {column}) END"
+    if kind == "datetime":
+        return f"replace({column}, ' ', 'T') || 'Z'"
+    if kind == "bool":
+        return f"json(CASE WHEN {column} THEN 'true' ELSE 'false' END)"
+    return column
+
+
+def _object(pairs):
+    args = ", ".join(f"'{key}', {value}" for key, value in pairs)
+    if connection.vendor == "postgresql":
+        return f"json_build_object({args})"
+    return f"json_object({args})"
+
+
+def _array(obj, table, alias, where, order_by):
+    if connection.vendor == "postgresql":
+        return (
+            f"COALESCE((SELECT json_agg({obj} ORDER BY {order_by}) FROM {table} {alias}"
+            f" WHERE {where}), '[]'::json)"
+        )
+    return (
+        f"(SELECT json_group_array(json(obj)) FROM (SELECT {obj} AS obj FROM {table}"
+        f" {alias} WHERE {where} ORDER BY {order_by}))"
+    )
+
+
+def _fields(model, alias, fields):
+    return [(key, _value(kind, _column(model, alias, name))) for key, name, kind in fields]
+
+
+def _category_object():
+    category = _object(_fields(BudgetCategory, "bc", CATEGORY_FIELDS))
+    line_items = _array(
+        _object(_fields(BudgetLineItem, "li", LINE_ITEM_FIELDS)),
+        _table(BudgetLineItem),
+        "li",
+        f"{_column(BudgetLineItem, 'li', 'event_budget_category')} = {_column(EventBudgetCategory, 'c', 'id')}"
+        f" AND NOT {_column(BudgetLineItem, 'li', 'is_deleted')}",
+        _column(BudgetLineItem, "li", "id"),
+    )
+    category = (
+        f"(SELECT {category} FROM {_table(BudgetCategory)} bc"
+        f" WHERE {_column(BudgetCategory, 'bc', 'id')} = {_column(EventBudgetCategory, 'c', 'category')})"
+    )
+    pairs = _fields(EventBudgetCategory, "c", BUDGET_CATEGORY_FIELDS)
+    # Same key order as EventBudgetCategorySerializer.
+    pairs.insert(2, ("category", category))
+    pairs.append(("line_items", line_items))
+    return _object(pairs)
+
+
+def _budget_sql():
+    categories = _array(
+        _category_object(),
+        _table(EventBudgetCategory),
+        "c",
+        f"{_column(EventBudgetCategory, 'c', 'event_budget')} = {_column(EventBudget, 'b', 'id')}",
+        _column(EventBudgetCategory, "c", "id"),
+    )
+    document = _object(
+        _fields(EventBudget, "b", BUDGET_FIELDS) + [("categories", categories)]
+    )
+    return (
+        f"SELECT {document} FROM {_table(EventBudget)} b"
+        f" INNER JOIN {_table(Event)} e ON {_column(Event, 'e', 'id')} = {_column(EventBudget, 'b', 'event')}"
+        f" WHERE {_column(Event, 'e', 'id')} = %s AND {_column(Event, 'e', 'couple')} = %s"
+        f" AND NOT {_column(Event, 'e', 'is_deleted')}"
+    )
+
+
+_sql = {}
+
+
+def budget_json(event_id, couple_id):
+    """The couple's budget for the event as ``EventBudgetSerializer`` data.
+
+    Returns ``None`` when the event has no budget yet (or is not the
+    couple's).
+    """
+    sql = _sql.get(connection.vendor)
+    if sql is None:
+        sql = _sql[connection.vendor] = _budget_sql()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [event_id, couple_id])
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    # psycopg2 already decodes json columns.
+    return json.loads(row[0]) if isinstance(row[0], str) else row[0]
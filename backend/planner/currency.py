@@ -0,0 +1,80 @@
+"""
+Exchange rates for budget reporting.
+
+``ExchangeRate`` rows (loaded with ``manage.py load_exchange_rates`` or the
+admin) give the value of one unit of a currency in
+``BUDGET_REPORTING_CURRENCY``. Every process keeps the whole table in memory
+together with the version it was loaded at; the current version lives in the
+shared cache and is replaced whenever a rate changes, so each process reloads
+the table exactly once per change.
+"""
+
+import threading
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import ExchangeRate
+
+VERSION_KEY = "planner:exchange-rates:version"
+
+_loaded = (None, {})
+_lock = threading.Lock()
+
+
+def rates_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Lost from the cache: start a new version so every process reloads.
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def rates():
+    """Return ``{currency_code: rate}``, including the reporting currency."""
+    global _loaded
+    version = rates_version()
+    loaded_version, table = _loaded
+    if loaded_version != version:
+        table = dict(ExchangeRate.objects.values_list("currency_code", "rate"))
+        table[settings.BUDGET_REPORTING_CURRENCY] = Decimal(1)
+        with _lock:
+            _loaded = (version, table)
+    return table
+
+
+def _new_version():
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def rates_changed():
+    """Invalidate cached rates.
+
+    Dashboard budget sections record the version they were converted with
+    and are refreshed on their next read (see ``planner.dashboard``).
+    """
+    _new_version()
+    transaction.on_commit(_new_version)
+
+
+def convert_totals(rows):
+    """Sum ``(currency_code, planned, spent)`` rows in the reporting currency.
+
+    Returns ``(planned, spent, unconverted)`` where ``unconverted`` lists the
+    currencies without a rate; their amounts are left out of the totals.
+    """
+    table = rates()
+    planned = spent = Decimal(0)
+    unconverted = []
+    for currency_code, row_planned, row_spent in rows:
+        rate = table.get(currency_code)
+        if rate is None:
+            unconverted.append(currency_code)
+            continue
+        planned += (row_planned or 0) * rate
+        spent += (row_spent or 0) * rate
+    return planned, spent, sorted(unconverted)
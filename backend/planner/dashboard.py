@@ -0,0 +1,354 @@
+"""
+Dashboard summary, materialized per couple.
+
+``DashboardSummaryView`` serves the stored ``DashboardSnapshot`` with a single
+primary-key read. The snapshot is kept current section by section: the model
+signals in ``planner.signals`` call ``refresh_sections`` for whatever a write
+affects, and code that bypasses signals (queryset ``update()``/``bulk_*``)
+calls it explicitly.
+
+The budget section is converted with the current exchange rates; the
+snapshot records their version (``currency.rates_version``) and a read that
+finds it outdated rebuilds just that section, so a rate change costs each
+couple one section refresh on their next visit.
+
+As a safety net a snapshot is rebuilt from scratch on read when it is older
+than ``DASHBOARD_SNAPSHOT_MAX_AGE`` seconds or was built on a previous day
+(the upcoming events window moves with the date). ``manage.py
+rebuild_dashboard_snapshots`` reconciles all couples at once.
+
+Sections are independent, so a rebuild can run them concurrently on a bounded
+thread pool (``DASHBOARD_PARALLEL_SECTIONS``). Each worker thread uses its own
+database connection. A section that fails or misses
+``DASHBOARD_SECTION_TIMEOUT`` is served from the previous snapshot (or left
+empty) and the partial result is not stored, so the next read tries again.
+The read stops waiting at the timeout, but a running thread cannot be
+cancelled: the worker's queries are also capped at the timeout (a
+PostgreSQL ``statement_timeout``, a progress handler deadline on SQLite) so
+a stuck section gives its worker and connection back. Other databases get no
+such cap, and a builder stuck outside the database still holds its worker.
+"""
+
+import contextlib
+import logging
+import threading
+import time
+from concurrent import futures
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from . import currency, media, rollups, storage
+from .models import (
+    ActivityLog,
+    Couple,
+    DashboardSnapshot,
+    Event,
+    HoneymoonPlan,
+    MoodBoardItem,
+)
+
+logger = logging.getLogger(__name__)
+
+# Snapshot data key holding the exchange rates version the budget used.
+RATES_VERSION = "_rates_version"
+
+EMPTY_SUMMARY = {
+    "couple_name": None,
+    "upcoming_events": [],
+    "budget": {
+        "planned": "0.00",
+        "spent": "0.00",
+        "currency": settings.BUDGET_REPORTING_CURRENCY,
+        "unconverted": [],
+    },
+    "honeymoon": None,
+    "moodboard_highlights": [],
+    "recent_activity": [],
+}
+
+
+def _money(value):
+    return str((value or Decimal(0)).quantize(Decimal("0.01")))
+
+
+def _couple_name(couple_id, today):
+    return Couple.objects.filter(id=couple_id).values_list("name", flat=True).first()
+
+
+def _upcoming_events(couple_id, today):
+    events = (
+        Event.objects.filter(
+            couple_id=couple_id,
+            is_active=True,
+            is_deleted=False,
+            start_date__gte=today,
+        )
+        .select_related("event_type")
+        .order_by("start_date")[:5]
+    )
+    return [
+        {
+            "id": e.id,
+            "title": e.title or e.event_type.name_en,
+            "event_type": e.event_type.key,
+            "start_date": e.start_date,
+            "end_date": e.end_date,
+        }
+        for e in events
+    ]
+
+
+def _budget(couple_id, today):
+    # Budget totals are maintained incrementally (see ``planner.rollups``);
+    # sum them per currency in the database and convert the few sums here.
+    planned, spent, unconverted = currency.convert_totals(
+        rollups.totals_by_currency(couple_id)
+    )
+    return {
+        "planned": _money(planned),
+        "spent": _money(spent),
+        "currency": settings.BUDGET_REPORTING_CURRENCY,
+        "unconverted": unconverted,
+    }
+
+
+def _honeymoon(couple_id, today):
+    honeymoon = (
+        HoneymoonPlan.objects.filter(
+            event__couple_id=couple_id, event__is_deleted=False
+        )
+        .order_by("-updated_at")
+        .first()
+    )
+    if honeymoon is None:
+        return None
+    return {
+        "id": honeymoon.id,
+        "event_id": honeymoon.event_id,
+        "destination_country": honeymoon.destination_country,
+        "destination_city": honeymoon.destination_city,
+        "start_date": honeymoon.start_date,
+        "end_date": honeymoon.end_date,
+        "total_planned": honeymoon.total_planned,
+        "total_spent": honeymoon.total_spent,
+    }
+
+
+def _moodboard_highlights(couple_id, today):
+    mood_items = (
+        MoodBoardItem.objects.filter(
+            mood_board__event__couple_id=couple_id,
+            mood_board__event__is_deleted=False,
+            is_deleted=False,
+        )
+        .select_related("media", "mood_board")
+        .prefetch_related("media__derivatives")
+        .order_by("-created_at")[:5]
+    )
+    return [
+        {
+            "id": item.id,
+            "event_id": item.mood_board.event_id,
+            "caption": item.caption,
+            # URLs are built per response (see _with_media_urls).
+            "media_key": item.media.storage_key,
+            "derivatives": media.derivative_entries(item.media),
+            "created_at": item.created_at,
+        }
+        for item in mood_items
+    ]
+
+
+def _recent_activity(couple_id, today):
+    activity = (
+        ActivityLog.objects.filter(couple_id=couple_id)
+        .select_related("content_type")
+        .order_by("-created_at")[:10]
+    )
+    return [
+        {
+            "id": a.id,
+            "verb": a.verb,
+            "actor_id": a.actor_id,
+            "target_type": a.content_type.model if a.content_type else None,
+            "target_id": a.object_id,
+            "metadata": a.metadata,
+            "created_at": a.created_at,
+        }
+        for a in activity
+    ]
+
+
+SECTION_BUILDERS = {
+    "couple_name": _couple_name,
+    "upcoming_events": _upcoming_events,
+    "budget": _budget,
+    "honeymoon": _honeymoon,
+    "moodboard_highlights": _moodboard_highlights,
+    "recent_activity": _recent_activity,
+}
+
+
+def build_sections(couple_id, names, today):
+    return {name: SECTION_BUILDERS[name](couple_id, today) for name in names}
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = futures.ThreadPoolExecutor(
+                max_workers=settings.DASHBOARD_SECTION_WORKERS,
+                thread_name_prefix="dashboard-section",
+            )
+    return _executor
+
+
+@contextlib.contextmanager
+def statement_timeout(seconds):
+    """Abort this thread's queries that run longer than ``seconds``."""
+    connection.ensure_connection()
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SET statement_timeout = %s", [max(1, int(seconds * 1000))])
+        try:
+            yield
+        finally:
+            # The connection may be reused (CONN_MAX_AGE).
+            with connection.cursor() as cursor:
+                cursor.execute("RESET statement_timeout")
+    elif connection.vendor == "sqlite":
+        deadline = time.monotonic() + seconds
+        raw = connection.connection
+        # A truthy return interrupts the running statement.
+        raw.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+        try:
+            yield
+        finally:
+            raw.set_progress_handler(None, 10000)
+    else:
+        yield
+
+
+def _run_section(name, couple_id, today, timeout):
+    # Worker threads get their own connection; treat each section like a
+    # request so it is closed (or kept, per CONN_MAX_AGE) the same way.
+    close_old_connections()
+    try:
+        with statement_timeout(timeout):
+            return SECTION_BUILDERS[name](couple_id, today)
+    finally:
+        close_old_connections()
+
+
+def build_sections_parallel(couple_id, names, today, timeout):
+    """Build sections concurrently; returns ``(data, failed_section_names)``."""
+    executor = _get_executor()
+    pending = {
+        executor.submit(_run_section, name, couple_id, today, timeout): name
+        for name in names
+    }
+    done, not_done = futures.wait(pending, timeout=timeout)
+    data, failed = {}, []
+    for future in not_done:
+        future.cancel()
+        failed.append(pending[future])
+        logger.warning("Dashboard section %s timed out for couple %s", pending[future], couple_id)
+    for future in done:
+        name = pending[future]
+        try:
+            data[name] = future.result()
+        except Exception:
+            logger.exception("Dashboard section %s failed for couple %s", name, couple_id)
+            failed.append(name)
+    return data, failed
+
+
+def rebuild_snapshot(couple_id, previous=None):
+    """Recompute every section and store the snapshot.
+
+    In parallel mode, sections that could not be built come from ``previous``
+    (or ``EMPTY_SUMMARY``); such a partial snapshot is returned unsaved.
+    """
+    today = timezone.now().date()
+    rates_version = currency.rates_version()
+    if not settings.DASHBOARD_PARALLEL_SECTIONS:
+        data = build_sections(couple_id, SECTION_BUILDERS, today)
+    else:
+        data, failed = build_sections_parallel(
+            couple_id, SECTION_BUILDERS, today, settings.DASHBOARD_SECTION_TIMEOUT
+        )
+        if failed:
+            fallback = previous.data if previous is not None else EMPTY_SUMMARY
+            for name in failed:
+                data[name] = fallback.get(name, EMPTY_SUMMARY[name])
+            return DashboardSnapshot(couple_id=couple_id, data=data, as_of=today)
+
+    data[RATES_VERSION] = rates_version
+    snapshot, _ = DashboardSnapshot.objects.update_or_create(
+        couple_id=couple_id,
+        defaults={"data": data, "as_of": today, "rebuilt_at": timezone.now()},
+    )
+    return snapshot
+
+
+def refresh_sections(couple_id, *names):
+    """Recompute the given sections of an existing snapshot in place.
+
+    Couples without a snapshot are skipped; theirs is built on first read.
+    Returns the snapshot.
+    """
+    if couple_id is None:
+        return None
+    with transaction.atomic():
+        snapshot = (
+            DashboardSnapshot.objects.select_for_update()
+            .filter(couple_id=couple_id)
+            .first()
+        )
+        if snapshot is None:
+            return None
+        rates_version = currency.rates_version()
+        snapshot.data.update(build_sections(couple_id, names, snapshot.as_of))
+        if "budget" in names:
+            snapshot.data[RATES_VERSION] = rates_version
+        snapshot.save(update_fields=["data"])
+    return snapshot
+
+
+def _is_stale(snapshot):
+    if snapshot.as_of != timezone.now().date():
+        return True
+    age = (timezone.now() - snapshot.rebuilt_at).total_seconds()
+    return age > settings.DASHBOARD_SNAPSHOT_MAX_AGE
+
+
+def _with_media_urls(highlights):
+    """Swap stored storage keys for (possibly signed) URLs."""
+    resolved = []
+    for entry in highlights or []:
+        entry = dict(entry)
+        if "media_key" in entry:
+            entry["media_url"] = storage.url(entry.pop("media_key"))
+            entry["srcset"] = media.srcset(entry.pop("derivatives"))
+        resolved.append(entry)
+    return resolved
+
+
+def get_summary(couple_id):
+    snapshot = DashboardSnapshot.objects.filter(couple_id=couple_id).first()
+    if snapshot is None or _is_stale(snapshot):
+        snapshot = rebuild_snapshot(couple_id, previous=snapshot)
+    elif snapshot.data.get(RATES_VERSION) != currency.rates_version():
+        snapshot = refresh_sections(couple_id, "budget") or snapshot
+    # jsonb doesn't keep key order; return sections in the documented order.
+    summary = {name: snapshot.data.get(name) for name in SECTION_BUILDERS}
+    summary["moodboard_highlights"] = _with_media_urls(summary["moodboard_highlights"])
+    return summary
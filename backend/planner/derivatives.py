@@ -0,0 +1,207 @@
+"""
+Responsive image derivatives.
+
+After an image ``MediaFile`` is stored, ``schedule`` queues it (on commit) for
+``planner.imaging.render`` on a bounded process pool, which writes one file per
+``MEDIA_DERIVATIVE_WIDTHS`` entry and encoding (AVIF/WebP when this Pillow
+build supports them, plus JPEG or PNG) into a scratch directory. The files are
+then saved to media storage under ``derivatives/<media id>/<render id>/`` and
+recorded as ``MediaDerivative`` rows, serialized as ``srcset`` strings (see
+``planner.media.srcset``). The same pass stores the image's difference hash
+on ``MediaFile.dhash`` for ``planner.similarity``, and its dimensions and
+inline ``placeholder`` preview for ``planner.gallery``. With remote storage the
+original is first copied to a local temporary file for the workers.
+
+Every render gets a new render id, so a re-render never reuses a key: signed
+URLs are cached as ``immutable`` with the key as their ETag. The previous
+render's files are deleted once the new rows are committed.
+
+With ``MEDIA_DERIVATIVES_ASYNC`` off the work runs inline, which is what the
+tests use. ``manage.py generate_media_derivatives`` backfills older media.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from concurrent import futures
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Q
+
+from . import dashboard, imaging, storage, versioning
+from .models import MediaDerivative, MediaFile
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = futures.ProcessPoolExecutor(
+                max_workers=settings.MEDIA_DERIVATIVE_WORKERS
+            )
+    return _executor
+
+
+def is_image(media):
+    return (media.mime_type or "").startswith("image/") and media.mime_type != "image/svg+xml"
+
+
+def _prefix(media_id, render_id):
+    return f"derivatives/{media_id}/{render_id}"
+
+
+class _Job:
+    """A local copy of the source and a scratch directory for ``imaging.render``."""
+
+    def __init__(self, media):
+        self.media_id = media.id
+        self.couple_id = media.couple_id
+        self.source, self.source_is_copy = storage.fetch(media.storage_key)
+        self.output_dir = tempfile.mkdtemp(prefix="derivatives-")
+
+    def args(self):
+        return (
+            self.source,
+            self.output_dir,
+            settings.MEDIA_DERIVATIVE_WIDTHS,
+            imaging.available_encodings(),
+        )
+
+    def cleanup(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+        if self.source_is_copy:
+            os.remove(self.source)
+
+
+def _record(job, rendered):
+    results, details = rendered
+    media_storage = storage.get_storage()
+    prefix = _prefix(job.media_id, uuid.uuid4().hex[:12])
+    rows = []
+    for width, height, mime_type, filename, size in results:
+        key = f"{prefix}/{filename}"
+        with open(os.path.join(job.output_dir, filename), "rb") as fh:
+            key = media_storage.save(key, File(fh))
+        rows.append(
+            MediaDerivative(
+                media_id=job.media_id,
+                width=width,
+                height=height,
+                mime_type=mime_type,
+                storage_key=key,
+                size_bytes=size,
+            )
+        )
+    try:
+        with transaction.atomic():
+            previous = MediaDerivative.objects.filter(media_id=job.media_id)
+            stale_keys = list(previous.values_list("storage_key", flat=True))
+            previous.delete()
+            MediaDerivative.objects.bulk_create(rows)
+            image_hash = details["dhash"]
+            MediaFile.objects.filter(id=job.media_id).update(
+                width=details["width"],
+                height=details["height"],
+                placeholder=details["placeholder"],
+                # Stored as a signed 64-bit integer.
+                dhash=image_hash - (1 << 64) if image_hash >= 1 << 63 else image_hash,
+            )
+    except IntegrityError:
+        # The media was deleted while its derivatives were rendered.
+        for row in rows:
+            media_storage.delete(row.storage_key)
+        return 0
+    for key in stale_keys:
+        media_storage.delete(key)
+    # bulk_create skips the model signals.
+    versioning.bump(job.couple_id, "moodboard")
+    dashboard.refresh_sections(job.couple_id, "moodboard_highlights")
+    return len(rows)
+
+
+def _finish(job, future):
+    try:
+        return _record(job, future.result())
+    except Exception:
+        logger.exception("Could not render derivatives for media %s", job.media_id)
+        return 0
+    finally:
+        job.cleanup()
+
+
+def generate(media):
+    """Render and record derivatives for ``media`` in this process."""
+    try:
+        job = _Job(media)
+    except Exception:
+        logger.exception("Could not read media %s", media.id)
+        return 0
+    try:
+        return _record(job, imaging.render(*job.args()))
+    except Exception:
+        logger.exception("Could not render derivatives for media %s", media.id)
+        return 0
+    finally:
+        job.cleanup()
+
+
+def _done(job, future):
+    # Runs on the executor's management thread; give it its own connection.
+    close_old_connections()
+    try:
+        _finish(job, future)
+    finally:
+        close_old_connections()
+
+
+def submit(media):
+    job = _Job(media)
+    future = _get_executor().submit(imaging.render, *job.args())
+    future.add_done_callback(lambda f: _done(job, f))
+    return future
+
+
+def schedule(media):
+    """Generate derivatives for a new image once the transaction commits."""
+    if not is_image(media):
+        return
+    if settings.MEDIA_DERIVATIVES_ASYNC:
+        transaction.on_commit(lambda: submit(media))
+    else:
+        transaction.on_commit(lambda: generate(media))
+
+
+def backfill(media_ids=None, missing_only=True):
+    """Render derivatives for many images on the pool; returns rows recorded."""
+    media = MediaFile.objects.filter(mime_type__startswith="image/").exclude(
+        mime_type="image/svg+xml"
+    )
+    if media_ids:
+        media = media.filter(id__in=media_ids)
+    if missing_only:
+        media = media.filter(
+            Q(derivatives__isnull=True) | Q(dhash__isnull=True) | Q(placeholder="")
+        ).distinct()
+    recorded = 0
+    with futures.ProcessPoolExecutor(max_workers=settings.MEDIA_DERIVATIVE_WORKERS) as pool:
+        pending = {}
+        for m in media.iterator():
+            try:
+                job = _Job(m)
+            except Exception:
+                logger.exception("Could not read media %s", m.id)
+                continue
+            pending[pool.submit(imaging.render, *job.args())] = job
+        for future in futures.as_completed(pending):
+            recorded += _finish(pending[future], future)
+    return recorded
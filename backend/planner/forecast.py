@@ -0,0 +1,178 @@
+"""
+Budget forecasting.
+
+For every budget category the database returns one row of sums (planned,
+spent, planned amount of unpaid items, planned and actual amounts of paid
+items). The rows of one couple, or of many couples in batch mode, are loaded
+into NumPy arrays and the forecast is computed for all of them at once:
+
+- a category's overrun factor is ``actual / planned`` over its paid items,
+  falling back to the couple-wide factor (in the reporting currency) and
+  then to 1
+- projected spend is ``spent + unpaid planned * factor``
+- variance is ``projected - planned``; ``risk`` is "high" when the
+  projection exceeds the plan by more than ``OVERSPEND_TOLERANCE`` (or there
+  is spend with no plan), "medium" when it exceeds it at all, else "low"
+
+Line items with an actual amount count as settled. ``couple_forecast`` serves
+the API (cached like ``planner.analytics``); ``manage.py forecast_budgets``
+runs the batch mode for the nightly report.
+"""
+
+import hashlib
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, Sum
+
+from . import currency, versioning
+from .models import EventBudgetCategory
+
+OVERSPEND_TOLERANCE = 0.10
+CACHE_KEY = "planner:forecast:{couple_id}:{fingerprint}"
+
+COLUMNS = (
+    "id",
+    "event_budget__event__couple_id",
+    "event_budget__event_id",
+    "event_budget__currency_code",
+    "category__key",
+    "category__label",
+    "planned_amount",
+    "spent_amount",
+    "unpaid_planned",
+    "paid_planned",
+    "paid_actual",
+)
+
+
+def _category_rows(couple_ids=None):
+    live = Q(line_items__is_deleted=False)
+    unpaid = live & Q(line_items__actual_amount__isnull=True)
+    paid = live & Q(
+        line_items__actual_amount__isnull=False, line_items__planned_amount__isnull=False
+    )
+    categories = EventBudgetCategory.objects.filter(event_budget__event__is_deleted=False)
+    if couple_ids is not None:
+        categories = categories.filter(event_budget__event__couple_id__in=couple_ids)
+    return (
+        categories.annotate(
+            unpaid_planned=Sum("line_items__planned_amount", filter=unpaid),
+            paid_planned=Sum("line_items__planned_amount", filter=paid),
+            paid_actual=Sum("line_items__actual_amount", filter=paid),
+        )
+        .order_by("event_budget__event__couple_id", "event_budget__event_id", "id")
+        .values_list(*COLUMNS)
+    )
+
+
+def _money(value):
+    # "+ 0.0" turns a rounded -0.0 into 0.0.
+    return f"{round(float(value), 2) + 0.0:.2f}"
+
+
+def forecast(couple_ids=None):
+    """Return ``{couple_id: forecast}`` for the given couples (default: all)."""
+    rows = list(_category_rows(couple_ids))
+    if not rows:
+        return {}
+    ids, couples, events, currencies, keys, labels = zip(*(row[:6] for row in rows))
+    amounts = np.array([row[6:] for row in rows], dtype=float)
+    amounts = np.nan_to_num(amounts)  # NULL sums
+    planned, spent, unpaid, paid_planned, paid_actual = amounts.T
+
+    table = currency.rates()
+    rate = np.array([float(table.get(code, np.nan)) for code in currencies])
+    converted = ~np.isnan(rate)
+    rate = np.where(converted, rate, 0.0)
+
+    couple_ids_arr = np.array(couples)
+    unique_couples, couple_idx = np.unique(couple_ids_arr, return_inverse=True)
+
+    # Overrun factors: per category, else per couple (reporting currency), else 1.
+    couple_paid_planned = np.bincount(couple_idx, weights=paid_planned * rate)
+    couple_paid_actual = np.bincount(couple_idx, weights=paid_actual * rate)
+    couple_factor = np.divide(
+        couple_paid_actual,
+        couple_paid_planned,
+        out=np.ones_like(couple_paid_planned),
+        where=couple_paid_planned > 0,
+    )
+    factor = np.divide(
+        paid_actual, paid_planned, out=couple_factor[couple_idx].copy(), where=paid_planned > 0
+    )
+
+    projected = spent + unpaid * factor
+    variance = projected - planned
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(planned > 0, projected / planned, np.where(projected > 0, np.inf, 0.0))
+    risk = np.select(
+        [ratio > 1 + OVERSPEND_TOLERANCE, ratio > 1], ["high", "medium"], default="low"
+    )
+
+    totals = {
+        name: np.bincount(couple_idx, weights=values * rate, minlength=len(unique_couples))
+        for name, values in (
+            ("planned", planned),
+            ("spent", spent),
+            ("projected", projected),
+        )
+    }
+
+    unconverted = {}
+    for i in np.flatnonzero(~converted):
+        unconverted.setdefault(couples[i], set()).add(currencies[i])
+
+    result = {}
+    for n, couple_id in enumerate(unique_couples.tolist()):
+        result[couple_id] = {
+            "currency": settings.BUDGET_REPORTING_CURRENCY,
+            "totals": {
+                "planned": _money(totals["planned"][n]),
+                "spent": _money(totals["spent"][n]),
+                "projected": _money(totals["projected"][n]),
+                "variance": _money(totals["projected"][n] - totals["planned"][n]),
+            },
+            "categories": [],
+            "unconverted": sorted(unconverted.get(couple_id, ())),
+        }
+    for i in range(len(rows)):
+        result[couples[i]]["categories"].append(
+            {
+                "id": ids[i],
+                "event_id": events[i],
+                "currency": currencies[i],
+                "key": keys[i],
+                "label": labels[i],
+                "planned": _money(planned[i]),
+                "spent": _money(spent[i]),
+                "projected": _money(projected[i]),
+                "variance": _money(variance[i]),
+                "overrun_factor": round(float(factor[i]), 4),
+                "risk": str(risk[i]),
+            }
+        )
+    return result
+
+
+def empty_forecast():
+    zero = "0.00"
+    return {
+        "currency": settings.BUDGET_REPORTING_CURRENCY,
+        "totals": {"planned": zero, "spent": zero, "projected": zero, "variance": zero},
+        "categories": [],
+        "unconverted": [],
+    }
+
+
+def couple_forecast(couple_id):
+    versions = versioning.versions(couple_id)
+    parts = (versions["budget"], versions["events"], currency.rates_version())
+    fingerprint = hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()[:16]
+    key = CACHE_KEY.format(couple_id=couple_id, fingerprint=fingerprint)
+    data = cache.get(key)
+    if data is None:
+        data = forecast([couple_id]).get(couple_id) or empty_forecast()
+        cache.set(key, data, settings.BUDGET_ANALYTICS_CACHE_TTL)
+    return data
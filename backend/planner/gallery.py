@@ -0,0 +1,102 @@
+"""
+The couple's image feed across all mood boards.
+
+``page`` returns live mood board items newest first, in keyset pages: the
+cursor is the ``(created_at, id)`` of the last row sent, and the next page
+starts strictly after it, so each page is one index range scan however deep
+the client scrolls (no ``OFFSET``), and rows added meanwhile do not shift it.
+Rows are compact: the image URL, ``srcset``, dimensions (so the layout can
+reserve space) and the inline ``placeholder`` preview stored on ``MediaFile``,
+which lets the first screen render from one small response.
+"""
+
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Prefetch, Q
+
+from . import media, storage
+from .models import MediaDerivative, MoodBoardItem
+
+
+def encode_cursor(created_at, item_id):
+    raw = f"{created_at.isoformat()}|{item_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """``(created_at, id)`` from ``encode_cursor``; ``ValueError`` when malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, item_id = raw.split("|")
+        created_at = datetime.fromisoformat(created_at)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if created_at.tzinfo is None or not item_id.isdigit():
+        raise ValueError("Invalid cursor")
+    return created_at, int(item_id)
+
+
+def _row(item):
+    image = item.media
+    return {
+        "id": item.id,
+        "event_id": item.mood_board.event_id,
+        "caption": item.caption,
+        "media_id": image.id,
+        "mime_type": image.mime_type,
+        "url": storage.url(image.storage_key),
+        "srcset": media.srcset(media.derivative_entries(image)),
+        "width": image.width,
+        "height": image.height,
+        "placeholder": image.placeholder,
+        "reaction_counts": item.reaction_counts,
+        "created_at": item.created_at,
+    }
+
+
+def page(couple_id, limit, cursor=None, event_id=None):
+    """``(rows, next_cursor)``; ``next_cursor`` is ``None`` on the last page."""
+    items = MoodBoardItem.objects.filter(
+        mood_board__event__couple_id=couple_id,
+        mood_board__event__is_deleted=False,
+        is_deleted=False,
+    )
+    if event_id is not None:
+        items = items.filter(mood_board__event_id=event_id)
+    if cursor is not None:
+        created_at, item_id = decode_cursor(cursor)
+        items = items.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=item_id)
+        )
+    items = list(
+        items.select_related("media", "mood_board")
+        .only(
+            "id",
+            "caption",
+            "reaction_counts",
+            "created_at",
+            "mood_board__event_id",
+            "media__id",
+            "media__storage_key",
+            "media__mime_type",
+            "media__width",
+            "media__height",
+            "media__placeholder",
+        )
+        .prefetch_related(
+            Prefetch(
+                "media__derivatives",
+                queryset=MediaDerivative.objects.only(
+                    "media_id", "width", "mime_type", "storage_key"
+                ),
+            )
+        )
+        .order_by("-created_at", "-id")[: limit + 1]
+    )
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1].created_at, items[-1].id)
+    return [_row(item) for item in items], next_cursor
@@ -0,0 +1,105 @@
+"""
+Image resizing for ``planner.derivatives``.
+
+This module only depends on Pillow (no Django models) so ``render`` can run
+in worker processes of a ``ProcessPoolExecutor``.
+"""
+
+import base64
+import os
+from io import BytesIO
+
+from PIL import ExifTags, Image, ImageOps
+
+# (mime type, Pillow format, extension, save options), smallest output first.
+MODERN_ENCODINGS = (
+    ("image/avif", "AVIF", ".avif", {"quality": 50}),
+    ("image/webp", "WEBP", ".webp", {"quality": 80, "method": 4}),
+)
+JPEG = ("image/jpeg", "JPEG", ".jpg", {"quality": 82, "optimize": True, "progressive": True})
+PNG = ("image/png", "PNG", ".png", {"optimize": True})
+# Longest side of the inline preview (LQIP) in pixels.
+PLACEHOLDER_SIZE = 16
+
+
+def available_encodings():
+    """The modern encodings this Pillow build can write."""
+    Image.init()
+    return [encoding for encoding in MODERN_ENCODINGS if encoding[1] in Image.SAVE]
+
+
+def _has_alpha(image):
+    return image.mode in ("RGBA", "LA", "PA") or (
+        image.mode == "P" and "transparency" in image.info
+    )
+
+
+def dhash(image):
+    """64-bit difference hash: one bit per horizontally adjacent pixel pair of
+    a 9x8 grayscale thumbnail, set when the left pixel is brighter."""
+    pixels = image.convert("L").resize((9, 8), Image.Resampling.LANCZOS).tobytes()
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            offset = row * 9 + col
+            value = (value << 1) | (pixels[offset] > pixels[offset + 1])
+    return value
+
+
+def placeholder(image):
+    """A tiny preview of ``image`` as a ``data:`` URI (a few hundred bytes),
+    shown stretched and blurred while the real image loads."""
+    Image.init()
+    webp = "WEBP" in Image.SAVE
+    preview = image.convert("RGBA" if webp and _has_alpha(image) else "RGB")
+    preview.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    if webp:
+        preview.save(buffer, "WEBP", quality=40)
+        mime_type = "image/webp"
+    else:
+        preview.save(buffer, "JPEG", quality=40)
+        mime_type = "image/jpeg"
+    return f"data:{mime_type};base64,{base64.b64encode(buffer.getvalue()).decode()}"
+
+
+def render(source_path, output_dir, widths, encodings):
+    """Write resized copies of ``source_path`` into ``output_dir``.
+
+    Widths at or above the original's are skipped (no upscaling). Each width
+    is written in every one of ``encodings`` plus JPEG, or PNG for images
+    with transparency. Returns ``([(width, height, mime_type, filename,
+    size_bytes)], details)``, ``details`` holding the original's displayed
+    ``width`` and ``height``, its ``dhash`` and its ``placeholder``.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    results = []
+    with Image.open(source_path) as original:
+        full_width, full_height = original.size
+        if original.getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8):
+            full_width, full_height = full_height, full_width
+        targets = sorted({w for w in widths if w < full_width})
+        # Let the JPEG decoder downscale while decoding when it can.
+        # (Square bounds: EXIF rotation may swap width and height.)
+        bound = targets[-1] if targets else 64
+        original.draft("RGB", (bound, bound))
+        image = ImageOps.exif_transpose(original)
+        alpha = _has_alpha(image)
+        image = image.convert("RGBA" if alpha else "RGB")
+        fallback = PNG if alpha else JPEG
+
+        for width in targets:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.Resampling.LANCZOS)
+            for mime_type, fmt, ext, options in [*encodings, fallback]:
+                filename = f"{width}{ext}"
+                path = os.path.join(output_dir, filename)
+                resized.save(path, fmt, **options)
+                results.append((width, height, mime_type, filename, os.path.getsize(path)))
+        details = {
+            "width": full_width,
+            "height": full_height,
+            "dhash": dhash(image),
+            "placeholder": placeholder(image),
+        }
+        return results, details
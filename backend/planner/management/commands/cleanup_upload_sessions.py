@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from planner.uploads import cleanup_expired
+
+
+class Command(BaseCommand):
+    help = "Delete expired resumable upload sessions and their partial files."
+
+    def handle(self, *args, **options):
+        count = cleanup_expired()
+        self.stdout.write(self.style.SUCCESS(f"Removed {count} expired upload session(s)"))
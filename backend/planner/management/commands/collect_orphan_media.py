@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from planner import media_gc, quota
+
+
+class Command(BaseCommand):
+    help = "Delete media no mood board item or line item receipt references any more."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would go")
+        parser.add_argument(
+            "--grace-seconds",
+            type=int,
+            help="Keep media younger than this (default MEDIA_GC_GRACE_SECONDS)",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--sweep-storage",
+            action="store_true",
+            help="Also delete stored files that have no row",
+        )
+        parser.add_argument(
+            "--recompute-usage",
+            action="store_true",
+            help="Also reset per-couple storage counters to the actual sums",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        count, size = media_gc.collect(
+            grace_seconds=options["grace_seconds"],
+            batch_size=options["batch_size"],
+            dry_run=dry_run,
+        )
+        verb = "Would delete" if dry_run else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {count} orphaned media file(s), {size} bytes"))
+        if options["sweep_storage"]:
+            removed = media_gc.sweep_storage(grace_seconds=options["grace_seconds"], dry_run=dry_run)
+            self.stdout.write(self.style.SUCCESS(f"{verb} {removed} unreferenced stored file(s)"))
+        if options["recompute_usage"] and not dry_run:
+            fixed = quota.recompute()
+            self.stdout.write(self.style.SUCCESS(f"Corrected {fixed} storage usage counter(s)"))
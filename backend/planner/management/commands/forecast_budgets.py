@@ -0,0 +1,55 @@
+import csv
+
+from django.core.management.base import BaseCommand
+
+from planner.forecast import forecast
+from planner.models import Couple
+
+REPORT_COLUMNS = (
+    "couple_id",
+    "event_id",
+    "category",
+    "currency",
+    "planned",
+    "spent",
+    "projected",
+    "variance",
+    "overrun_factor",
+    "risk",
+)
+
+
+class Command(BaseCommand):
+    help = "Forecast final spend for every couple's budget and write a CSV report."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help="Write the report here instead of stdout")
+        parser.add_argument("--at-risk", action="store_true", help="Only report medium/high risk categories")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Couples forecast per batch")
+
+    def handle(self, *args, **options):
+        out = open(options["output"], "w", newline="") if options["output"] else self.stdout
+        try:
+            writer = csv.writer(out)
+            writer.writerow(REPORT_COLUMNS)
+            couple_ids = list(Couple.objects.order_by("id").values_list("id", flat=True))
+            couples = at_risk = 0
+            for start in range(0, len(couple_ids), options["chunk_size"]):
+                chunk = couple_ids[start : start + options["chunk_size"]]
+                for couple_id, result in forecast(chunk).items():
+                    couples += 1
+                    for category in result["categories"]:
+                        flagged = category["risk"] != "low"
+                        at_risk += flagged
+                        if options["at_risk"] and not flagged:
+                            continue
+                        writer.writerow(
+                            [couple_id, category["event_id"], category["key"]]
+                            + [category[name] for name in REPORT_COLUMNS[3:]]
+                        )
+        finally:
+            if out is not self.stdout:
+                out.close()
+        self.stderr.write(
+            self.style.SUCCESS(f"Forecast {couples} couple(s); {at_risk} category(ies) at risk")
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from planner.derivatives import backfill
+
+
+class Command(BaseCommand):
+    help = "Render derivatives, perceptual hashes and placeholders for image media missing them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--media", type=int, nargs="+", help="Only these media ids")
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Re-render media that already has derivatives",
+        )
+
+    def handle(self, *args, **options):
+        count = backfill(options["media"], missing_only=not options["all"])
+        self.stdout.write(self.style.SUCCESS(f"Recorded {count} derivative(s)"))
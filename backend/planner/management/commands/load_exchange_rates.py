@@ -0,0 +1,60 @@
+import csv
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from planner.currency import rates_changed
+from planner.models import ExchangeRate
+
+
+class Command(BaseCommand):
+    help = (
+        "Load exchange rates into the reporting currency, from a CSV file with "
+        "currency_code,rate rows and/or CODE=RATE arguments."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("rates", nargs="*", help="CODE=RATE, e.g. OMR=2.6")
+        parser.add_argument("--file", help="CSV file of currency_code,rate rows")
+
+    def _parse(self, code, rate):
+        code = code.strip().upper()
+        try:
+            rate = Decimal(rate.strip())
+        except InvalidOperation:
+            raise CommandError(f"Invalid rate for {code}: {rate!r}")
+        if not code or rate <= 0:
+            raise CommandError(f"Invalid exchange rate {code}={rate}")
+        return code, rate
+
+    def handle(self, *args, **options):
+        rates = {}
+        if options["file"]:
+            with open(options["file"], newline="") as fh:
+                for row in csv.reader(fh):
+                    if not row or row[0].strip().lower() in ("currency_code", "currency"):
+                        continue
+                    if len(row) < 2:
+                        raise CommandError(f"Expected currency_code,rate, got {row!r}")
+                    code, rate = self._parse(row[0], row[1])
+                    rates[code] = rate
+        for pair in options["rates"]:
+            code, sep, rate = pair.partition("=")
+            if not sep:
+                raise CommandError(f"Expected CODE=RATE, got {pair!r}")
+            code, rate = self._parse(code, rate)
+            rates[code] = rate
+        if not rates:
+            raise CommandError("No rates given")
+
+        now = timezone.now()
+        ExchangeRate.objects.bulk_create(
+            [ExchangeRate(currency_code=c, rate=r, updated_at=now) for c, r in rates.items()],
+            update_conflicts=True,
+            unique_fields=["currency_code"],
+            update_fields=["rate", "updated_at"],
+        )
+        # bulk_create skips the model signals.
+        rates_changed()
+        self.stdout.write(self.style.SUCCESS(f"Loaded {len(rates)} exchange rate(s)"))
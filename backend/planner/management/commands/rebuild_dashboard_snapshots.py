@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from planner.dashboard import rebuild_snapshot
+from planner.models import Couple
+
+
+class Command(BaseCommand):
+    help = "Rebuild materialized dashboard snapshots from the source tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--couple", type=int, action="append", help="Only rebuild this couple id (repeatable)")
+
+    def handle(self, *args, **options):
+        couples = Couple.objects.order_by("id")
+        if options["couple"]:
+            couples = couples.filter(id__in=options["couple"])
+
+        count = 0
+        for couple_id in couples.values_list("id", flat=True).iterator():
+            rebuild_snapshot(couple_id)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} dashboard snapshot(s)"))
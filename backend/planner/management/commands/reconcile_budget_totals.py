@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from planner.rollups import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recompute budget category and budget totals from their line items."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--budget", type=int, action="append", help="Only reconcile this budget id (repeatable)")
+
+    def handle(self, *args, **options):
+        categories, budgets = reconcile(budget_ids=options["budget"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Corrected {categories} category total(s) and {budgets} budget total(s)"
+            )
+        )
@@ -0,0 +1,263 @@
+"""
+Storing uploaded media.
+
+Every single-file upload path (the multipart ``MediaUploadView`` and
+finalized resumable uploads from ``planner.uploads``) ends in
+``store_media``, which saves the file to media storage, records the
+``MediaFile`` row and queues its resized derivatives
+(``planner.derivatives``). ``store_media_batch`` does the same for many files
+at once: storage writes run on a bounded thread pool
+(``MEDIA_BATCH_UPLOAD_WORKERS``) and the rows, plus optional mood board items,
+are bulk-created in one transaction (items appended in order, see
+``planner.ranking``).
+
+Files go to the configured storage (``planner.storage``), which also builds
+their URLs from ``storage_key`` when responses are serialized. Storage is
+content-addressed: a file is saved as ``content/<aa>/<bb>/<sha256><ext>``, so
+identical bytes are written once however many couples upload them. An
+existing file is only reused while a ``MediaFile`` row pointing at it is
+locked in the transaction that adds the new row, so ``planner.media_gc``
+cannot delete it in between; otherwise the upload is written again. Within a
+couple ``MediaFile`` rows are unique by ``sha256``; uploading the same content
+again returns the existing row without touching storage. Multipart uploads are
+hashed while they stream in (the upload handlers below, see
+``FILE_UPLOAD_HANDLERS``), resumable ones while their chunks arrive.
+"""
+
+import hashlib
+import os
+import threading
+from concurrent import futures
+
+from django.conf import settings
+from django.core.files.uploadhandler import (
+    MemoryFileUploadHandler,
+    TemporaryFileUploadHandler,
+)
+from django.db import IntegrityError, transaction
+
+from . import dashboard, derivatives, quota, ranking, storage, versioning
+from .models import MediaFile, MoodBoardItem
+
+
+class _HashingMixin:
+    """Sets ``sha256`` (hex) on each uploaded file as its chunks arrive."""
+
+    def new_file(self, *args, **kwargs):
+        self._sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self._sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file_obj = super().file_complete(file_size)
+        if file_obj is not None:
+            file_obj.sha256 = self._sha256.hexdigest()
+        return file_obj
+
+
+class HashingMemoryFileUploadHandler(_HashingMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(_HashingMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def file_sha256(file_obj):
+    """Hex SHA-256 of ``file_obj``, from the upload handlers when they ran."""
+    digest = getattr(file_obj, "sha256", None)
+    if digest:
+        return digest
+    hasher = hashlib.sha256()
+    for chunk in file_obj.chunks():
+        hasher.update(chunk)
+    file_obj.seek(0)
+    return hasher.hexdigest()
+
+
+def content_key(sha256, name):
+    ext = os.path.splitext(name)[1].lower()[:16]
+    return f"content/{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}"
+
+
+def _claim_stored(keys):
+    """The ``keys`` still referenced by a ``MediaFile``, whose rows stay locked
+    until the caller's transaction ends (``media_gc`` locks the rows it
+    deletes, then deletes files no row references)."""
+    return set(
+        MediaFile.objects.select_for_update()
+        .filter(storage_key__in=keys)
+        .values_list("storage_key", flat=True)
+    )
+
+
+def store_media(request, couple_id, file_obj, name, mime_type, size, sha256=None):
+    """Store an upload; returns ``(media, created)`` like ``get_or_create``.
+
+    Raises ``quota.QuotaExceeded`` when new content would not fit.
+    """
+    sha256 = sha256 or file_sha256(file_obj)
+    existing = MediaFile.objects.filter(couple_id=couple_id, sha256=sha256).first()
+    if existing is not None:
+        return existing, False
+    quota.check(couple_id, size)
+
+    media_storage = storage.get_storage()
+    key = content_key(sha256, name)
+    reused = media_storage.exists(key)
+    if not reused:
+        key = media_storage.save(key, file_obj)
+    try:
+        with transaction.atomic():
+            if reused and not _claim_stored([key]):
+                # No row holds the file (collected meanwhile): store our own copy.
+                key = media_storage.save(key, file_obj)
+            media = MediaFile.objects.create(
+                couple_id=couple_id,
+                storage_key=key,
+                mime_type=mime_type or "",
+                size_bytes=size,
+                sha256=sha256,
+                uploaded_by=request.user,
+            )
+    except IntegrityError:
+        # A concurrent upload of the same content won the race.
+        return MediaFile.objects.get(couple_id=couple_id, sha256=sha256), False
+    derivatives.schedule(media)
+    return media, True
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = futures.ThreadPoolExecutor(
+                max_workers=settings.MEDIA_BATCH_UPLOAD_WORKERS,
+                thread_name_prefix="media-write",
+            )
+    return _executor
+
+
+def _write(key, file_obj):
+    """``(key, reused)``: the stored key, and whether an existing file was kept."""
+    media_storage = storage.get_storage()
+    if media_storage.exists(key):
+        return key, True
+    return media_storage.save(key, file_obj), False
+
+
+def store_media_batch(request, couple_id, files, mood_board=None):
+    """Store many uploads; returns ``(media, items, created_count)``.
+
+    ``media`` follows the order of ``files`` (repeats of the same content map
+    to one row). With ``mood_board`` each distinct file also becomes a
+    ``MoodBoardItem`` there, returned as ``items``.
+    """
+    digests = [file_sha256(file_obj) for file_obj in files]
+    by_digest = {
+        m.sha256: m
+        for m in MediaFile.objects.filter(couple_id=couple_id, sha256__in=digests)
+    }
+    new = {}
+    for digest, file_obj in zip(digests, files):
+        if digest not in by_digest and digest not in new:
+            new[digest] = file_obj
+    quota.check(couple_id, sum(file_obj.size for file_obj in new.values()))
+
+    executor = _get_executor()
+    writes = {
+        digest: executor.submit(_write, content_key(digest, file_obj.name), file_obj)
+        for digest, file_obj in new.items()
+    }
+    written = {digest: future.result() for digest, future in writes.items()}
+    keys = {digest: key for digest, (key, _) in written.items()}
+    reused = [digest for digest, (_, was_reused) in written.items() if was_reused]
+
+    with transaction.atomic():
+        claimed = _claim_stored([keys[digest] for digest in reused])
+        for digest in reused:
+            if keys[digest] not in claimed:
+                # No row holds the file (collected meanwhile): store our own copy.
+                keys[digest] = storage.get_storage().save(keys[digest], new[digest])
+        rows = [
+            MediaFile(
+                couple_id=couple_id,
+                storage_key=keys[digest],
+                mime_type=file_obj.content_type or "",
+                size_bytes=file_obj.size,
+                sha256=digest,
+                uploaded_by=request.user,
+            )
+            for digest, file_obj in new.items()
+        ]
+        try:
+            with transaction.atomic():
+                MediaFile.objects.bulk_create(rows)
+            # No post_save for bulk_create: charge the quota here.
+            quota.charge(couple_id, sum(row.size_bytes for row in rows))
+        except IntegrityError:
+            # A concurrent upload stored some of this content first.
+            for row in rows:
+                MediaFile.objects.get_or_create(
+                    couple_id=couple_id,
+                    sha256=row.sha256,
+                    defaults={
+                        "storage_key": row.storage_key,
+                        "mime_type": row.mime_type,
+                        "size_bytes": row.size_bytes,
+                        "uploaded_by": row.uploaded_by,
+                    },
+                )
+        by_digest.update(
+            (m.sha256, m)
+            for m in MediaFile.objects.filter(couple_id=couple_id, sha256__in=list(new))
+        )
+        items = []
+        if mood_board is not None:
+            distinct = list(dict.fromkeys(digests))
+            keys = ranking.append_keys(mood_board.id, len(distinct))
+            items = MoodBoardItem.objects.bulk_create(
+                [
+                    MoodBoardItem(
+                        mood_board=mood_board,
+                        media=by_digest[digest],
+                        position=key,
+                        created_by=request.user,
+                    )
+                    for digest, key in zip(distinct, keys)
+                ]
+            )
+
+    # bulk_create skips the model signals.
+    versioning.bump(couple_id, "moodboard")
+    if items:
+        dashboard.refresh_sections(couple_id, "moodboard_highlights")
+    for digest in new:
+        derivatives.schedule(by_digest[digest])
+    return [by_digest[digest] for digest in digests], items, len(new)
+
+
+def derivative_entries(media):
+    """``[(width, mime_type, storage_key)]`` of the media's derivatives.
+
+    Uses ``media.derivatives.all()`` so callers can prefetch
+    ``derivatives``.
+    """
+    return sorted(
+        (d.width, d.mime_type, d.storage_key) for d in media.derivatives.all()
+    )
+
+
+def srcset(entries):
+    """``{mime_type: "url 320w, url 640w"}`` for ``derivative_entries``."""
+    by_type = {}
+    for width, mime_type, key in sorted(entries):
+        by_type.setdefault(mime_type, []).append(f"{storage.url(key)} {width}w")
+    return {mime_type: ", ".join(urls) for mime_type, urls in by_type.items()}
@@ -0,0 +1,136 @@
+"""
+Collecting unreferenced media.
+
+A ``MediaFile`` is referenced while a live (not soft-deleted) mood board item
+or budget line item receipt points at it. ``collect`` walks media older than
+``MEDIA_GC_GRACE_SECONDS`` (so fresh uploads can still be attached) in
+primary-key batches, picking orphans with ``NOT EXISTS`` anti-joins, and
+deletes them along with their soft-deleted mood board items (which would
+otherwise protect them) and derivatives. The delete re-applies the anti-joins,
+so media attached in the meantime survives. Stored files go after commit,
+unless another row still uses the key (content is shared across couples).
+
+``sweep_storage`` removes stored content and derivative files that no row
+points at, e.g. left by an upload that failed after writing its file.
+
+Quota counters follow the deletes through the ``MediaFile`` signals (see
+``planner.quota``).
+"""
+
+import posixpath
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import storage
+from .models import BudgetLineItem, MediaDerivative, MediaFile, MoodBoardItem
+
+CONTENT_PREFIX = "content"
+DERIVATIVES_PREFIX = "derivatives"
+
+
+def orphans(cutoff):
+    live_items = MoodBoardItem.objects.filter(media=OuterRef("pk"), is_deleted=False)
+    live_receipts = BudgetLineItem.objects.filter(
+        receipt_media=OuterRef("pk"), is_deleted=False
+    )
+    return MediaFile.objects.filter(created_at__lt=cutoff).filter(
+        ~Exists(live_items), ~Exists(live_receipts)
+    )
+
+
+def _delete_files(keys, derivative_keys):
+    media_storage = storage.get_storage()
+    shared = set(
+        MediaFile.objects.filter(storage_key__in=keys).values_list("storage_key", flat=True)
+    )
+    for key in list(keys) + list(derivative_keys):
+        if key not in shared:
+            media_storage.delete(key)
+
+
+def _delete_batch(ids, cutoff):
+    with transaction.atomic():
+        doomed = list(
+            orphans(cutoff)
+            .filter(id__in=ids)
+            .select_for_update()
+            .values_list("id", "storage_key", "size_bytes")
+        )
+        if not doomed:
+            return 0, 0
+        doomed_ids = [media_id for media_id, _, _ in doomed]
+        derivative_keys = list(
+            MediaDerivative.objects.filter(media_id__in=doomed_ids).values_list(
+                "storage_key", flat=True
+            )
+        )
+        MoodBoardItem.objects.filter(media_id__in=doomed_ids, is_deleted=True).delete()
+        MediaFile.objects.filter(id__in=doomed_ids).delete()
+        keys = {key for _, key, _ in doomed}
+        transaction.on_commit(lambda: _delete_files(keys, derivative_keys))
+    return len(doomed), sum(size for _, _, size in doomed)
+
+
+def collect(grace_seconds=None, batch_size=500, dry_run=False, now=None):
+    """Delete orphaned media; returns ``(count, bytes)`` deleted (or found, with ``dry_run``)."""
+    if grace_seconds is None:
+        grace_seconds = settings.MEDIA_GC_GRACE_SECONDS
+    cutoff = (now or timezone.now()) - timedelta(seconds=grace_seconds)
+    count = total_bytes = 0
+    last_id = 0
+    while True:
+        batch = list(
+            orphans(cutoff)
+            .filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", "size_bytes")[:batch_size]
+        )
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        if dry_run:
+            count += len(batch)
+            total_bytes += sum(size for _, size in batch)
+            continue
+        deleted, deleted_bytes = _delete_batch([media_id for media_id, _ in batch], cutoff)
+        count += deleted
+        total_bytes += deleted_bytes
+    return count, total_bytes
+
+
+def _walk(prefix):
+    media_storage = storage.get_storage()
+    try:
+        dirs, files = media_storage.listdir(prefix)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield posixpath.join(prefix, name)
+    for name in dirs:
+        yield from _walk(posixpath.join(prefix, name))
+
+
+def sweep_storage(grace_seconds=None, dry_run=False, now=None):
+    """Delete stored files without a row; returns how many."""
+    if grace_seconds is None:
+        grace_seconds = settings.MEDIA_GC_GRACE_SECONDS
+    cutoff = (now or timezone.now()) - timedelta(seconds=grace_seconds)
+    media_storage = storage.get_storage()
+
+    def unreferenced(keys, model):
+        known = set(model.objects.filter(storage_key__in=keys).values_list("storage_key", flat=True))
+        return [key for key in keys if key not in known]
+
+    removed = 0
+    for prefix, model in ((CONTENT_PREFIX, MediaFile), (DERIVATIVES_PREFIX, MediaDerivative)):
+        keys = [key for key in _walk(prefix) if media_storage.get_modified_time(key) < cutoff]
+        for start in range(0, len(keys), 500):
+            for key in unreferenced(keys[start : start + 500], model):
+                if not dry_run:
+                    media_storage.delete(key)
+                removed += 1
+    return removed
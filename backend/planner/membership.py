@@ -0,0 +1,155 @@
+"""
+Active couple resolution.
+
+Every planner request needs the id of the couple the user is an active member
+of. The answer rarely changes, so it is cached per user in two levels:
+
+- a process-local dict with a short TTL (no network round-trip at all)
+- the shared Django cache (so other workers benefit from a single lookup)
+
+Each user also carries a ``membership_version`` counter. It is stamped into
+issued JWTs (see ``accounts.tokens``) so a token's couple claims can be
+trusted for as long as the version still matches.
+
+Any change to ``CoupleMember`` rows must call ``membership_changed`` (the
+model signals in ``planner.signals`` take care of ``save``/``delete``;
+queryset ``update()`` callers have to do it themselves).
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import CoupleMember
+
+# Cached in place of ``None`` so a user without a couple is also a cache hit.
+NO_COUPLE = 0
+# The local level is cleared wholesale once it grows past this many users.
+LOCAL_MAX_ENTRIES = 10000
+
+
+class _UserCache:
+    """Per-user value cached in process memory and in the shared cache."""
+
+    def __init__(self, key, loader):
+        self.key = key
+        self.loader = loader
+        self._local = {}
+        self._lock = threading.Lock()
+
+    def _cache_key(self, user_id):
+        return self.key.format(user_id=user_id)
+
+    def get(self, user_id):
+        now = time.monotonic()
+        entry = self._local.get(user_id)
+        if entry is not None and entry[1] > now:
+            return entry[0]
+
+        value = cache.get(self._cache_key(user_id))
+        if value is None:
+            value = self.loader(user_id)
+            cache.set(self._cache_key(user_id), value, settings.ACTIVE_COUPLE_CACHE_TTL)
+
+        with self._lock:
+            if len(self._local) >= LOCAL_MAX_ENTRIES:
+                self._local.clear()
+            self._local[user_id] = (value, now + settings.ACTIVE_COUPLE_LOCAL_TTL)
+        return value
+
+    def drop(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._local.pop(user_id, None)
+        cache.delete_many([self._cache_key(user_id) for user_id in user_ids])
+
+
+def _load_active_couple_id(user_id):
+    membership = (
+        CoupleMember.objects.filter(user_id=user_id, status="active")
+        .order_by("created_at")
+        .only("couple_id")
+        .first()
+    )
+    return membership.couple_id if membership else NO_COUPLE
+
+
+def _load_membership_version(user_id):
+    row = (
+        get_user_model()
+        .objects.filter(pk=user_id)
+        .values_list("membership_version", "is_active")
+        .first()
+    )
+    # -1 never matches a stamped token, so claims of deleted or deactivated
+    # users are ignored (also when ``is_active`` was set by a queryset
+    # ``update()``, which skips the signal that bumps the version).
+    if row is None or not row[1]:
+        return -1
+    return row[0]
+
+
+_active_couples = _UserCache("planner:active-couple:{user_id}", _load_active_couple_id)
+_versions = _UserCache("planner:membership-version:{user_id}", _load_membership_version)
+
+
+def active_couple_id(user_id):
+    """Return the id of the user's active couple (or ``None``), cached."""
+    return _active_couples.get(user_id) or None
+
+
+def active_membership(user_id):
+    """Return ``(couple_id, role)`` for the user's active membership, uncached."""
+    membership = (
+        CoupleMember.objects.filter(user_id=user_id, status="active")
+        .order_by("created_at")
+        .only("couple_id", "role")
+        .first()
+    )
+    if membership is None:
+        return None, None
+    return membership.couple_id, membership.role
+
+
+def membership_version(user_id):
+    """Return the user's current membership version, cached."""
+    return _versions.get(user_id)
+
+
+def _drop(user_ids):
+    _active_couples.drop(user_ids)
+    _versions.drop(user_ids)
+
+
+def invalidate_active_couple(*user_ids):
+    """Forget everything cached about the given users' memberships.
+
+    The entries are dropped immediately and again once the surrounding
+    transaction commits, so a concurrent request can't re-cache the
+    pre-commit state.
+    """
+    user_ids = [user_id for user_id in user_ids if user_id is not None]
+    if not user_ids:
+        return
+    _drop(user_ids)
+    transaction.on_commit(lambda: _drop(user_ids))
+
+
+def membership_changed(*user_ids):
+    """Bump the membership version of the given users and drop their cache.
+
+    Tokens stamped with the previous version stop being trusted and fall back
+    to a database lookup until the client refreshes them.
+    """
+    user_ids = [user_id for user_id in user_ids if user_id is not None]
+    if not user_ids:
+        return
+    get_user_model().objects.filter(pk__in=user_ids).update(
+        membership_version=F("membership_version") + 1
+    )
+    invalidate_active_couple(*user_ids)
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.13 on 2026-10-18 03:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+import rest_framework.utils.encoders
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0005_budgetlineitem_is_deleted_event_is_deleted_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardSnapshot',
+            fields=[
+                ('couple', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='dashboard_snapshot', serialize=False, to='planner.couple')),
+                ('data', models.JSONField(default=dict, encoder=rest_framework.utils.encoders.JSONEncoder)),
+                ('as_of', models.DateField()),
+                ('rebuilt_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.13 on 2026-10-18 03:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_versions(apps, schema_editor):
+    Couple = apps.get_model("planner", "Couple")
+    CoupleVersion = apps.get_model("planner", "CoupleVersion")
+    CoupleVersion.objects.bulk_create(
+        [CoupleVersion(couple_id=couple_id) for couple_id in Couple.objects.values_list("id", flat=True)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0006_dashboardsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoupleVersion',
+            fields=[
+                ('couple', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='version', serialize=False, to='planner.couple')),
+                ('total', models.PositiveBigIntegerField(default=0)),
+                ('profile', models.PositiveBigIntegerField(default=0)),
+                ('events', models.PositiveBigIntegerField(default=0)),
+                ('budget', models.PositiveBigIntegerField(default=0)),
+                ('honeymoon', models.PositiveBigIntegerField(default=0)),
+                ('moodboard', models.PositiveBigIntegerField(default=0)),
+                ('tasks', models.PositiveBigIntegerField(default=0)),
+                ('activity', models.PositiveBigIntegerField(default=0)),
+                ('comments', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.13 on 2026-10-18 03:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0009_uploadsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaDerivative',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('mime_type', models.CharField(max_length=100)),
+                ('storage_key', models.CharField(max_length=255)),
+                ('url', models.CharField(max_length=500)),
+                ('size_bytes', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('media', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='derivatives', to='planner.mediafile')),
+            ],
+            options={
+                'unique_together': {('media', 'width', 'mime_type')},
+            },
+        ),
+    ]
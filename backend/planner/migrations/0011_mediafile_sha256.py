@@ -0,0 +1,46 @@
+# Generated by Django 4.2.13 on 2026-10-18 03:33
+
+import hashlib
+import os
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def hash_existing_media(apps, schema_editor):
+    """Hash files already on disk; later duplicates within a couple stay blank."""
+    MediaFile = apps.get_model("planner", "MediaFile")
+    seen = set()
+    for media in MediaFile.objects.order_by("id").iterator():
+        path = os.path.join(settings.MEDIA_ROOT, media.storage_key)
+        if not os.path.isfile(path):
+            continue
+        hasher = hashlib.sha256()
+        with open(path, "rb") as fh:
+            for block in iter(lambda: fh.read(64 * 1024), b""):
+                hasher.update(block)
+        digest = hasher.hexdigest()
+        if (media.couple_id, digest) in seen:
+            continue
+        seen.add((media.couple_id, digest))
+        MediaFile.objects.filter(id=media.id).update(sha256=digest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0010_mediaderivative'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='sha256',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.RunPython(hash_existing_media, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='mediafile',
+            constraint=models.UniqueConstraint(condition=models.Q(('sha256', ''), _negated=True), fields=('couple', 'sha256'), name='uniq_media_content_per_couple'),
+        ),
+    ]
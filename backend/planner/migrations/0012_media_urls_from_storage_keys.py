@@ -0,0 +1,21 @@
+# Generated by Django 4.2.13 on 2026-10-18 03:38
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0011_mediafile_sha256'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='mediaderivative',
+            name='url',
+        ),
+        migrations.RemoveField(
+            model_name='mediafile',
+            name='url',
+        ),
+    ]
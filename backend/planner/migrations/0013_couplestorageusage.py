@@ -0,0 +1,42 @@
+# Generated by Django 4.2.13 on 2026-10-18 03:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+
+
+def create_usage(apps, schema_editor):
+    Couple = apps.get_model("planner", "Couple")
+    CoupleStorageUsage = apps.get_model("planner", "CoupleStorageUsage")
+    MediaFile = apps.get_model("planner", "MediaFile")
+    used = dict(
+        MediaFile.objects.order_by()
+        .values("couple_id")
+        .annotate(total=Sum("size_bytes"))
+        .values_list("couple_id", "total")
+    )
+    CoupleStorageUsage.objects.bulk_create(
+        [
+            CoupleStorageUsage(couple_id=couple_id, bytes_used=used.get(couple_id) or 0)
+            for couple_id in Couple.objects.values_list("id", flat=True)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0012_media_urls_from_storage_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoupleStorageUsage',
+            fields=[
+                ('couple', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='storage_usage', serialize=False, to='planner.couple')),
+                ('bytes_used', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_usage, migrations.RunPython.noop),
+    ]
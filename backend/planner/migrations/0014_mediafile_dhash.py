@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-18 03:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0013_couplestorageusage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='dhash',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.13 on 2026-10-18 03:49
+
+from django.db import migrations, models
+
+from planner.ranking import sequence
+
+
+def assign_ranks(apps, schema_editor):
+    MoodBoardItem = apps.get_model("planner", "MoodBoardItem")
+    board_ids = MoodBoardItem.objects.values_list("mood_board_id", flat=True).distinct()
+    for board_id in board_ids:
+        # Keep the old order: numbered items first, the rest by id.
+        items = list(
+            MoodBoardItem.objects.filter(mood_board_id=board_id).order_by(
+                models.F("position").asc(nulls_last=True), "id"
+            )
+        )
+        for item, key in zip(items, sequence(len(items))):
+            item.rank = key
+        MoodBoardItem.objects.bulk_update(items, ["rank"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0014_mediafile_dhash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moodboarditem',
+            name='rank',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.RunPython(assign_ranks, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='moodboarditem',
+            name='position',
+        ),
+        migrations.RenameField(
+            model_name='moodboarditem',
+            old_name='rank',
+            new_name='position',
+        ),
+        migrations.AddIndex(
+            model_name='moodboarditem',
+            index=models.Index(fields=['mood_board', 'is_deleted', 'position'], name='planner_moo_mood_bo_13846e_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.13 on 2026-10-18 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0015_moodboarditem_rank_position'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='placeholder',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='moodboarditem',
+            index=models.Index(fields=['created_at', 'id'], name='planner_moo_created_993c77_idx'),
+        ),
+    ]
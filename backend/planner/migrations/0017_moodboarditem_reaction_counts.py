@@ -0,0 +1,36 @@
+# Generated by Django 4.2.13 on 2026-10-18 03:55
+
+from django.db import migrations, models
+
+
+def count_reactions(apps, schema_editor):
+    MoodBoardItem = apps.get_model("planner", "MoodBoardItem")
+    MoodBoardReaction = apps.get_model("planner", "MoodBoardReaction")
+    counts = {}
+    for item_id, reaction_type, total in (
+        MoodBoardReaction.objects.values_list("mood_board_item_id", "reaction_type")
+        .annotate(total=models.Count("id"))
+        .order_by()
+    ):
+        counts.setdefault(item_id, {})[reaction_type] = total
+    MoodBoardItem.objects.bulk_update(
+        [MoodBoardItem(id=item_id, reaction_counts=value) for item_id, value in counts.items()],
+        ["reaction_counts"],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0016_mediafile_dimensions_placeholder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moodboarditem',
+            name='reaction_counts',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(count_reactions, migrations.RunPython.noop),
+    ]
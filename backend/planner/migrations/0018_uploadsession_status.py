@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-18 04:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0017_moodboarditem_reaction_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='status',
+            field=models.CharField(choices=[('receiving', 'Receiving'), ('finalizing', 'Finalizing')], default='receiving', max_length=20),
+        ),
+    ]
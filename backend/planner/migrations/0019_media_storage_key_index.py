@@ -0,0 +1,23 @@
+# Generated by Django 4.2.13 on 2026-10-18 04:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0018_uploadsession_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mediaderivative',
+            name='storage_key',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='mediafile',
+            name='storage_key',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+    ]
@@ -1,8 +1,12 @@
+import uuid
+
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
 
 User = settings.AUTH_USER_MODEL
 
@@ -83,19 +87,76 @@ class MediaFile(models.Model):
     couple = models.ForeignKey(
         Couple, on_delete=models.CASCADE, related_name="media_files"
     )
-    storage_key = models.CharField(max_length=255)
-    url = models.URLField()
+    storage_key = models.CharField(max_length=255, db_index=True)
     mime_type = models.CharField(max_length=100)
     size_bytes = models.BigIntegerField()
+    # Hex SHA-256 of the content; blank for files stored before hashing.
+    sha256 = models.CharField(max_length=64, blank=True, default="")
+    # 64-bit difference hash of images (planner.imaging.dhash), signed.
+    dhash = models.BigIntegerField(null=True, blank=True)
+    # Images: displayed size and a tiny data: URI preview (planner.imaging).
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    placeholder = models.TextField(blank=True, default="")
     uploaded_by = models.ForeignKey(
         User, on_delete=models.SET_NULL, null=True, related_name="uploads"
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["couple", "sha256"],
+                condition=~models.Q(sha256=""),
+                name="uniq_media_content_per_couple",
+            )
+        ]
+
     def __str__(self):
         return self.storage_key
 
 
+class MediaDerivative(models.Model):
+    """A resized/re-encoded copy of an image ``MediaFile`` (see planner.derivatives)."""
+
+    media = models.ForeignKey(
+        MediaFile, on_delete=models.CASCADE, related_name="derivatives"
+    )
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    mime_type = models.CharField(max_length=100)
+    storage_key = models.CharField(max_length=255, db_index=True)
+    size_bytes = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("media", "width", "mime_type")
+
+
+class UploadSession(models.Model):
+    """A resumable upload in progress; becomes a ``MediaFile`` on finalize."""
+
+    STATUS_CHOICES = (
+        ("receiving", "Receiving"),
+        ("finalizing", "Finalizing"),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    couple = models.ForeignKey(
+        Couple, on_delete=models.CASCADE, related_name="upload_sessions"
+    )
+    created_by = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="upload_sessions"
+    )
+    filename = models.CharField(max_length=255)
+    mime_type = models.CharField(max_length=100, blank=True)
+    size_bytes = models.BigIntegerField()
+    received_bytes = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="receiving")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+
 class MoodBoard(models.Model):
     event = models.OneToOneField(
         Event, on_delete=models.CASCADE, related_name="mood_board"
@@ -116,7 +177,10 @@ class MoodBoardItem(models.Model):
         MediaFile, on_delete=models.PROTECT, related_name="mood_board_items"
     )
     caption = models.CharField(max_length=255, blank=True)
-    position = models.IntegerField(null=True, blank=True)
+    # Fractional rank key, see planner.ranking.
+    position = models.CharField(max_length=64, blank=True, default="")
+    # {reaction_type: count} of this item's reactions, see planner.reactions.
+    reaction_counts = models.JSONField(default=dict, blank=True)
     is_deleted = models.BooleanField(default=False)
     created_by = models.ForeignKey(
         User, on_delete=models.SET_NULL, null=True, related_name="mood_board_items"
@@ -124,6 +188,12 @@ class MoodBoardItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["mood_board", "is_deleted", "position"]),
+            models.Index(fields=["created_at", "id"]),
+        ]
+
     def __str__(self):
         return f"Item {self.id} on {self.mood_board}"
 
@@ -142,6 +212,38 @@ class MoodBoardReaction(models.Model):
         unique_together = ("mood_board_item", "user", "reaction_type")
 
 
+def _previous_rollup(instance, fields):
+    """The rollup contribution of ``instance``'s stored row.
+
+    Read under a row lock rather than taken from the loaded instance, so two
+    concurrent saves of the same row each move the contribution from what the
+    other one wrote instead of subtracting the same stale value twice.
+    """
+    if instance._state.adding:
+        return None
+    row = (
+        type(instance).objects.select_for_update().filter(pk=instance.pk).only(*fields).first()
+    )
+    return row.rollup_contribution() if row else None
+
+
+def _rollup_deltas(old, new):
+    """``{parent_id: (planned, spent)}`` moving a contribution from old to new."""
+    deltas = {}
+    for state, sign in ((old, -1), (new, 1)):
+        if state is None or state[0] is None:
+            continue
+        parent_id, planned, spent = state
+        total = deltas.setdefault(parent_id, [0, 0])
+        total[0] += sign * planned
+        total[1] += sign * spent
+    return {
+        parent_id: (planned, spent)
+        for parent_id, (planned, spent) in deltas.items()
+        if planned or spent
+    }
+
+
 class EventBudget(models.Model):
     event = models.OneToOneField(
         Event, on_delete=models.CASCADE, related_name="event_budget"
@@ -152,6 +254,13 @@ class EventBudget(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    @classmethod
+    def shift_totals(cls, budget_id, planned, spent):
+        cls.objects.filter(id=budget_id).update(
+            total_planned=F("total_planned") + planned,
+            total_spent=F("total_spent") + spent,
+        )
+
 
 class BudgetCategory(models.Model):
     key = models.CharField(max_length=50, unique=True)
@@ -171,6 +280,48 @@ class EventBudgetCategory(models.Model):
     planned_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     spent_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
+    # planned_amount/spent_amount roll up the category's non-deleted line
+    # items, and EventBudget.total_* roll up its categories. Both are kept in
+    # sync with F() deltas on save/delete; ``manage.py reconcile_budget_totals``
+    # repairs drift from writes that bypass the models.
+
+    def rollup_contribution(self):
+        """``(budget id, planned, spent)`` this category adds to its budget."""
+        if self.get_deferred_fields() & {"event_budget_id", "planned_amount", "spent_amount"}:
+            return None
+        return (self.event_budget_id, self.planned_amount or 0, self.spent_amount or 0)
+
+    @classmethod
+    def shift_totals(cls, category_id, planned, spent):
+        """Add deltas to a category's totals and to its budget's totals."""
+        cls.objects.filter(id=category_id).update(
+            planned_amount=F("planned_amount") + planned,
+            spent_amount=F("spent_amount") + spent,
+        )
+        EventBudget.objects.filter(categories__id=category_id).update(
+            total_planned=F("total_planned") + planned,
+            total_spent=F("total_spent") + spent,
+        )
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            old = _previous_rollup(self, ("event_budget_id", "planned_amount", "spent_amount"))
+            new = self.rollup_contribution()
+            for budget_id, (planned, spent) in _rollup_deltas(old, new).items():
+                EventBudget.shift_totals(budget_id, planned, spent)
+            super().save(*args, **kwargs)
+
+
+class ExchangeRate(models.Model):
+    """Value of one unit of ``currency_code`` in ``BUDGET_REPORTING_CURRENCY``."""
+
+    currency_code = models.CharField(max_length=8, unique=True)
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.currency_code} = {self.rate}"
+
 
 class BudgetLineItem(models.Model):
     event_budget_category = models.ForeignKey(
@@ -199,6 +350,38 @@ class BudgetLineItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    def rollup_contribution(self):
+        """``(category id, planned, spent)`` this item adds to its category."""
+        fields = {"event_budget_category_id", "planned_amount", "actual_amount", "is_deleted"}
+        if self.get_deferred_fields() & fields:
+            return None
+        if self.is_deleted:
+            return (self.event_budget_category_id, 0, 0)
+        return (
+            self.event_budget_category_id,
+            self.planned_amount or 0,
+            self.actual_amount or 0,
+        )
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            old = _previous_rollup(
+                self, ("event_budget_category_id", "planned_amount", "actual_amount", "is_deleted")
+            )
+            new = self.rollup_contribution()
+            for category_id, (planned, spent) in _rollup_deltas(old, new).items():
+                EventBudgetCategory.shift_totals(category_id, planned, spent)
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            old = _previous_rollup(
+                self, ("event_budget_category_id", "planned_amount", "actual_amount", "is_deleted")
+            )
+            for category_id, (planned, spent) in _rollup_deltas(old, None).items():
+                EventBudgetCategory.shift_totals(category_id, planned, spent)
+            return super().delete(*args, **kwargs)
+
 
 class HoneymoonPlan(models.Model):
     event = models.OneToOneField(
@@ -392,3 +575,66 @@ class Notification(models.Model):
 
     def __str__(self):
         return self.message
+
+
+class DashboardSnapshot(models.Model):
+    """Materialized dashboard summary for a couple (see ``planner.dashboard``)."""
+
+    couple = models.OneToOneField(
+        Couple,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="dashboard_snapshot",
+    )
+    data = models.JSONField(default=dict, encoder=JSONEncoder)
+    as_of = models.DateField()
+    rebuilt_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Dashboard snapshot for {self.couple_id}"
+
+
+class CoupleVersion(models.Model):
+    """
+    Monotonic write counters for a couple's data, one per resource plus
+    ``total`` (bumped on every write). Used for ETags; see ``planner.versioning``.
+    """
+
+    couple = models.OneToOneField(
+        Couple, on_delete=models.CASCADE, primary_key=True, related_name="version"
+    )
+    total = models.PositiveBigIntegerField(default=0)
+    profile = models.PositiveBigIntegerField(default=0)
+    events = models.PositiveBigIntegerField(default=0)
+    budget = models.PositiveBigIntegerField(default=0)
+    honeymoon = models.PositiveBigIntegerField(default=0)
+    moodboard = models.PositiveBigIntegerField(default=0)
+    tasks = models.PositiveBigIntegerField(default=0)
+    activity = models.PositiveBigIntegerField(default=0)
+    comments = models.PositiveBigIntegerField(default=0)
+
+    RESOURCES = (
+        "profile",
+        "events",
+        "budget",
+        "honeymoon",
+        "moodboard",
+        "tasks",
+        "activity",
+        "comments",
+    )
+
+    def __str__(self):
+        return f"Versions for couple {self.couple_id}"
+
+
+class CoupleStorageUsage(models.Model):
+    """Bytes of media a couple stores, kept up to date incrementally; see ``planner.quota``."""
+
+    couple = models.OneToOneField(
+        Couple, on_delete=models.CASCADE, primary_key=True, related_name="storage_usage"
+    )
+    bytes_used = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Storage used by couple {self.couple_id}"
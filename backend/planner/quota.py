@@ -0,0 +1,72 @@
+"""
+Per-couple media storage accounting.
+
+``CoupleStorageUsage.bytes_used`` is the sum of the couple's
+``MediaFile.size_bytes``, maintained incrementally: the ``MediaFile``
+signals in ``planner.signals`` call ``charge`` on create and delete, and bulk
+writes (``planner.media.store_media_batch``) call it themselves. Uploads
+check it against ``MEDIA_COUPLE_QUOTA_BYTES`` with one primary-key read
+instead of a ``SUM`` over the couple's media. ``recompute`` (run by
+``manage.py collect_orphan_media``) repairs any drift.
+"""
+
+from django.conf import settings
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import CoupleStorageUsage, MediaFile
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+def bytes_used(couple_id):
+    return (
+        CoupleStorageUsage.objects.filter(couple_id=couple_id)
+        .values_list("bytes_used", flat=True)
+        .first()
+        or 0
+    )
+
+
+def charge(couple_id, delta):
+    """Add ``delta`` (negative to release) bytes to the couple's usage."""
+    if couple_id is None or not delta:
+        return
+    updated = CoupleStorageUsage.objects.filter(couple_id=couple_id).update(
+        bytes_used=F("bytes_used") + delta
+    )
+    if not updated and delta > 0:
+        CoupleStorageUsage.objects.get_or_create(couple_id=couple_id)
+        recompute([couple_id])
+
+
+def check(couple_id, incoming):
+    """Raise ``QuotaExceeded`` if storing ``incoming`` more bytes would pass the quota."""
+    quota = settings.MEDIA_COUPLE_QUOTA_BYTES
+    if quota and bytes_used(couple_id) + incoming > quota:
+        raise QuotaExceeded("Storage quota exceeded")
+
+
+def recompute(couple_ids=None):
+    """Reset counters to the actual sums; returns how many were wrong."""
+    actual = Coalesce(
+        Subquery(
+            MediaFile.objects.filter(couple_id=OuterRef("couple_id"))
+            .order_by()
+            .values("couple_id")
+            .annotate(total=Sum("size_bytes"))
+            .values("total")
+        ),
+        Value(0),
+    )
+    usage = CoupleStorageUsage.objects.annotate(actual=actual).exclude(
+        bytes_used=F("actual")
+    )
+    if couple_ids is not None:
+        usage = usage.filter(couple_id__in=couple_ids)
+    fixed = 0
+    for couple_id, total in usage.values_list("couple_id", "actual"):
+        fixed += CoupleStorageUsage.objects.filter(couple_id=couple_id).update(bytes_used=total)
+    return fixed
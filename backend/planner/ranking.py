@@ -0,0 +1,188 @@
+"""
+Ordering mood board items with fractional rank keys.
+
+``MoodBoardItem.position`` is a string read as a base-36 fraction
+(``"i"`` is 0.i): items sort by it (then ``id``), and a key can always be
+made between two others, so moving an item rewrites only that item's row.
+Keys use ``0-9a-z`` only, which compares the same under bytewise and
+linguistic collations, and never end in ``"0"``. ``sequence`` hands out evenly
+spaced keys for a full reorder (``bulk_update``) and for ``rebalance``, which
+renumbers a board once its keys have grown too long.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import MoodBoardItem
+
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+# Keys longer than this trigger a rebalance (the column holds 64).
+MAX_LENGTH = 48
+
+
+def between(before=None, after=None):
+    """A key sorting after ``before`` and before ``after`` (``None``: open end)."""
+    lo = before or ""
+    if after is not None and lo >= after:
+        raise ValueError(f"{before!r} does not sort before {after!r}")
+    key = []
+    for i in range(max(len(lo), len(after or "")) + 1):
+        low = DIGITS.index(lo[i]) if i < len(lo) else 0
+        high = DIGITS.index(after[i]) if after is not None and i < len(after) else BASE
+        if high - low > 1:
+            key.append(DIGITS[(low + high) // 2])
+            return "".join(key)
+        key.append(DIGITS[low])
+        if high - low == 1:
+            # The prefix already sorts before ``after``: only ``lo`` bounds the rest.
+            after = None
+    raise AssertionError("unreachable")
+
+
+def after(key):
+    """A short key sorting after ``key``, for appending."""
+    if not key:
+        return between()
+    for i, digit in enumerate(key):
+        value = DIGITS.index(digit)
+        if value < BASE - 1:
+            return key[:i] + DIGITS[value + 1]
+    return between(key)
+
+
+def before(key):
+    """A short key sorting before ``key``, for prepending."""
+    for i, digit in enumerate(key):
+        value = DIGITS.index(digit)
+        if value > 1:
+            return key[:i] + DIGITS[value - 1]
+    return between(None, key)
+
+
+def sequence(count):
+    """``count`` ascending, evenly spaced keys."""
+    width = 1
+    while BASE**width <= count:
+        width += 1
+    step = BASE**width // (count + 1)
+    keys = []
+    for n in range(1, count + 1):
+        value, digits = step * n, []
+        for _ in range(width):
+            value, digit = divmod(value, BASE)
+            digits.append(DIGITS[digit])
+        keys.append("".join(reversed(digits)).rstrip("0"))
+    return keys
+
+
+def _ordered(mood_board_id):
+    return MoodBoardItem.objects.filter(
+        mood_board_id=mood_board_id, is_deleted=False
+    ).order_by("position", "id")
+
+
+def last(mood_board_id):
+    """The highest key on the board, or ``""``."""
+    key = (
+        MoodBoardItem.objects.filter(mood_board_id=mood_board_id, is_deleted=False)
+        .order_by("-position")
+        .values_list("position", flat=True)
+        .first()
+    )
+    return key or ""
+
+
+def neighbours(mood_board_id, item, place_after=None, place_before=None):
+    """Keys around the gap ``item`` moves into: after ``place_after`` and/or
+    before ``place_before`` (items on the same board). Raises ``ValueError``
+    when both are given in the wrong order."""
+    others = _ordered(mood_board_id).exclude(id=item.id)
+    if place_after is not None and place_before is not None:
+        if (place_after.position, place_after.id) >= (place_before.position, place_before.id):
+            raise ValueError("after_id must come before before_id")
+        return place_after.position, place_before.position
+    if place_after is not None:
+        following = (
+            others.filter(position__gte=place_after.position)
+            .exclude(position=place_after.position, id__lte=place_after.id)
+            .values_list("position", flat=True)
+            .first()
+        )
+        return place_after.position, following
+    preceding = (
+        others.filter(position__lte=place_before.position)
+        .exclude(position=place_before.position, id__gte=place_before.id)
+        .order_by("-position", "-id")
+        .values_list("position", flat=True)
+        .first()
+    )
+    return preceding, place_before.position
+
+
+def key_between(lo, hi):
+    """``between`` with shorter keys at the open ends; ``None`` when
+    ``lo``/``hi`` tie (the board needs a ``rebalance``)."""
+    if lo and hi is None:
+        return after(lo)
+    if hi and not lo:
+        return before(hi)
+    if hi is not None and (lo or "") >= hi:
+        return None
+    return between(lo or None, hi)
+
+
+def rebalance(mood_board_id):
+    """Renumber the board's live items, keeping their order."""
+    with transaction.atomic():
+        items = list(_ordered(mood_board_id).select_for_update())
+        for item, key in zip(items, sequence(len(items))):
+            item.position = key
+        MoodBoardItem.objects.bulk_update(items, ["position"])
+    return items
+
+
+def append_keys(mood_board_id, count):
+    """``count`` ascending keys after the board's last item."""
+    keys, key = [], last(mood_board_id)
+    for _ in range(count):
+        key = after(key)
+        keys.append(key)
+    return keys
+
+
+def move(item, place_after=None, place_before=None):
+    """Give ``item`` a key between its new neighbours, updating only its row
+    (the whole board when keys are tied or too long). Returns the key."""
+    board_id = item.mood_board_id
+    key = key_between(*neighbours(board_id, item, place_after, place_before))
+    if key is None or len(key) > MAX_LENGTH:
+        rebalance(board_id)
+        for neighbour in (place_after, place_before):
+            if neighbour is not None:
+                neighbour.refresh_from_db(fields=["position"])
+        key = key_between(*neighbours(board_id, item, place_after, place_before))
+    MoodBoardItem.objects.filter(id=item.id).update(position=key, updated_at=timezone.now())
+    item.position = key
+    return key
+
+
+def reorder(mood_board_id, item_ids):
+    """Renumber the board's live items in the order of ``item_ids``, which
+    must list each of them once. Returns the items, or ``None`` on a mismatch."""
+    with transaction.atomic():
+        items = {
+            item.id: item
+            for item in MoodBoardItem.objects.filter(
+                mood_board_id=mood_board_id, is_deleted=False
+            ).select_for_update()
+        }
+        if len(item_ids) != len(items) or set(item_ids) != set(items):
+            return None
+        ordered = [items[item_id] for item_id in item_ids]
+        now = timezone.now()
+        for item, key in zip(ordered, sequence(len(ordered))):
+            item.position = key
+            item.updated_at = now
+        MoodBoardItem.objects.bulk_update(ordered, ["position", "updated_at"], batch_size=500)
+    return ordered
@@ -0,0 +1,64 @@
+"""
+Reaction counts on mood board items.
+
+``MoodBoardItem.reaction_counts`` caches ``{reaction_type: count}`` for the
+item's ``MoodBoardReaction`` rows, so boards and the gallery show counts
+without a ``COUNT`` per item. The ``MoodBoardReaction`` signals in
+``planner.signals`` call ``refresh`` after every add and remove: it locks the
+item row, counts that type over the ``(item, user, type)`` unique index and
+writes the result back. Counting (instead of ``+1``/``-1`` on the JSON) keeps
+the cache exact under concurrent reactions, since the lock serializes the
+writes and each count sees the reactions committed before it. ``recount``
+rebuilds the counters in bulk after imports or manual fixes.
+"""
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import MoodBoardItem, MoodBoardReaction
+
+
+def refresh(item_id, reaction_type):
+    """Recount one reaction type on an item; returns the item's counts."""
+    with transaction.atomic():
+        counts = (
+            MoodBoardItem.objects.select_for_update()
+            .filter(id=item_id)
+            .values_list("reaction_counts", flat=True)
+            .first()
+        )
+        if counts is None:
+            # The item is being deleted along with its reactions.
+            return {}
+        total = MoodBoardReaction.objects.filter(
+            mood_board_item_id=item_id, reaction_type=reaction_type
+        ).count()
+        counts = dict(counts)
+        if total:
+            counts[reaction_type] = total
+        else:
+            counts.pop(reaction_type, None)
+        MoodBoardItem.objects.filter(id=item_id).update(reaction_counts=counts)
+    return counts
+
+
+def recount(item_ids=None):
+    """Rebuild ``reaction_counts`` from the reactions; returns items changed."""
+    items = MoodBoardItem.objects.all()
+    if item_ids is not None:
+        items = items.filter(id__in=item_ids)
+    reactions = MoodBoardReaction.objects.filter(mood_board_item__in=items)
+    actual = {}
+    for item_id, reaction_type, total in (
+        reactions.values_list("mood_board_item_id", "reaction_type")
+        .annotate(total=Count("id"))
+        .order_by()
+    ):
+        actual.setdefault(item_id, {})[reaction_type] = total
+    changed = [
+        MoodBoardItem(id=item_id, reaction_counts=actual.get(item_id, {}))
+        for item_id, counts in items.values_list("id", "reaction_counts").iterator()
+        if counts != actual.get(item_id, {})
+    ]
+    MoodBoardItem.objects.bulk_update(changed, ["reaction_counts"], batch_size=500)
+    return len(changed)
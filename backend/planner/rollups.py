@@ -0,0 +1,118 @@
+"""
+Budget rollup reconciliation.
+
+``EventBudgetCategory.planned_amount/spent_amount`` hold the sum of the
+category's non-deleted line items and ``EventBudget.total_planned/total_spent``
+the sum of its categories. The models keep both current with ``F()`` deltas
+on every ``save``/``delete`` (see ``BudgetLineItem.save``), taken from the
+stored row read under a lock, so reads never aggregate line items. Writes that bypass the models (queryset ``update()``,
+``bulk_create``, raw SQL) leave the totals behind; ``reconcile`` recomputes
+them from the source rows and reports how many rows were off.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from . import dashboard, versioning
+from .models import BudgetLineItem, Event, EventBudget, EventBudgetCategory
+
+ZERO = Value(Decimal("0"), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def totals_by_currency(couple_id):
+    """``(currency_code, planned, spent)`` summed over the budgets of the
+    couple's live (not soft-deleted) events."""
+    return list(
+        EventBudget.objects.filter(event__couple_id=couple_id, event__is_deleted=False)
+        .order_by()
+        .values("currency_code")
+        .annotate(planned=Sum("total_planned"), spent=Sum("total_spent"))
+        .values_list("currency_code", "planned", "spent")
+    )
+
+
+def shift_for_bulk_write(before, after):
+    """Roll up line items written with ``bulk_create``/``bulk_update``.
+
+    ``before`` holds the affected items as they were loaded (empty for
+    creates) and ``after`` as they were written; each category and its budget
+    get one update for the net change.
+    """
+    deltas = {}
+    for items, sign in ((before, -1), (after, 1)):
+        for item in items:
+            category_id, planned, spent = item.rollup_contribution()
+            total = deltas.setdefault(category_id, [0, 0])
+            total[0] += sign * planned
+            total[1] += sign * spent
+    for category_id, (planned, spent) in deltas.items():
+        if planned or spent:
+            EventBudgetCategory.shift_totals(category_id, planned, spent)
+
+
+def _sum_of(queryset, group_by, field):
+    total = queryset.order_by().values(group_by).annotate(total=Sum(field)).values("total")
+    return Coalesce(Subquery(total), ZERO)
+
+
+def _category_totals():
+    items = BudgetLineItem.objects.filter(
+        event_budget_category=OuterRef("pk"), is_deleted=False
+    )
+    return {
+        "planned_amount": _sum_of(items, "event_budget_category", "planned_amount"),
+        "spent_amount": _sum_of(items, "event_budget_category", "actual_amount"),
+    }
+
+
+def _budget_totals():
+    categories = EventBudgetCategory.objects.filter(event_budget=OuterRef("pk"))
+    return {
+        "total_planned": _sum_of(categories, "event_budget", "planned_amount"),
+        "total_spent": _sum_of(categories, "event_budget", "spent_amount"),
+    }
+
+
+def _fix(queryset, expected):
+    """Rewrite the rows of ``queryset`` whose totals differ from ``expected``."""
+    drift = Q()
+    for name in expected:
+        drift |= ~Q(**{name: F(f"expected_{name}")})
+    ids = list(
+        queryset.annotate(
+            **{f"expected_{name}": value for name, value in expected.items()}
+        )
+        .filter(drift)
+        .values_list("id", flat=True)
+    )
+    if ids:
+        queryset.model.objects.filter(id__in=ids).update(**expected)
+    return ids
+
+
+def reconcile(budget_ids=None):
+    """Recompute category and budget totals; returns ``(categories, budgets)`` fixed.
+
+    ``budget_ids`` limits the work to those budgets (and their categories).
+    """
+    categories = EventBudgetCategory.objects.all()
+    budgets = EventBudget.objects.all()
+    if budget_ids is not None:
+        categories = categories.filter(event_budget_id__in=budget_ids)
+        budgets = budgets.filter(id__in=budget_ids)
+
+    with transaction.atomic():
+        fixed_categories = _fix(categories, _category_totals())
+        fixed_budgets = _fix(budgets, _budget_totals())
+        # The updates bypass the model signals.
+        couple_ids = Event.objects.filter(
+            Q(event_budget__id__in=fixed_budgets)
+            | Q(event_budget__categories__id__in=fixed_categories)
+        ).values_list("couple_id", flat=True)
+        for couple_id in set(couple_ids):
+            versioning.bump(couple_id, "budget")
+            dashboard.refresh_sections(couple_id, "budget")
+    return len(fixed_categories), len(fixed_budgets)
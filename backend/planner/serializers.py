@@ -1,5 +1,7 @@
 from django.contrib.contenttypes.models import ContentType
 from rest_framework import serializers
+
+from . import media, storage
 from .models import (
     ActivityLog,
     BudgetCategory,
@@ -37,6 +39,9 @@ def _get_content_type(target_type: str):
 
 
 class MediaFileSerializer(serializers.ModelSerializer):
+    url = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = MediaFile
         fields = (
@@ -46,10 +51,29 @@ class MediaFileSerializer(serializers.ModelSerializer):
             "url",
             "mime_type",
             "size_bytes",
+            "sha256",
             "uploaded_by",
             "created_at",
+            "srcset",
+            "width",
+            "height",
+            "placeholder",
         )
-        read_only_fields = ("id", "couple", "uploaded_by", "created_at")
+        read_only_fields = (
+            "id",
+            "couple",
+            "uploaded_by",
+            "created_at",
+            "width",
+            "height",
+            "placeholder",
+        )
+
+    def get_url(self, obj):
+        return storage.url(obj.storage_key)
+
+    def get_srcset(self, obj):
+        return media.srcset(media.derivative_entries(obj))
 
 
 class MoodBoardItemSerializer(serializers.ModelSerializer):
@@ -67,10 +91,19 @@ class MoodBoardItemSerializer(serializers.ModelSerializer):
             "media_id",
             "caption",
             "position",
+            "reaction_counts",
             "created_by",
             "created_at",
         )
-        read_only_fields = ("id", "mood_board", "created_by", "created_at", "media")
+        read_only_fields = (
+            "id",
+            "mood_board",
+            "created_by",
+            "created_at",
+            "media",
+            "position",
+            "reaction_counts",
+        )
 
 
 class MoodBoardSerializer(serializers.ModelSerializer):
@@ -0,0 +1,166 @@
+"""
+Serving media bytes.
+
+``serve`` answers a request for a file under ``MEDIA_ROOT`` once the view has
+authorized it. ``MEDIA_SERVE_BACKEND`` picks how the bytes leave:
+
+- ``"python"``: ``FileResponse`` (``wsgi.file_wrapper`` where the server has
+  one), or a 206 stream for a single ``Range``
+- ``"nginx"``: ``X-Accel-Redirect`` to ``MEDIA_ACCEL_REDIRECT_PREFIX`` + key;
+  nginx needs an ``internal`` location aliasing ``MEDIA_ROOT`` there
+- ``"sendfile"``: ``X-Sendfile`` with the absolute path (Apache
+  mod_xsendfile, lighttpd)
+
+Media never changes once stored (keys are content-addressed, derivatives get
+new keys when re-rendered), so responses carry a strong ETag and a year-long
+``immutable`` ``Cache-Control``. They are ``private`` when access was checked
+per couple and ``public`` for signed URLs, so a CDN can cache them.
+
+The stored type comes from the uploader, so only types a browser renders
+without running script (``INLINE_TYPES``, never SVG) are served inline; the
+rest are sent as an ``attachment`` under ``Content-Security-Policy: sandbox``,
+and every response carries ``X-Content-Type-Options: nosniff``. Remote
+storage has no local file to hand over; those requests are redirected to the
+storage URL instead (see ``planner.storage``).
+"""
+
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import (
+    FileResponse,
+    HttpResponse,
+    HttpResponseNotModified,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
+from django.utils.http import content_disposition_header, parse_etags, quote_etag
+
+from . import storage
+
+READ_BLOCK = 64 * 1024
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# Served inline; everything else is downloaded. SVG is an image that runs script.
+INLINE_TYPES = ("image/", "video/", "application/pdf")
+SCRIPTABLE_TYPES = {"image/svg+xml"}
+
+
+class Unsatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """``(start, end)`` (inclusive) for a single byte range, else ``None``.
+
+    Multiple ranges and malformed headers are ignored (the whole file is
+    sent); a range that starts past the end raises ``Unsatisfiable``.
+    """
+    match = RANGE.match((header or "").strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # Suffix range: the last N bytes.
+        length = int(last)
+        if length == 0:
+            raise Unsatisfiable
+        return max(0, size - length), size - 1
+    start = int(first)
+    if start >= size:
+        raise Unsatisfiable
+    end = int(last) if last else size - 1
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _read(path, start, length):
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        while length:
+            block = fh.read(min(READ_BLOCK, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def _cache_headers(response, etag, public):
+    scope = "public" if public else "private"
+    response["ETag"] = etag
+    response["Cache-Control"] = f"{scope}, max-age={settings.MEDIA_CACHE_MAX_AGE}, immutable"
+    return response
+
+
+def is_inline(content_type):
+    base = (content_type or "").split(";")[0].strip().lower()
+    return base.startswith(INLINE_TYPES) and base not in SCRIPTABLE_TYPES
+
+
+def _content_headers(response, storage_key, content_type, etag, public):
+    response["X-Content-Type-Options"] = "nosniff"
+    if not is_inline(content_type):
+        response["Content-Disposition"] = content_disposition_header(
+            True, os.path.basename(storage_key)
+        )
+        response["Content-Security-Policy"] = "sandbox"
+    return _cache_headers(response, etag, public)
+
+
+def serve(request, storage_key, content_type, version, public=False):
+    """Response for ``storage_key`` in media storage, or ``None`` if it is missing.
+
+    ``content_type`` is the stored type (``None``: unknown, sent as
+    ``application/octet-stream``); ``version`` identifies the content (e.g.
+    its SHA-256) and becomes the ETag.
+    """
+    path = storage.local_path(storage_key)
+    if path is None:
+        return HttpResponseRedirect(storage.get_storage().url(storage_key))
+    if not os.path.isfile(path):
+        return None
+    etag = quote_etag(version)
+    content_type = content_type or "application/octet-stream"
+
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if if_none_match:
+        tags = parse_etags(if_none_match)
+        if etag in tags or "*" in tags:
+            return _cache_headers(HttpResponseNotModified(), etag, public)
+
+    backend = settings.MEDIA_SERVE_BACKEND
+    if backend == "nginx":
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(storage_key)
+        return _content_headers(response, storage_key, content_type, etag, public)
+    if backend == "sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = path
+        return _content_headers(response, storage_key, content_type, etag, public)
+
+    size = os.path.getsize(path)
+    byte_range = None
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range or if_range == etag:
+        try:
+            byte_range = parse_range(request.META.get("HTTP_RANGE"), size)
+        except Unsatisfiable:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    if byte_range is None:
+        response = FileResponse(open(path, "rb"), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read(path, start, end - start + 1), status=206, content_type=content_type
+        )
+        response["Content-Length"] = end - start + 1
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Accept-Ranges"] = "bytes"
+    return _content_headers(response, storage_key, content_type, etag, public)
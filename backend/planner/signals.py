@@ -0,0 +1,153 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import currency, dashboard, quota, reactions, versioning
+from .membership import invalidate_active_couple, membership_changed
+from .models import (
+    ActivityLog,
+    BudgetLineItem,
+    Comment,
+    Couple,
+    CoupleMember,
+    CoupleStorageUsage,
+    CoupleVersion,
+    Event,
+    EventBudget,
+    EventBudgetCategory,
+    ExchangeRate,
+    HoneymoonItem,
+    HoneymoonPlan,
+    MediaFile,
+    MoodBoard,
+    MoodBoardItem,
+    MoodBoardReaction,
+    Task,
+)
+
+
+@receiver(post_save, sender=CoupleMember)
+@receiver(post_delete, sender=CoupleMember)
+def _couple_member_changed(sender, instance, **kwargs):
+    membership_changed(instance.user_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def _user_saved(sender, instance, created, **kwargs):
+    if created:
+        # A brand new user has no memberships; drop anything cached under a
+        # reused primary key.
+        invalidate_active_couple(instance.id)
+    elif not instance.is_active:
+        # Stop trusting claims in tokens issued to a deactivated user.
+        membership_changed(instance.id)
+
+
+@receiver(post_save, sender=Couple)
+def _couple_created(sender, instance, created, **kwargs):
+    if created:
+        CoupleVersion.objects.get_or_create(couple=instance)
+        CoupleStorageUsage.objects.get_or_create(couple=instance)
+
+
+@receiver(post_save, sender=MediaFile)
+def _media_file_saved(sender, instance, created, **kwargs):
+    if created:
+        quota.charge(instance.couple_id, instance.size_bytes)
+
+
+@receiver(post_delete, sender=MediaFile)
+def _media_file_deleted(sender, instance, **kwargs):
+    quota.charge(instance.couple_id, -instance.size_bytes)
+
+
+@receiver(post_save, sender=MoodBoardReaction)
+@receiver(post_delete, sender=MoodBoardReaction)
+def _reaction_changed(sender, instance, **kwargs):
+    reactions.refresh(instance.mood_board_item_id, instance.reaction_type)
+
+
+@receiver(post_delete, sender=EventBudgetCategory)
+def _budget_category_deleted(sender, instance, **kwargs):
+    # Line items cascade with their category without touching the totals;
+    # take the category's whole contribution off its budget instead.
+    if instance.planned_amount or instance.spent_amount:
+        EventBudget.shift_totals(
+            instance.event_budget_id, -instance.planned_amount, -instance.spent_amount
+        )
+
+
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+def _exchange_rate_changed(sender, instance, **kwargs):
+    currency.rates_changed()
+
+
+def _event_couple_id(**filters):
+    return Event.objects.filter(**filters).values_list("couple_id", flat=True).first()
+
+
+# Writes to a couple's data bump its versions (ETags) and refresh the
+# dashboard snapshot sections they can affect:
+# model -> (couple id of an instance, version resources, dashboard sections)
+TRACKED_MODELS = {
+    Couple: (lambda i: i.id, ("profile",), ("couple_name",)),
+    Event: (
+        lambda i: i.couple_id,
+        ("events",),
+        # budget: soft-deleted events' budgets are left out of the totals.
+        ("upcoming_events", "honeymoon", "moodboard_highlights", "budget"),
+    ),
+    EventBudget: (lambda i: _event_couple_id(id=i.event_id), ("budget",), ("budget",)),
+    EventBudgetCategory: (
+        lambda i: _event_couple_id(event_budget__id=i.event_budget_id),
+        ("budget",),
+        ("budget",),
+    ),
+    BudgetLineItem: (
+        lambda i: _event_couple_id(
+            event_budget__categories__id=i.event_budget_category_id
+        ),
+        ("budget",),
+        ("budget",),
+    ),
+    HoneymoonPlan: (
+        lambda i: _event_couple_id(id=i.event_id),
+        ("honeymoon",),
+        ("honeymoon",),
+    ),
+    HoneymoonItem: (
+        lambda i: _event_couple_id(honeymoon_plan__id=i.honeymoon_plan_id),
+        ("honeymoon",),
+        (),
+    ),
+    MoodBoard: (lambda i: _event_couple_id(id=i.event_id), ("moodboard",), ()),
+    MoodBoardItem: (
+        lambda i: _event_couple_id(mood_board__id=i.mood_board_id),
+        ("moodboard",),
+        ("moodboard_highlights",),
+    ),
+    MoodBoardReaction: (
+        lambda i: _event_couple_id(mood_board__items__id=i.mood_board_item_id),
+        ("moodboard",),
+        (),
+    ),
+    MediaFile: (lambda i: i.couple_id, ("moodboard",), ()),
+    Task: (lambda i: i.couple_id, ("tasks",), ()),
+    ActivityLog: (lambda i: i.couple_id, ("activity",), ("recent_activity",)),
+    Comment: (lambda i: i.couple_id, ("comments",), ()),
+}
+
+
+def _planner_data_changed(sender, instance, created=False, **kwargs):
+    couple_id_for, resources, sections = TRACKED_MODELS[sender]
+    couple_id = couple_id_for(instance)
+    versioning.bump(couple_id, *resources)
+    # A couple that was just created has no snapshot to refresh yet.
+    if sections and not (created and sender is Couple):
+        dashboard.refresh_sections(couple_id, *sections)
+
+
+for _model in TRACKED_MODELS:
+    post_save.connect(_planner_data_changed, sender=_model)
+    post_delete.connect(_planner_data_changed, sender=_model)
@@ -0,0 +1,122 @@
+"""
+Near-duplicate detection for mood board images.
+
+Every image gets a 64-bit difference hash (``MediaFile.dhash``, computed with
+its derivatives). Two images look alike when the Hamming distance between
+their hashes is small (``MEDIA_SIMILARITY_THRESHOLD`` bits by default). The
+hashes of a couple's live mood board items are loaded into a ``uint64`` array
+and compared with NumPy: XOR against a block of rows, popcount, threshold.
+``clusters`` joins the matching pairs into groups; ``similar_to`` compares
+one image against the rest.
+"""
+
+import numpy as np
+
+from .models import MoodBoardItem
+
+# Rows of the distance matrix computed at a time (BLOCK x n uint64 values).
+BLOCK = 512
+
+if hasattr(np, "bitwise_count"):
+    _popcount = np.bitwise_count
+else:  # NumPy < 2.0
+    _BITS = np.array([bin(n).count("1") for n in range(256)], dtype=np.uint8)
+
+    def _popcount(values):
+        as_bytes = values.view(np.uint8).reshape(values.shape + (8,))
+        return _BITS[as_bytes].sum(axis=-1, dtype=np.uint8)
+
+
+def _items(couple_id, event_id=None):
+    """``(item ids, media ids, event ids, hashes)`` of the couple's hashed board images."""
+    items = MoodBoardItem.objects.filter(
+        mood_board__event__couple_id=couple_id,
+        mood_board__event__is_deleted=False,
+        is_deleted=False,
+        media__dhash__isnull=False,
+    )
+    if event_id is not None:
+        items = items.filter(mood_board__event_id=event_id)
+    rows = list(
+        items.order_by("id").values_list("id", "media_id", "mood_board__event_id", "media__dhash")
+    )
+    if not rows:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty, empty.view(np.uint64)
+    item_ids, media_ids, event_ids, hashes = (np.array(col) for col in zip(*rows))
+    return item_ids, media_ids, event_ids, hashes.astype(np.int64).view(np.uint64)
+
+
+def distances(needles, hashes):
+    """Hamming distance matrix between two ``uint64`` hash arrays."""
+    return _popcount(needles[:, None] ^ hashes[None, :])
+
+
+def _pairs(hashes, threshold):
+    """``(i, j)`` index pairs with ``i < j`` and distance <= ``threshold``."""
+    firsts, seconds = [], []
+    for start in range(0, len(hashes), BLOCK):
+        block = distances(hashes[start : start + BLOCK], hashes)
+        i, j = np.nonzero(block <= threshold)
+        i += start
+        upper = i < j
+        firsts.append(i[upper])
+        seconds.append(j[upper])
+    if not firsts:
+        return np.array([], dtype=np.intp), np.array([], dtype=np.intp)
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+
+def clusters(couple_id, threshold, event_id=None):
+    """Groups of two or more look-alike mood board items."""
+    item_ids, media_ids, event_ids, hashes = _items(couple_id, event_id)
+    firsts, seconds = _pairs(hashes, threshold)
+
+    # Connected components over the matching pairs (union-find).
+    parent = list(range(len(hashes)))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in zip(firsts.tolist(), seconds.tolist()):
+        parent[root(i)] = root(j)
+
+    groups = {}
+    for i in sorted(set(firsts.tolist()) | set(seconds.tolist())):
+        groups.setdefault(root(i), []).append(i)
+    return [
+        {
+            "items": [
+                {
+                    "item_id": int(item_ids[i]),
+                    "media_id": int(media_ids[i]),
+                    "event_id": int(event_ids[i]),
+                }
+                for i in members
+            ]
+        }
+        for members in groups.values()
+    ]
+
+
+def similar_to(couple_id, dhash, threshold, exclude_media_id=None):
+    """Mood board items within ``threshold`` bits of ``dhash``, closest first."""
+    item_ids, media_ids, event_ids, hashes = _items(couple_id)
+    needle = np.array([dhash], dtype=np.int64).view(np.uint64)
+    found = distances(needle, hashes)[0]
+    matches = np.flatnonzero(found <= threshold)
+    if exclude_media_id is not None:
+        matches = matches[media_ids[matches] != exclude_media_id]
+    matches = matches[np.argsort(found[matches], kind="stable")]
+    return [
+        {
+            "item_id": int(item_ids[i]),
+            "media_id": int(media_ids[i]),
+            "event_id": int(event_ids[i]),
+            "distance": int(found[i]),
+        }
+        for i in matches
+    ]
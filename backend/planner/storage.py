@@ -0,0 +1,108 @@
+"""
+Media storage and URLs.
+
+Media lives in Django's ``default`` storage (``STORAGES``, picked by
+``MEDIA_STORAGE_BACKEND``): the local filesystem under ``MEDIA_ROOT``, or any
+S3-compatible bucket through django-storages (MinIO stands in for S3 in
+development). Rows only keep their ``storage_key``; ``url`` turns it into a
+URL when a response is built, so a new host or CDN is a settings change:
+
+- ``MEDIA_CDN_BASE_URL`` + key when set, else the storage's own URL
+- with ``MEDIA_URL_SIGNING_KEY`` set, ``?expires=<ts>&signature=<hex>`` is
+  appended, the HMAC-SHA256 of ``"<key>:<expires>"``. The expiry is rounded
+  up to a ``MEDIA_URL_TTL`` window, so a URL stays the same (and browser
+  cacheable) within a window, and signatures are memoized per window.
+  ``verify`` checks them for ``MediaSignedContentView``; signed URLs point
+  there unless ``MEDIA_CDN_BASE_URL`` names a CDN that uses it as its origin
+  (the storage's own URL would serve the file without checking).
+
+URLs are always absolute: a bare path is prefixed with ``MEDIA_PUBLIC_ORIGIN``
+because the frontend loads media from another origin.
+
+Views that embed media URLs add ``url_version()`` to their ETag so clients
+pick up re-signed URLs.
+"""
+
+import functools
+import hashlib
+import hmac
+import shutil
+import tempfile
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import storages
+from django.urls import reverse
+
+
+def get_storage():
+    return storages["default"]
+
+
+def local_path(key):
+    """Filesystem path of ``key``, or ``None`` when storage is remote."""
+    try:
+        return get_storage().path(key)
+    except NotImplementedError:
+        return None
+
+
+def fetch(key):
+    """A local path holding ``key``'s bytes and whether it is a temporary copy."""
+    path = local_path(key)
+    if path is not None:
+        return path, False
+    with get_storage().open(key, "rb") as source, tempfile.NamedTemporaryFile(
+        delete=False
+    ) as copy:
+        shutil.copyfileobj(source, copy)
+    return copy.name, True
+
+
+def _sign(key, expires, secret):
+    message = f"{key}:{expires}".encode()
+    return hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+_cached_signature = functools.lru_cache(maxsize=16384)(_sign)
+
+
+def url_version(now=None):
+    """Current signing window (0 when URLs are not signed)."""
+    if not settings.MEDIA_URL_SIGNING_KEY:
+        return 0
+    return int(now or time.time()) // settings.MEDIA_URL_TTL
+
+
+def url(key, now=None):
+    base = settings.MEDIA_CDN_BASE_URL
+    secret = settings.MEDIA_URL_SIGNING_KEY
+    if base:
+        location = f"{base.rstrip('/')}/{quote(key)}"
+    elif secret:
+        location = reverse("media-signed-content", kwargs={"storage_key": key})
+    else:
+        location = get_storage().url(key)
+    if location.startswith("/"):
+        location = settings.MEDIA_PUBLIC_ORIGIN.rstrip("/") + location
+    if not secret:
+        return location
+    # Valid for at least one full window.
+    expires = (url_version(now) + 2) * settings.MEDIA_URL_TTL
+    separator = "&" if "?" in location else "?"
+    signature = _cached_signature(key, expires, secret)
+    return f"{location}{separator}expires={expires}&signature={signature}"
+
+
+def verify(key, expires, signature, now=None):
+    secret = settings.MEDIA_URL_SIGNING_KEY
+    if not secret or not signature:
+        return False
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    if expires < (now or time.time()):
+        return False
+    return hmac.compare_digest(_sign(key, expires, secret), signature)
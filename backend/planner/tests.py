@@ -1,32 +1,74 @@
+import csv
+import hashlib
+import os
 import shutil
 import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
 from unittest import mock
+import numpy as np
+from PIL import ExifTags, Image
+from django.core.management import call_command
 from django.utils import timezone
+from django.core.files.storage import FileSystemStorage
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.renderers import JSONRenderer
+from django.db import OperationalError, connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase, APITransactionTestCase
 from rest_framework_simplejwt.tokens import AccessToken
+from accounts.authentication import clear_caches
 from accounts.models import User
+from . import (
+    analytics,
+    budget_json,
+    currency,
+    dashboard,
+    derivatives,
+    gallery,
+    imaging,
+    media_gc,
+    membership,
+    quota,
+    ranking,
+    reactions,
+    rollups,
+    similarity,
+    storage,
+    uploads,
+)
 from .models import (
     ActivityLog,
     Comment,
     Couple,
     CoupleMember,
+    DashboardSnapshot,
     EventType,
     Event,
     EventBudget,
     MoodBoardItem,
+    MoodBoardReaction,
     MoodBoard,
     MediaFile,
     EventBudgetCategory,
     BudgetLineItem,
+    ExchangeRate,
     HoneymoonPlan,
     HoneymoonItem,
     BudgetCategory,
     Notification,
     Task,
+    UploadSession,
 )
+from .media import content_key
+from .serializers import MediaFileSerializer
+from .views import _serialized_budget
 from django.conf import settings
 
 
@@ -74,7 +116,7 @@ class MoodboardFlowTests(APITestCase):
         # upload media
         file = SimpleUploadedFile("test.jpg", b"filecontent", content_type="image/jpeg")
         with self.settings(MEDIA_ROOT=self._media_dir), mock.patch(
-            "planner.views.FileSystemStorage.save", return_value="test.jpg"
+            "django.core.files.storage.FileSystemStorage.save", return_value="test.jpg"
         ):
             res = self.client.post("/api/media/upload/", {"file": file}, **self.auth)
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
@@ -455,7 +497,6 @@ class DashboardSummaryTests(APITestCase):
         media = MediaFile.objects.create(
             couple=self.couple,
             storage_key="img.jpg",
-            url="http://example.com/img.jpg",
             mime_type="image/jpeg",
             size_bytes=100,
             uploaded_by=self.user,
@@ -476,3 +517,1555 @@ class DashboardSummaryTests(APITestCase):
         self.assertIsNotNone(data["honeymoon"])
         self.assertTrue(len(data["moodboard_highlights"]) >= 1)
         self.assertTrue(len(data["recent_activity"]) >= 1)
+
+
+class ActiveCoupleCacheTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="cache@example.com", password="password123"
+        )
+        self.couple = Couple.objects.create(name="Cache Couple")
+        self.membership = CoupleMember.objects.create(
+            couple=self.couple,
+            user=self.user,
+            status="active",
+            role="bride",
+            is_owner=True,
+        )
+        token = AccessToken.for_user(self.user)
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {str(token)}"}
+
+    def test_membership_lookup_cached_across_requests(self):
+        res = self.client.get("/api/calendar/", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # only the events query; user and membership come from the caches
+        with self.assertNumQueries(1):
+            res = self.client.get("/api/calendar/", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_membership_change_invalidates_cache(self):
+        res = self.client.get("/api/tasks/", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.membership.status = "left"
+        self.membership.save()
+        res = self.client.post("/api/tasks/", {"title": "x"}, **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CoupleClaimsAuthenticationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="claims@example.com", password="password123"
+        )
+        self.couple = Couple.objects.create(name="Claims Couple")
+        self.membership = CoupleMember.objects.create(
+            couple=self.couple,
+            user=self.user,
+            status="active",
+            role="bride",
+            is_owner=True,
+        )
+        res = self.client.post(
+            "/api/auth/login/",
+            {"email": self.user.email, "password": "password123"},
+            format="json",
+        )
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {res.json()['data']['access']}"}
+
+    def test_claims_authorize_without_auth_queries(self):
+        token = AccessToken(self.auth["HTTP_AUTHORIZATION"].split()[1])
+        self.assertEqual(token["couple_id"], self.couple.id)
+        self.assertEqual(token["couple_role"], "bride")
+
+        self.client.get("/api/calendar/", **self.auth)
+        # only the events query remains
+        with self.assertNumQueries(1):
+            res = self.client.get("/api/calendar/", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_stale_claims_fall_back_to_database(self):
+        self.membership.status = "left"
+        self.membership.save()
+        res = self.client.get("/api/calendar/", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()["data"], [])
+        res = self.client.post("/api/tasks/", {"title": "x"}, **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_deactivation_by_update_stops_trusting_claims(self):
+        # update() skips the signal that bumps the membership version.
+        User.objects.filter(id=self.user.id).update(is_active=False)
+        # Once the cached version and user expire:
+        membership.invalidate_active_couple(self.user.id)
+        clear_caches()
+        res = self.client.get("/api/calendar/", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_restamps_membership(self):
+        res = self.client.post(
+            "/api/auth/login/",
+            {"email": self.user.email, "password": "password123"},
+            format="json",
+        )
+        refresh = res.json()["data"]["refresh"]
+        self.membership.status = "left"
+        self.membership.save()
+        res = self.client.post("/api/auth/refresh/", {"refresh": refresh}, format="json")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        token = AccessToken(res.json()["access"])
+        self.assertIsNone(token["couple_id"])
+        self.user.refresh_from_db()
+        self.assertEqual(token["mv"], self.user.membership_version)
+
+
+class DashboardSnapshotTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="snap@example.com", password="password123"
+        )
+        self.couple = Couple.objects.create(name="Snap Couple")
+        CoupleMember.objects.create(
+            couple=self.couple,
+            user=self.user,
+            status="active",
+            role="groom",
+            is_owner=True,
+        )
+        self.event_type = EventType.objects.create(
+            key="wedding_night", name_en="Wedding Night"
+        )
+        self.event = Event.objects.create(
+            couple=self.couple,
+            event_type=self.event_type,
+            title="Wedding Night",
+            start_date=timezone.now().date(),
+        )
+        token = AccessToken.for_user(self.user)
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {str(token)}"}
+
+    def test_snapshot_read_is_single_query_and_tracks_writes(self):
+        self.client.get("/api/dashboard/summary/", **self.auth)
+        with self.assertNumQueries(1):
+            res = self.client.get("/api/dashboard/summary/", **self.auth)
+        self.assertEqual(res.json()["data"]["recent_activity"], [])
+
+        ActivityLog.objects.create(couple=self.couple, actor=self.user, verb="x")
+        self.couple.name = "Renamed"
+        self.couple.save()
+        res = self.client.get("/api/dashboard/summary/", **self.auth)
+        data = res.json()["data"]
+        self.assertEqual(data["couple_name"], "Renamed")
+        self.assertEqual(len(data["recent_activity"]), 1)
+
+    def test_stale_snapshot_rebuilt_on_read(self):
+        self.client.get("/api/dashboard/summary/", **self.auth)
+        # bypasses signals, so only the staleness bound picks it up
+        Event.objects.filter(id=self.event.id).update(title="Updated")
+        DashboardSnapshot.objects.filter(couple=self.couple).update(
+            rebuilt_at=timezone.now() - timezone.timedelta(days=1)
+        )
+        res = self.client.get("/api/dashboard/summary/", **self.auth)
+        self.assertEqual(res.json()["data"]["upcoming_events"][0]["title"], "Updated")
+
+
+@override_settings(DASHBOARD_PARALLEL_SECTIONS=True, DASHBOARD_SECTION_TIMEOUT=0.5)
+class ParallelDashboardTests(APITransactionTestCase):
+    # Transaction test case: worker threads use their own connections and
+    # must see committed data.
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="parallel@example.com", password="password123"
+        )
+        self.couple = Couple.objects.create(name="Parallel Couple")
+        CoupleMember.objects.create(
+            couple=self.couple,
+            user=self.user,
+            status="active",
+            role="groom",
+            is_owner=True,
+        )
+        ActivityLog.objects.create(couple=self.couple, actor=self.user, verb="x")
+        token = AccessToken.for_user(self.user)
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {str(token)}"}
+
+    def test_sections_built_concurrently(self):
+        res = self.client.get("/api/dashboard/summary/", **self.auth)
+        data = res.json()["data"]
+        self.assertEqual(data["couple_name"], "Parallel Couple")
+        self.assertEqual(len(data["recent_activity"]), 1)
+        self.assertTrue(DashboardSnapshot.objects.filter(couple=self.couple).exists())
+
+    def test_slow_section_returns_partial_result(self):
+        def slow(couple_id, today):
+            time.sleep(1)
+            return "late"
+
+        with mock.patch.dict(dashboard.SECTION_BUILDERS, {"couple_name": slow}):
+            res = self.client.get("/api/dashboard/summary/", **self.auth)
+        data = res.json()["data"]
+        self.assertIsNone(data["couple_name"])
+        self.assertEqual(len(data["recent_activity"]), 1)
+        self.assertFalse(DashboardSnapshot.objects.filter(couple=self.couple).exists())
+
+    def test_slow_query_is_aborted_at_the_timeout(self):
+        finished = threading.Event()
+        errors = []
+
+        def stuck(couple_id, today):
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) "
+                        "SELECT count(*) FROM (SELECT x FROM n LIMIT 10000000000)"
+                    )
+            except Exception as exc:
+                errors.append(exc)
+                raise
+            finally:
+                finished.set()
+
+        with mock.patch.dict(dashboard.SECTION_BUILDERS, {"couple_name": stuck}):
+            self.client.get("/api/dashboard/summary/", **self.auth)
+            # The worker is released shortly after the timeout.
+            self.assertTrue(finished.wait(5))
+        self.assertIsInstance(errors[0], OperationalError)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="etag@example.com", password="password123"
+        )
+        self.couple = Couple.objects.create(name="ETag Couple")
+        CoupleMember.objects.create(
+            couple=self.couple,
+            user=self.user,
+            status="active",
+            role="bride",
+            is_owner=True,
+        )
+        self.event_type = EventType.objects.create(
+            key="wedding_night", name_en="Wedding Night"
+        )
+        self.event = Event.objects.create(
+            couple=self.couple, event_type=self.event_type, title="Wedding Night"
+        )
+        token = AccessToken.for_user(self.user)
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {str(token)}"}
+
+    def test_unchanged_events_return_304_without_queries(self):
+        res = self.client.get("/api/events/", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        etag = res["ETag"]
+
+        with self.assertNumQueries(0):
+            res = self.client.get("/api/events/", HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res["ETag"], etag)
+
+        self.event.title = "Renamed"
+        self.event.save()
+        res = self.client.get("/api/events/", HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res["ETag"], etag)
+
+    def test_versions_are_per_resource(self):
+        res = self.client.get("/api/tasks/", **self.auth)
+        etag = res["ETag"]
+        ActivityLog.objects.create(couple=self.couple, actor=self.user, verb="x")
+        res = self.client.get("/api/tasks/", HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        Task.objects.create(couple=self.couple, title="Book venue")
+        res = self.client.get("/api/tasks/", HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class BudgetRollupTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="rollup@example.com", password="password123"
+        )
+        self.couple = Couple.objects.create(name="Rollup Couple")
+        CoupleMember.objects.create(
+            couple=self.couple,
+            user=self.user,
+            status="active",
+            role="groom",
+            is_owner=True,
+        )
+        event_type = EventType.objects.create(key="wedding_night", name_en="Wedding Night")
+        event = Event.objects.create(couple=self.couple, event_type=event_type)
+        self.budget = EventBudget.objects.create(event=event)
+        self.category = EventBudgetCategory.objects.create(
+            event_budget=self.budget,
+            category=BudgetCategory.objects.create(key="venue", label="Venue"),
+        )
+        token = AccessToken.for_user(self.user)
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {str(token)}"}
+
+    def assertTotals(self, planned, spent):
+        self.category.refresh_from_db()
+        self.budget.refresh_from_db()
+        self.assertEqual(self.category.planned_amount, Decimal(planned))
+        self.assertEqual(self.category.spent_amount, Decimal(spent))
+        self.assertEqual(self.budget.total_planned, Decimal(planned))
+        self.assertEqual(self.budget.total_spent, Decimal(spent))
+
+    def test_line_items_roll_up(self):
+        res = self.client.post(
+            f"/api/budget/categories/{self.category.id}/items/",
+            {"label": "Hall", "planned_amount": "1000.00", "actual_amount": "250.00"},
+            **self.auth,
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertTotals("1000.00", "250.00")
+
+        item = BudgetLineItem.objects.create(
+            event_budget_category=self.category, label="Cake", planned_amount=200
+        )
+        self.assertTotals("1200.00", "250.00")
+
+        item.actual_amount = Decimal("180.00")
+        item.save()
+        self.assertTotals("1200.00", "430.00")
+
+        item.is_deleted = True
+        item.save()
+        self.assertTotals("1000.00", "250.00")
+
+        BudgetLineItem.objects.get(label="Hall").delete()
+        self.assertTotals("0.00", "0.00")
+
+        res = self.client.get("/api/dashboard/summary/", **self.auth)
+        budget = res.json()["data"]["budget"]
+        self.assertEqual((budget["planned"], budget["spent"]), ("0.00", "0.00"))
+
+    def test_concurrent_edits_move_from_the_stored_amounts(self):
+        BudgetLineItem.objects.create(
+            event_budget_category=self.category, label="Hall", planned_amount=100
+        )
+        # Two requests load the item before either saves it.
+        first = BudgetLineItem.objects.get(label="Hall")
+        second = BudgetLineItem.objects.get(label="Hall")
+        first.planned_amount = Decimal("200.00")
+        first.save()
+        second.planned_amount = Decimal("300.00")
+        second.save()
+        self.assertTotals("300.00", "0.00")
+
+        first.delete()
+        self.assertTotals("0.00", "0.00")
+
+    def test_reconcile_fixes_drift(self):
+        BudgetLineItem.objects.create(
+            event_budget_category=self.category, label="Hall", planned_amount=500
+        )
+        # bulk_create bypasses save(), so the totals fall behind.
+        BudgetLineItem.objects.bulk_create(
+            [BudgetLineItem(event_budget_category=self.category, label="DJ", planned_amount=300)]
+        )
+        self.assertTotals("500.00", "0.00")
+
+        out = StringIO()
+        call_command("reconcile_budget_totals", stdout=out)
+        self.assertIn("Corrected 1 category total(s) and 1 budget total(s)", out.getvalue())
+        self.assertTotals("800.00", "0.00")
+
+        self.assertEqual(rollups.reconcile(), (0, 0))
+
+    def test_batch_line_items(self):
+        hall = BudgetLineItem.objects.create(
+            event_budget_category=self.category, label="Hall", planned_amount=1000
+        )
+        dj = BudgetLineItem.objects.create(
+            event_budget_category=self.category, label="DJ", planned_amount=300
+        )
+        url = f"/api/budget/categories/{self.category.id}/items/batch/"
+        operations = [
+            {"op": "create", "label": f"Line {n}", "planned_amount": "10.00"}
+            for n in range(20)
+        ]
+        operations += [
+            {"op": "update", "id": hall.id, "actual_amount": "400.00"},
+            {"op": "delete", "id": dj.id},
+        ]
+        res = self.client.post(url, {"operations": operations}, format="json", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        data = res.json()["data"]
+        self.assertEqual(len(data["created"]), 20)
+        self.assertEqual(data["updated"][0]["actual_amount"], "400.00")
+        self.assertEqual(data["deleted"], [dj.id])
+        self.assertTrue(BudgetLineItem.objects.get(id=dj.id).is_deleted)
+        self.assertTotals("1200.00", "400.00")
+        self.assertEqual(rollups.reconcile(), (0, 0))
+
+    def test_batch_is_all_or_nothing(self):
+        url = f"/api/budget/categories/{self.category.id}/items/batch/"
+        operations = [
+            {"op": "create", "label": "Cake", "planned_amount": "50.00"},
+            {"op": "update", "id": 999999, "label": "Missing"},
+        ]
+        res = self.client.post(url, {"operations": operations}, format="json", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        res = self.client.post(
+            url, {"operations": [{"op": "create", "planned_amount": "1"}]}, format="json", **self.auth
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(BudgetLineItem.objects.exists())
+        self.assertTotals("0.00", "0.00")
+
+
+class BudgetReadTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="budgetjson@example.com", password="password123"
+        )
+        self.couple = Couple.objects.create(name="JSON Couple")
+        CoupleMember.objects.create(
+            couple=self.couple,
+            user=self.user,
+            status="active",
+            role="bride",
+            is_owner=True,
+        )
+        event_type = EventType.objects.create(key="wedding_night", name_en="Wedding Night")
+        self.event = Event.objects.create(couple=self.couple, event_type=event_type)
+        self.budget = EventBudget.objects.create(event=self.event, currency_code="OMR")
+        venue = EventBudgetCategory.objects.create(
+            event_budget=self.budget,
+            category=BudgetCategory.objects.create(
+                key="venue", label="Venue", sort_order=2, is_default_for_omani=True
+            ),
+        )
+        EventBudgetCategory.objects.create(
+            event_budget=self.budget,
+            category=BudgetCategory.objects.create(key="dress", label="فستان"),
+        )
+        hall = BudgetLineItem.objects.create(
+            event_budget_category=venue,
+            label="Hall \"A\"",
+            planned_amount=Decimal("1234.5"),
+            actual_amount=Decimal("99.99"),
+            notes="Deposit\nbalance due",
+            paid_on=timezone.now().date(),
+            created_by=self.user,
+        )
+        BudgetLineItem.objects.create(event_budget_category=venue, label="Chairs")
+        BudgetLineItem.objects.create(
+            event_budget_category=venue, label="Gone", planned_amount=5, is_deleted=True
+        )
+        # isoformat() drops a zero fraction; make sure the SQL does too.
+        BudgetLineItem.objects.filter(id=hall.id).update(
+            created_at=timezone.now().replace(microsecond=0)
+        )
+        token = AccessToken.for_user(self.user)
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {str(token)}"}
+
+    def test_matches_serializer_output_byte_for_byte(self):
+        with self.assertNumQueries(1):
+            data = budget_json.budget_json(self.event.id, self.couple.id)
+        expected = JSONRenderer().render({"data": _serialized_budget(self.budget.id), "error": None})
+        self.assertEqual(JSONRenderer().render({"data": data, "error": None}), expected)
+
+        res = self.client.get(f"/api/events/{self.event.id}/budget/", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.content, expected)
+
+    def test_missing_budget_is_created(self):
+        self.budget.delete()
+        res = self.client.get(f"/api/events/{self.event.id}/budget/", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()["data"]["categories"], [])
+        self.assertTrue(EventBudget.objects.filter(event=self.event).exists())
+
+    def test_csv_export_streams_line_items(self):
+        BudgetLineItem.objects.filter(label="Chairs").update(notes="=HYPERLINK(1)")
+        res = self.client.get("/api/budget/export.csv", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res["Content-Type"], "text/csv")
+        content = b"".join(res.streaming_content).decode()
+        rows = list(csv.reader(StringIO(content)))
+        self.assertEqual(rows[0][:3], ["event_id", "event", "currency"])
+        self.assertEqual(len(rows), 3)  # header, Hall, Chairs (deleted items skipped)
+        self.assertEqual(rows[1][5:8], ['Hall "A"', "1234.50", "99.99"])
+        self.assertEqual(rows[1][9], "Deposit\nbalance due")
+        self.assertEqual(rows[2][9], "'=HYPERLINK(1)")
+
+
+class MultiCurrencyBudgetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="currency@example.com", password="password123"
+        )
+        self.couple = Couple.objects.create(name="GCC Couple")
+        CoupleMember.objects.create(
+            couple=self.couple,
+            user=self.user,
+            status="active",
+            role="groom",
+            is_owner=True,
+        )
+        venue = BudgetCategory.objects.create(key="venue", label="Venue")
+        for n, (code, planned) in enumerate([("USD", 1000), ("OMR", 100), ("AED", 50)]):
+            event_type = EventType.objects.create(key=f"event_{n}", name_en=f"Event {n}")
+            event = Event.objects.create(couple=self.couple, event_type=event_type)
+            budget = EventBudget.objects.create(event=event, currency_code=code)
+            EventBudgetCategory.objects.create(
+                event_budget=budget, category=venue, planned_amount=planned
+            )
+        token = AccessToken.for_user(self.user)
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {str(token)}"}
+
+    def test_dashboard_converts_into_reporting_currency(self):
+        call_command("load_exchange_rates", "omr=2.6", stdout=StringIO())
+        res = self.client.get("/api/dashboard/summary/", **self.auth)
+        etag = res["ETag"]
+        self.assertEqual(
+            res.json()["data"]["budget"],
+            {"planned": "1260.00", "spent": "0.00", "currency": "USD", "unconverted": ["AED"]},
+        )
+
+        with self.assertNumQueries(0):
+            self.assertEqual(currency.rates()["OMR"], Decimal("2.6"))
+
+        ExchangeRate.objects.create(currency_code="AED", rate=Decimal("0.27"))
+        # Snapshots are kept; only the budget section is refreshed on read.
+        snapshot = DashboardSnapshot.objects.get(couple=self.couple)
+        res = self.client.get("/api/dashboard/summary/", HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(
+            DashboardSnapshot.objects.get(couple=self.couple).rebuilt_at, snapshot.rebuilt_at
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()["data"]["budget"]["planned"], "1273.50")
+        self.assertEqual(res.json()["data"]["budget"]["unconverted"], [])
+
+    def test_soft_deleted_event_leaves_the_dashboard_budget(self):
+        call_command("load_exchange_rates", "OMR=2.6", "AED=0.27", stdout=StringIO())
+        res = self.client.get("/api/dashboard/summary/", **self.auth)
+        self.assertEqual(res.json()["data"]["budget"]["planned"], "1273.50")
+
+        event = Event.objects.get(event_budget__currency_code="AED")
+        event.is_deleted = True
+        event.save()
+        res = self.client.get("/api/dashboard/summary/", **self.auth)
+        self.assertEqual(res.json()["data"]["budget"]["planned"], "1260.00")
+
+    def test_spend_analytics(self):
+        today = timezone.now().date()
+        self.couple.wedding_date = today + timedelta(days=30)
+        self.couple.save()
+        call_command("load_exchange_rates", "OMR=2.6", stdout=StringIO())
+        usd, omr = (
+            EventBudgetCategory.objects.get(event_budget__currency_code=code)
+            for code in ("USD", "OMR")
+        )
+        this_month = today.replace(day=1)
+        last_month = (this_month - timedelta(days=1)).replace(day=1)
+        for category, amount, paid_on in [
+            (usd, 100, last_month),
+            (usd, 50, this_month),
+            (omr, 10, this_month),
+            (usd, 999, None),  # unpaid
+        ]:
+            BudgetLineItem.objects.create(
+                event_budget_category=category,
+                label="x",
+                actual_amount=amount,
+                paid_on=paid_on,
+            )
+
+        res = self.client.get("/api/budget/analytics/spend/", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        data = res.json()["data"]
+        self.assertEqual(
+            [(p["period"], p["spent"], p["cumulative"]) for p in data["series"]],
+            [
+                (last_month.isoformat(), "100.00", "100.00"),
+                (this_month.isoformat(), "76.00", "176.00"),
+            ],
+        )
+        self.assertEqual(data["spent"], "176.00")
+        self.assertEqual(data["projection"]["days_remaining"], 30)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(analytics.spend_analytics(self.couple.id)["spent"], "176.00")
+        BudgetLineItem.objects.create(
+            event_budget_category=usd, label="y", actual_amount=24, paid_on=today
+        )
+        self.assertEqual(analytics.spend_analytics(self.couple.id)["spent"], "200.00")
+
+    def test_budget_forecast(self):
+        call_command("load_exchange_rates", "OMR=2.6", stdout=StringIO())
+        usd, omr, aed = (
+            EventBudgetCategory.objects.get(event_budget__currency_code=code)
+            for code in ("USD", "OMR", "AED")
+        )
+        for category, planned, actual in [
+            (usd, 100, 150),  # paid 50% over plan
+            (usd, 200, None),
+            (omr, 50, None),
+            (aed, 10, 100),
+        ]:
+            BudgetLineItem.objects.create(
+                event_budget_category=category,
+                label="x",
+                planned_amount=planned,
+                actual_amount=actual,
+            )
+
+        res = self.client.get("/api/budget/forecast/", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        data = res.json()["data"]
+        by_currency = {c["currency"]: c for c in data["categories"]}
+        self.assertEqual(by_currency["USD"]["projected"], "450.00")
+        # No paid items of its own: falls back to the couple-wide factor.
+        self.assertEqual(by_currency["OMR"]["projected"], "75.00")
+        self.assertEqual(by_currency["AED"]["risk"], "high")
+        self.assertEqual(by_currency["USD"]["risk"], "low")
+        self.assertEqual(data["totals"]["projected"], "645.00")  # 450 + 75 * 2.6
+        self.assertEqual(data["unconverted"], ["AED"])
+
+        out = StringIO()
+        call_command("forecast_budgets", "--at-risk", stdout=out, stderr=StringIO())
+        rows = list(csv.reader(StringIO(out.getvalue())))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][3], "AED")
+
+
+class ResumableUploadTests(APITestCase):
+    def setUp(self):
+        media_dir = tempfile.mkdtemp()
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_dir, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, temp_dir, ignore_errors=True)
+        overrides = self.settings(MEDIA_ROOT=media_dir, MEDIA_UPLOAD_TEMP_DIR=temp_dir)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user(
+            email="uploads@example.com", password="password123"
+        )
+        self.couple = Couple.objects.create(name="Upload Couple")
+        CoupleMember.objects.create(
+            couple=self.couple,
+            user=self.user,
+            status="active",
+            role="bride",
+            is_owner=True,
+        )
+        token = AccessToken.for_user(self.user)
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {str(token)}"}
+
+    def put_chunk(self, session_id, body, start, total):
+        return self.client.put(
+            f"/api/media/uploads/{session_id}/",
+            data=body,
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {start}-{start + len(body) - 1}/{total}",
+            **self.auth,
+        )
+
+    def test_chunked_upload_resumes_and_finalizes(self):
+        content = b"0123456789"
+        res = self.client.post(
+            "/api/media/uploads/",
+            {"filename": "../dress.jpg", "size": len(content), "mime_type": "image/jpeg"},
+            format="json",
+            **self.auth,
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        session_id = res.json()["data"]["id"]
+
+        self.assertEqual(self.put_chunk(session_id, b"0123", 0, 10).json()["data"]["offset"], 4)
+        # A retransmitted overlap is trimmed.
+        self.assertEqual(self.put_chunk(session_id, b"23456", 2, 10).json()["data"]["offset"], 7)
+        res = self.put_chunk(session_id, b"9", 9, 10)
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.json()["data"]["offset"], 7)
+        self.assertFalse(MediaFile.objects.exists())
+
+        url = f"/api/media/uploads/{session_id}/finalize/"
+        res = self.client.post(url, {}, format="json", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+
+        res = self.client.get(f"/api/media/uploads/{session_id}/", **self.auth)
+        self.assertEqual(res.json()["data"]["offset"], 7)
+        self.put_chunk(session_id, b"789", 7, 10)
+
+        res = self.client.post(url, {"sha256": "0" * 64}, format="json", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        digest = hashlib.sha256(content).hexdigest()
+        res = self.client.post(url, {"sha256": digest}, format="json", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        data = res.json()["data"]
+        self.assertEqual(data["sha256"], digest)
+        self.assertEqual(data["size_bytes"], 10)
+
+        media = MediaFile.objects.get(id=data["id"])
+        self.assertEqual(media.storage_key, content_key(digest, "dress.jpg"))
+        with open(os.path.join(settings.MEDIA_ROOT, media.storage_key), "rb") as fh:
+            self.assertEqual(fh.read(), content)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(os.listdir(settings.MEDIA_UPLOAD_TEMP_DIR), [])
+
+    def test_empty_chunk_body_is_rejected(self):
+        res = self.client.post(
+            "/api/media/uploads/", {"filename": "a.mov", "size": 10}, format="json", **self.auth
+        )
+        session_id = res.json()["data"]["id"]
+        res = self.client.put(
+            f"/api/media/uploads/{session_id}/",
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE="bytes 0-3/10",
+            **self.auth,
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.json()["error"], "Body is shorter than Content-Range")
+        self.assertEqual(res.json()["data"]["offset"], 0)
+
+    def test_finalize_stores_after_marking_the_session(self):
+        content = b"0123456789"
+        res = self.client.post(
+            "/api/media/uploads/", {"filename": "a.jpg", "size": 10}, format="json", **self.auth
+        )
+        session_id = res.json()["data"]["id"]
+        self.put_chunk(session_id, content, 0, 10)
+        url = f"/api/media/uploads/{session_id}/finalize/"
+
+        seen = []
+
+        def store(*args, **kwargs):
+            session = UploadSession.objects.get(id=session_id)
+            seen.append(session.status)
+            # The session is committed as finalizing: no more chunks or finalizes.
+            self.assertEqual(self.put_chunk(session_id, b"9", 9, 10).status_code, 409)
+            self.assertEqual(self.client.post(url, {}, format="json", **self.auth).status_code, 409)
+            res = self.client.delete(f"/api/media/uploads/{session_id}/", **self.auth)
+            self.assertEqual(res.status_code, 409)
+            raise OSError("storage is down")
+
+        with mock.patch("planner.uploads.store_media", side_effect=store):
+            with self.assertRaises(OSError):
+                self.client.post(url, {}, format="json", **self.auth)
+        self.assertEqual(seen, ["finalizing"])
+        # A failed finalize leaves the session retryable.
+        self.assertEqual(UploadSession.objects.get(id=session_id).status, "receiving")
+        res = self.client.post(url, {}, format="json", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(os.listdir(settings.MEDIA_UPLOAD_TEMP_DIR), [])
+
+    def test_cleanup_removes_expired_sessions(self):
+        res = self.client.post(
+            "/api/media/uploads/", {"filename": "a.mov", "size": 100}, format="json", **self.auth
+        )
+        session_id = res.json()["data"]["id"]
+        UploadSession.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        out = StringIO()
+        call_command("cleanup_upload_sessions", stdout=out)
+        self.assertIn("Removed 1", out.getvalue())
+        self.assertFalse(os.path.exists(uploads.part_path(session_id)))
+        res = self.client.get(f"/api/media/uploads/{session_id}/", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(MEDIA_DERIVATIVES_ASYNC=False, MEDIA_DERIVATIVE_WIDTHS=[320, 640, 1280])
+class MediaDerivativeTests(APITestCase):
+    def setUp(self):
+        media_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_dir, ignore_errors=True)
+        overrides = self.settings(MEDIA_ROOT=media_dir)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user(
+            email="derivatives@example.com", password="password123"
+        )
+        self.couple = Couple.objects.create(name="Derivative Couple")
+        CoupleMember.objects.create(
+            couple=self.couple,
+            user=self.user,
+            status="active",
+            role="bride",
+            is_owner=True,
+        )
+        token = AccessToken.for_user(self.user)
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {str(token)}"}
+
+    def upload_image(self, width=800, height=600, orientation=None):
+        buffer = BytesIO()
+        exif = Image.Exif()
+        if orientation is not None:
+            exif[ExifTags.Base.Orientation] = orientation
+        Image.new("RGB", (width, height), (200, 120, 80)).save(buffer, "JPEG", exif=exif)
+        file = SimpleUploadedFile("venue.jpg", buffer.getvalue(), content_type="image/jpeg")
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post("/api/media/upload/", {"file": file}, **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return MediaFile.objects.get(id=res.json()["data"]["id"])
+
+    def test_upload_renders_derivatives_without_upscaling(self):
+        media = self.upload_image()
+        mime_types = {"image/jpeg"} | {e[0] for e in imaging.available_encodings()}
+        derivatives = list(media.derivatives.all())
+        self.assertEqual(
+            {(d.width, d.mime_type) for d in derivatives},
+            {(w, m) for w in (320, 640) for m in mime_types},
+        )
+        for derivative in derivatives:
+            self.assertEqual(derivative.height, derivative.width * 3 // 4)
+            path = os.path.join(settings.MEDIA_ROOT, derivative.storage_key)
+            with Image.open(path) as image:
+                self.assertEqual(image.size, (derivative.width, derivative.height))
+
+        srcset = MediaFileSerializer(media).data["srcset"]
+        self.assertEqual(set(srcset), mime_types)
+        jpeg = media.derivatives.get(width=320, mime_type="image/jpeg")
+        self.assertTrue(srcset["image/jpeg"].startswith(f"{storage.url(jpeg.storage_key)} 320w, "))
+        self.assertTrue(srcset["image/jpeg"].endswith(" 640w"))
+
+    def test_rotated_portrait_is_not_upscaled(self):
+        # Stored 800x600, displayed 600x800: 640 would be wider than the image.
+        media = self.upload_image(width=800, height=600, orientation=6)
+        self.assertEqual((media.width, media.height), (600, 800))
+        self.assertEqual(set(media.derivatives.values_list("width", flat=True)), {320})
+        for derivative in media.derivatives.all():
+            self.assertEqual(derivative.height, round(320 * 800 / 600))
+
+    def test_serializer_keeps_ownership_fields_read_only(self):
+        media = self.upload_image(width=400, height=300)
+        other = Couple.objects.create(name="Other Couple")
+        serializer = MediaFileSerializer(
+            media,
+            data={
+                "couple": other.id,
+                "uploaded_by": User.objects.create_user(
+                    email="other-uploader@example.com", password="password123"
+                ).id,
+                "created_at": "2000-01-01T00:00:00Z",
+                "width": 1,
+            },
+            partial=True,
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.validated_data, {})
+
+    def test_rerender_stores_derivatives_under_new_keys(self):
+        media = self.upload_image(width=400, height=300)
+        old_keys = set(media.derivatives.values_list("storage_key", flat=True))
+        self.assertEqual(derivatives.generate(media), len(old_keys))
+        new_keys = set(media.derivatives.values_list("storage_key", flat=True))
+        self.assertEqual(len(new_keys), len(old_keys))
+        self.assertFalse(old_keys & new_keys)
+        for key in old_keys:
+            self.assertFalse(os.path.exists(os.path.join(settings.MEDIA_ROOT, key)))
+        for key in new_keys:
+            self.assertTrue(os.path.exists(os.path.join(settings.MEDIA_ROOT, key)))
+
+    def test_backfill_command_renders_missing_derivatives(self):
+        media = self.upload_image(width=400, height=400)
+        media.derivatives.all().delete()
+        out = StringIO()
+        call_command("generate_media_derivatives", "--media", str(media.id), stdout=out)
+        self.assertEqual(set(media.derivatives.values_list("width", flat=True)), {320})
+
+
+class MediaDedupeTests(APITestCase):
+    def setUp(self):
+        media_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_dir, ignore_errors=True)
+        overrides = self.settings(MEDIA_ROOT=media_dir)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.auth = self.member("dedupe@example.com", "Dedupe Couple")
+
+    def member(self, email, couple_name):
+        user = User.objects.create_user(email=email, password="password123")
+        couple = Couple.objects.create(name=couple_name)
+        CoupleMember.objects.create(
+            couple=couple, user=user, status="active", role="bride", is_owner=True
+        )
+        return {"HTTP_AUTHORIZATION": f"Bearer {str(AccessToken.for_user(user))}"}
+
+    def upload(self, content, name, auth):
+        file = SimpleUploadedFile(name, content, content_type="application/pdf")
+        return self.client.post("/api/media/upload/", {"file": file}, **auth)
+
+    def test_repeat_upload_returns_existing_media(self):
+        content = b"%PDF-1.4 seating chart"
+        digest = hashlib.sha256(content).hexdigest()
+        first = self.upload(content, "chart.pdf", self.auth)
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(first.json()["data"]["sha256"], digest)
+
+        with mock.patch("django.core.files.storage.FileSystemStorage.save") as save:
+            again = self.upload(content, "chart-copy.pdf", self.auth)
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        self.assertEqual(again.json()["data"]["id"], first.json()["data"]["id"])
+        save.assert_not_called()
+
+        # Another couple gets its own row backed by the same file.
+        other = self.upload(content, "chart.pdf", self.member("other@example.com", "Other"))
+        self.assertEqual(other.status_code, status.HTTP_201_CREATED)
+        key = content_key(digest, "chart.pdf")
+        self.assertEqual(MediaFile.objects.count(), 2)
+        self.assertEqual(set(MediaFile.objects.values_list("storage_key", flat=True)), {key})
+        path = os.path.join(settings.MEDIA_ROOT, key)
+        self.assertEqual(os.listdir(os.path.dirname(path)), [os.path.basename(path)])
+
+
+class MediaServingTests(APITestCase):
+    def setUp(self):
+        media_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_dir, ignore_errors=True)
+        overrides = self.settings(MEDIA_ROOT=media_dir, MEDIA_SERVE_BACKEND="python")
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user(email="serve@example.com", password="password123")
+        self.couple = Couple.objects.create(name="Serving Couple")
+        CoupleMember.objects.create(
+            couple=self.couple, user=self.user, status="active", role="bride", is_owner=True
+        )
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {str(AccessToken.for_user(self.user))}"}
+        self.content = b"0123456789abcdef"
+        file = SimpleUploadedFile("clip.mp4", self.content, content_type="video/mp4")
+        res = self.client.post("/api/media/upload/", {"file": file}, **self.auth)
+        self.media = MediaFile.objects.get(id=res.json()["data"]["id"])
+        self.url = f"/api/media/{self.media.id}/content/"
+
+    def test_full_and_conditional_responses(self):
+        res = self.client.get(self.url, HTTP_ACCEPT="video/*", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(b"".join(res.streaming_content), self.content)
+        self.assertEqual(res["Content-Type"], "video/mp4")
+        self.assertEqual(res["ETag"], f'"{self.media.sha256}"')
+        self.assertIn("immutable", res["Cache-Control"])
+        self.assertEqual(res["Accept-Ranges"], "bytes")
+
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=res["ETag"], **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_range_requests(self):
+        res = self.client.get(self.url, HTTP_RANGE="bytes=2-5", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b"".join(res.streaming_content), b"2345")
+        self.assertEqual(res["Content-Range"], "bytes 2-5/16")
+        self.assertEqual(res["Content-Length"], "4")
+
+        res = self.client.get(self.url, HTTP_RANGE="bytes=-3", **self.auth)
+        self.assertEqual(b"".join(res.streaming_content), b"def")
+
+        res = self.client.get(self.url, HTTP_RANGE="bytes=16-", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(res["Content-Range"], "bytes */16")
+
+        # A stale If-Range gets the whole file.
+        res = self.client.get(self.url, HTTP_RANGE="bytes=2-5", HTTP_IF_RANGE='"old"', **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_scriptable_types_are_downloaded_in_a_sandbox(self):
+        res = self.client.get(self.url, **self.auth)
+        self.assertEqual(res["X-Content-Type-Options"], "nosniff")
+        self.assertNotIn("Content-Security-Policy", res)
+        self.assertFalse(res.get("Content-Disposition", "inline").startswith("attachment"))
+
+        for name, mime_type in (("page.html", "text/html"), ("logo.svg", "image/svg+xml")):
+            content = f"<!-- {name} --><svg onload=alert(1)>".encode()
+            file = SimpleUploadedFile(name, content, content_type=mime_type)
+            upload = self.client.post("/api/media/upload/", {"file": file}, **self.auth)
+            media_id = upload.json()["data"]["id"]
+            with self.settings(MEDIA_SERVE_BACKEND="nginx"):
+                res = self.client.get(f"/api/media/{media_id}/content/", **self.auth)
+            self.assertEqual(res["Content-Type"], mime_type)
+            self.assertTrue(res["Content-Disposition"].startswith("attachment"))
+            self.assertEqual(res["Content-Security-Policy"], "sandbox")
+
+    def test_offloads_to_the_web_server_and_checks_the_couple(self):
+        with self.settings(MEDIA_SERVE_BACKEND="nginx"):
+            res = self.client.get(self.url, **self.auth)
+        self.assertEqual(res["X-Accel-Redirect"], "/protected-media/" + self.media.storage_key)
+        self.assertEqual(res.content, b"")
+
+        other = User.objects.create_user(email="stranger@example.com", password="password123")
+        CoupleMember.objects.create(
+            couple=Couple.objects.create(name="Other"), user=other, status="active", role="groom"
+        )
+        res = self.client.get(
+            self.url, HTTP_AUTHORIZATION=f"Bearer {str(AccessToken.for_user(other))}"
+        )
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class MediaUrlTests(APITestCase):
+    def setUp(self):
+        media_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_dir, ignore_errors=True)
+        overrides = self.settings(MEDIA_ROOT=media_dir, MEDIA_URL_TTL=3600)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user(email="urls@example.com", password="password123")
+        self.couple = Couple.objects.create(name="Url Couple")
+        CoupleMember.objects.create(
+            couple=self.couple, user=self.user, status="active", role="bride", is_owner=True
+        )
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {str(AccessToken.for_user(self.user))}"}
+        file = SimpleUploadedFile("menu.pdf", b"%PDF menu", content_type="application/pdf")
+        res = self.client.post("/api/media/upload/", {"file": file}, **self.auth)
+        self.media = MediaFile.objects.get(id=res.json()["data"]["id"])
+
+    def test_urls_follow_the_configured_base(self):
+        key = self.media.storage_key
+        with self.settings(
+            MEDIA_CDN_BASE_URL="",
+            MEDIA_URL_SIGNING_KEY="",
+            MEDIA_PUBLIC_ORIGIN="https://api.example.com/",
+        ):
+            # Absolute: the frontend loads media from another origin.
+            self.assertEqual(
+                MediaFileSerializer(self.media).data["url"],
+                f"https://api.example.com{settings.MEDIA_URL}{key}",
+            )
+        with self.settings(MEDIA_CDN_BASE_URL="https://cdn.example.com/m/", MEDIA_URL_SIGNING_KEY=""):
+            self.assertEqual(
+                MediaFileSerializer(self.media).data["url"], f"https://cdn.example.com/m/{key}"
+            )
+
+    @override_settings(
+        MEDIA_CDN_BASE_URL="",
+        MEDIA_URL_SIGNING_KEY="s3cret",
+        MEDIA_PUBLIC_ORIGIN="https://api.example.com",
+    )
+    def test_signed_urls_default_to_the_verifying_route(self):
+        url = MediaFileSerializer(self.media).data["url"]
+        prefix = f"https://api.example.com/api/media/signed/{self.media.storage_key}?expires="
+        self.assertTrue(url.startswith(prefix))
+        url = url[len("https://api.example.com") :]
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(b"".join(res.streaming_content), b"%PDF menu")
+        res = self.client.get(url.split("?")[0])
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(MEDIA_CDN_BASE_URL="https://cdn.example.com", MEDIA_URL_SIGNING_KEY="s3cret")
+    def test_signed_urls_are_stable_within_a_window_and_verified(self):
+        now = 1_800_000_000
+        first = storage.url(self.media.storage_key, now=now)
+        self.assertEqual(first, storage.url(self.media.storage_key, now=now + 60))
+        self.assertNotEqual(first, storage.url(self.media.storage_key, now=now + 3600))
+        query = dict(part.split("=") for part in first.split("?")[1].split("&"))
+        self.assertGreaterEqual(int(query["expires"]), now + 3600)
+        self.assertTrue(
+            storage.verify(self.media.storage_key, query["expires"], query["signature"], now=now)
+        )
+        self.assertFalse(storage.verify("other.pdf", query["expires"], query["signature"], now=now))
+
+        path = f"/api/media/signed/{self.media.storage_key}"
+        expires = (storage.url_version() + 2) * 3600
+        signature = storage.url(self.media.storage_key).split("signature=")[1]
+        res = self.client.get(path, {"expires": expires, "signature": signature})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(b"".join(res.streaming_content), b"%PDF menu")
+        self.assertTrue(res["Cache-Control"].startswith("public"))
+        res = self.client.get(path, {"expires": expires, "signature": "0" * 64})
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(MEDIA_URL_SIGNING_KEY="s3cret")
+    def test_signed_content_uses_the_recorded_type(self):
+        # An image declared by the uploader but stored under an .html key.
+        file = SimpleUploadedFile("photo.html", b"<script>x</script>", content_type="image/png")
+        res = self.client.post("/api/media/upload/", {"file": file}, **self.auth)
+        key = MediaFile.objects.get(id=res.json()["data"]["id"]).storage_key
+        self.assertTrue(key.endswith(".html"))
+        query = storage.url(key).split("?")[1]
+        res = self.client.get(f"/api/media/signed/{key}?{query}")
+        self.assertEqual(res["Content-Type"], "image/png")
+        self.assertEqual(res["X-Content-Type-Options"], "nosniff")
+
+        MediaFile.objects.filter(storage_key=key).update(mime_type="text/html")
+        res = self.client.get(f"/api/media/signed/{key}?{query}")
+        self.assertTrue(res["Content-Disposition"].startswith("attachment"))
+        self.assertEqual(res["Content-Security-Policy"], "sandbox")
+
+        # Unknown keys are never typed from their extension.
+        default_storage = storage.get_storage()
+        other = default_storage.save("content/zz/page.html", BytesIO(b"<script>x</script>"))
+        res = self.client.get(f"/api/media/signed/{other}?{storage.url(other).split('?')[1]}")
+        self.assertEqual(res["Content-Type"], "application/octet-stream")
+        self.assertEqual(res["Content-Security-Policy"], "sandbox")
+
+
+class MediaBatchUploadTests(APITestCase):
+    def setUp(self):
+        media_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_dir, ignore_errors=True)
+        overrides = self.settings(MEDIA_ROOT=media_dir)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user(email="batch@example.com", password="password123")
+        self.couple = Couple.objects.create(name="Batch Couple")
+        CoupleMember.objects.create(
+            couple=self.couple, user=self.user, status="active", role="bride", is_owner=True
+        )
+        self.event = Event.objects.create(
+            couple=self.couple,
+            event_type=EventType.objects.create(key="henna", name_en="Henna"),
+            title="Henna",
+        )
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {str(AccessToken.for_user(self.user))}"}
+
+    def files(self, *contents):
+        return [
+            SimpleUploadedFile(f"inspo{n}.txt", content, content_type="text/plain")
+            for n, content in enumerate(contents)
+        ]
+
+    def test_batch_upload_attaches_files_to_the_mood_board(self):
+        existing = self.client.post(
+            "/api/media/upload/", {"file": self.files(b"old")[0]}, **self.auth
+        ).json()["data"]
+
+        res = self.client.post(
+            "/api/media/upload/batch/",
+            {"files": self.files(b"a", b"b", b"a", b"old"), "event_id": self.event.id},
+            **self.auth,
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        data = res.json()["data"]
+        ids = [m["id"] for m in data["media"]]
+        self.assertEqual(ids[0], ids[2])
+        self.assertEqual(ids[3], existing["id"])
+        self.assertEqual(MediaFile.objects.count(), 3)
+        self.assertEqual(len(data["items"]), 3)
+        self.assertEqual(
+            MoodBoardItem.objects.filter(mood_board__event=self.event).count(), 3
+        )
+        for media in MediaFile.objects.all():
+            with open(os.path.join(settings.MEDIA_ROOT, media.storage_key), "rb") as fh:
+                self.assertEqual(hashlib.sha256(fh.read()).hexdigest(), media.sha256)
+
+    def test_batch_upload_validates_the_request(self):
+        res = self.client.post("/api/media/upload/batch/", {}, **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.settings(MEDIA_BATCH_UPLOAD_MAX_FILES=1):
+            res = self.client.post(
+                "/api/media/upload/batch/", {"files": self.files(b"a", b"b")}, **self.auth
+            )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.post(
+            "/api/media/upload/batch/",
+            {"files": self.files(b"a"), "event_id": "nope"},
+            **self.auth,
+        )
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(MediaFile.objects.exists())
+
+
+class MediaGarbageCollectionTests(APITestCase):
+    def setUp(self):
+        media_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_dir, ignore_errors=True)
+        overrides = self.settings(MEDIA_ROOT=media_dir)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user(email="gc@example.com", password="password123")
+        self.couple = Couple.objects.create(name="GC Couple")
+        CoupleMember.objects.create(
+            couple=self.couple, user=self.user, status="active", role="bride", is_owner=True
+        )
+        self.event = Event.objects.create(
+            couple=self.couple,
+            event_type=EventType.objects.create(key="mehndi", name_en="Mehndi"),
+            title="Mehndi",
+        )
+        self.board = MoodBoard.objects.create(event=self.event)
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {str(AccessToken.for_user(self.user))}"}
+
+    def member_of_other_couple(self):
+        user = User.objects.create_user(email="gc-other@example.com", password="password123")
+        CoupleMember.objects.create(
+            couple=Couple.objects.create(name="Other GC Couple"),
+            user=user,
+            status="active",
+            role="groom",
+            is_owner=True,
+        )
+        return {"HTTP_AUTHORIZATION": f"Bearer {str(AccessToken.for_user(user))}"}
+
+    def upload(self, content):
+        file = SimpleUploadedFile("f.txt", content, content_type="text/plain")
+        return self.client.post("/api/media/upload/", {"file": file}, **self.auth)
+
+    def media(self, content):
+        return MediaFile.objects.get(id=self.upload(content).json()["data"]["id"])
+
+    def test_collect_deletes_only_unreferenced_media(self):
+        kept = self.media(b"on the board")
+        MoodBoardItem.objects.create(mood_board=self.board, media=kept)
+        removed_item = self.media(b"removed from the board")
+        MoodBoardItem.objects.create(mood_board=self.board, media=removed_item, is_deleted=True)
+        receipt = self.media(b"receipt")
+        BudgetLineItem.objects.create(
+            event_budget_category=EventBudgetCategory.objects.create(
+                event_budget=EventBudget.objects.create(event=self.event),
+                category=BudgetCategory.objects.create(key="decor", label="Decor"),
+            ),
+            label="Flowers",
+            receipt_media=receipt,
+        )
+        loose = self.media(b"never attached")
+        self.assertEqual(quota.bytes_used(self.couple.id), 12 + 22 + 7 + 14)
+
+        # Within the grace period nothing goes.
+        self.assertEqual(media_gc.collect(), (0, 0))
+
+        later = timezone.now() + timedelta(seconds=settings.MEDIA_GC_GRACE_SECONDS + 1)
+        self.assertEqual(media_gc.collect(dry_run=True, now=later), (2, 36))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(media_gc.collect(now=later, batch_size=1), (2, 36))
+
+        self.assertEqual(
+            set(MediaFile.objects.values_list("id", flat=True)), {kept.id, receipt.id}
+        )
+        self.assertFalse(MoodBoardItem.objects.filter(media_id=removed_item.id).exists())
+        for media in (removed_item, loose):
+            self.assertFalse(
+                os.path.exists(os.path.join(settings.MEDIA_ROOT, media.storage_key))
+            )
+        self.assertEqual(quota.bytes_used(self.couple.id), 12 + 7)
+        self.assertEqual(quota.recompute(), 0)
+
+    def test_upload_reusing_a_file_survives_its_collection(self):
+        other = self.member_of_other_couple()
+        shared = MediaFile.objects.get(
+            id=self.client.post(
+                "/api/media/upload/",
+                {"file": SimpleUploadedFile("f.txt", b"shared", content_type="text/plain")},
+                **other,
+            ).json()["data"]["id"]
+        )
+        real_exists = FileSystemStorage.exists
+
+        def exists_then_collected(storage_self, name):
+            found = real_exists(storage_self, name)
+            # media_gc collects the other couple's row and file right after the check.
+            MediaFile.objects.filter(id=shared.id).delete()
+            media_gc._delete_files({shared.storage_key}, [])
+            return found
+
+        with mock.patch.object(FileSystemStorage, "exists", exists_then_collected):
+            media = self.media(b"shared")
+        with open(os.path.join(settings.MEDIA_ROOT, media.storage_key), "rb") as fh:
+            self.assertEqual(fh.read(), b"shared")
+
+    def test_quota_is_enforced_on_new_content(self):
+        self.upload(b"12345")
+        with self.settings(MEDIA_COUPLE_QUOTA_BYTES=8):
+            res = self.upload(b"67890")
+            self.assertEqual(res.status_code, 413)
+            # Content the couple already has does not count again.
+            self.assertEqual(self.upload(b"12345").status_code, status.HTTP_200_OK)
+            res = self.client.get("/api/media/usage/", **self.auth)
+        self.assertEqual(res.json()["data"], {"bytes_used": 5, "quota_bytes": 8})
+
+    def test_sweep_removes_stray_files(self):
+        stray = os.path.join(settings.MEDIA_ROOT, "content", "ab", "cd", "stray.txt")
+        os.makedirs(os.path.dirname(stray))
+        with open(stray, "wb") as fh:
+            fh.write(b"left over")
+        kept = self.media(b"kept")
+        old = time.time() - settings.MEDIA_GC_GRACE_SECONDS - 60
+        for path in (stray, os.path.join(settings.MEDIA_ROOT, kept.storage_key)):
+            os.utime(path, (old, old))
+        self.assertEqual(media_gc.sweep_storage(), 1)
+        self.assertFalse(os.path.exists(stray))
+        self.assertTrue(os.path.exists(os.path.join(settings.MEDIA_ROOT, kept.storage_key)))
+
+
+class MoodBoardOrderingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="order@example.com", password="password123")
+        self.couple = Couple.objects.create(name="Order Couple")
+        CoupleMember.objects.create(
+            couple=self.couple, user=self.user, status="active", role="bride", is_owner=True
+        )
+        self.event = Event.objects.create(
+            couple=self.couple,
+            event_type=EventType.objects.create(key="engagement", name_en="Engagement"),
+            title="Engagement",
+        )
+        self.board = MoodBoard.objects.create(event=self.event)
+        self.media = MediaFile.objects.create(
+            couple=self.couple, storage_key="content/aa/bb/pin.jpg", size_bytes=10
+        )
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {str(AccessToken.for_user(self.user))}"}
+        self.items = [
+            self.client.post(
+                f"/api/moodboard/{self.event.id}/", {"media_id": self.media.id}, **self.auth
+            ).json()["data"]["id"]
+            for _ in range(4)
+        ]
+
+    def order(self):
+        res = self.client.get(f"/api/moodboard/{self.event.id}/", **self.auth)
+        return [item["id"] for item in res.json()["data"]["items"]]
+
+    def test_keys_sort_between_their_neighbours(self):
+        keys = ranking.sequence(3)
+        self.assertEqual(keys, sorted(keys))
+        for lo, hi in [(None, None), ("a", "b"), ("a", "a1"), ("z", None), (None, "01")]:
+            key = ranking.key_between(lo, hi)
+            self.assertLess(lo or "", key)
+            if hi is not None:
+                self.assertLess(key, hi)
+            self.assertFalse(key.endswith("0"))
+        self.assertIsNone(ranking.key_between("a", "a"))
+
+    def test_new_items_are_appended(self):
+        self.assertEqual(self.order(), self.items)
+
+    def test_move_updates_only_the_moved_item(self):
+        first, second, third, fourth = self.items
+        before = dict(MoodBoardItem.objects.values_list("id", "position"))
+        res = self.client.post(
+            f"/api/moodboard/items/{fourth}/move/", {"after_id": first}, format="json", **self.auth
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.order(), [first, fourth, second, third])
+        after = dict(MoodBoardItem.objects.values_list("id", "position"))
+        self.assertEqual([i for i in self.items if before[i] != after[i]], [fourth])
+
+        self.client.post(
+            f"/api/moodboard/items/{third}/move/", {"before_id": first}, format="json", **self.auth
+        )
+        self.assertEqual(self.order(), [third, first, fourth, second])
+
+        res = self.client.post(
+            f"/api/moodboard/items/{third}/move/",
+            {"after_id": second, "before_id": first},
+            format="json",
+            **self.auth,
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_move_rebalances_tied_keys(self):
+        MoodBoardItem.objects.update(position="i")
+        first, second, third, fourth = self.items
+        res = self.client.post(
+            f"/api/moodboard/items/{first}/move/",
+            {"after_id": second, "before_id": third},
+            format="json",
+            **self.auth,
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.order(), [second, first, third, fourth])
+
+    def test_bulk_reorder(self):
+        new_order = list(reversed(self.items))
+        res = self.client.put(
+            f"/api/moodboard/{self.event.id}/order/",
+            {"item_ids": new_order},
+            format="json",
+            **self.auth,
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.order(), new_order)
+
+        res = self.client.put(
+            f"/api/moodboard/{self.event.id}/order/",
+            {"item_ids": new_order[:2]},
+            format="json",
+            **self.auth,
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(MEDIA_DERIVATIVES_ASYNC=False, MEDIA_DERIVATIVE_WIDTHS=[64])
+class MediaSimilarityTests(APITestCase):
+    def setUp(self):
+        media_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_dir, ignore_errors=True)
+        overrides = self.settings(MEDIA_ROOT=media_dir)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user(email="similar@example.com", password="password123")
+        self.couple = Couple.objects.create(name="Similar Couple")
+        CoupleMember.objects.create(
+            couple=self.couple, user=self.user, status="active", role="bride", is_owner=True
+        )
+        self.event = Event.objects.create(
+            couple=self.couple,
+            event_type=EventType.objects.create(key="walima", name_en="Walima"),
+            title="Walima",
+        )
+        self.board = MoodBoard.objects.create(event=self.event)
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {str(AccessToken.for_user(self.user))}"}
+
+    def pin(self, image, quality=90):
+        buffer = BytesIO()
+        image.save(buffer, "JPEG", quality=quality)
+        file = SimpleUploadedFile("pin.jpg", buffer.getvalue(), content_type="image/jpeg")
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post("/api/media/upload/", {"file": file}, **self.auth)
+        media = MediaFile.objects.get(id=res.json()["data"]["id"])
+        self.assertIsNotNone(media.dhash)
+        return MoodBoardItem.objects.create(mood_board=self.board, media=media)
+
+    def test_near_duplicates_are_clustered(self):
+        def photo(seed):
+            pixels = np.random.default_rng(seed).integers(0, 256, (8, 12, 3), dtype=np.uint8)
+            return Image.fromarray(pixels).resize((240, 160), Image.Resampling.BILINEAR)
+
+        dress = self.pin(photo(1))
+        screenshot = self.pin(photo(1).resize((180, 120)), quality=40)
+        venue = self.pin(photo(2))
+
+        res = self.client.get("/api/moodboard/similar/", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        clusters = res.json()["data"]["clusters"]
+        self.assertEqual(
+            [[entry["item_id"] for entry in cluster["items"]] for cluster in clusters],
+            [[dress.id, screenshot.id]],
+        )
+
+        res = self.client.get(f"/api/media/{dress.media_id}/similar/", **self.auth)
+        matches = res.json()["data"]["matches"]
+        self.assertEqual([m["item_id"] for m in matches], [screenshot.id])
+        self.assertNotIn(venue.id, [m["item_id"] for m in matches])
+
+        res = self.client.get("/api/moodboard/similar/?threshold=65", **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_hamming_distances(self):
+        hashes = np.array([0, 0b1011, 2**64 - 1], dtype=np.uint64)
+        np.testing.assert_array_equal(
+            similarity.distances(hashes, hashes), [[0, 3, 64], [3, 0, 61], [64, 61, 0]]
+        )
+
+
+@override_settings(MEDIA_DERIVATIVES_ASYNC=False, MEDIA_DERIVATIVE_WIDTHS=[64])
+class GalleryTests(APITestCase):
+    def setUp(self):
+        media_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_dir, ignore_errors=True)
+        overrides = self.settings(MEDIA_ROOT=media_dir)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.user = User.objects.create_user(email="gallery@example.com", password="password123")
+        self.couple = Couple.objects.create(name="Gallery Couple")
+        CoupleMember.objects.create(
+            couple=self.couple, user=self.user, status="active", role="bride", is_owner=True
+        )
+        self.boards = [
+            MoodBoard.objects.create(
+                event=Event.objects.create(
+                    couple=self.couple,
+                    event_type=EventType.objects.create(key=key, name_en=key.title()),
+                    title=key.title(),
+                )
+            )
+            for key in ("malka", "henna")
+        ]
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {str(AccessToken.for_user(self.user))}"}
+
+    def test_images_get_dimensions_and_placeholder(self):
+        buffer = BytesIO()
+        Image.new("RGB", (300, 200), "pink").save(buffer, "JPEG")
+        file = SimpleUploadedFile("pin.jpg", buffer.getvalue(), content_type="image/jpeg")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/media/upload/", {"file": file}, **self.auth)
+        media = MediaFile.objects.get()
+        self.assertEqual((media.width, media.height), (300, 200))
+        self.assertTrue(media.placeholder.startswith("data:image/"))
+        self.assertLess(len(media.placeholder), 1024)
+
+        MoodBoardItem.objects.create(mood_board=self.boards[0], media=media)
+        row = self.client.get("/api/gallery/", **self.auth).json()["data"]["items"][0]
+        self.assertEqual((row["width"], row["height"]), (300, 200))
+        self.assertEqual(row["placeholder"], media.placeholder)
+        self.assertIn("64w", row["srcset"]["image/jpeg"])
+
+    def test_pages_walk_all_boards_newest_first(self):
+        media = MediaFile.objects.create(couple=self.couple, storage_key="content/pin.jpg", size_bytes=1)
+        items = [
+            MoodBoardItem.objects.create(mood_board=self.boards[n % 2], media=media)
+            for n in range(5)
+        ]
+        # Two items sharing a timestamp are split by id.
+        MoodBoardItem.objects.filter(id__in=[items[2].id, items[3].id]).update(
+            created_at=items[2].created_at
+        )
+        MoodBoardItem.objects.filter(id=items[4].id).update(is_deleted=True)
+
+        seen, cursor = [], ""
+        while True:
+            res = self.client.get(f"/api/gallery/?limit=2&cursor={cursor}", **self.auth)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            data = res.json()["data"]
+            seen += [row["id"] for row in data["items"]]
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, [items[3].id, items[2].id, items[1].id, items[0].id])
+
+        res = self.client.get(f"/api/gallery/?event_id={self.boards[1].event_id}", **self.auth)
+        self.assertEqual([row["id"] for row in res.json()["data"]["items"]], [items[3].id, items[1].id])
+
+    def test_bad_parameters(self):
+        for query in ("limit=0", "limit=1000", "cursor=bm9wZQ", "event_id=x"):
+            res = self.client.get(f"/api/gallery/?{query}", **self.auth)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST, query)
+        with self.assertRaises(ValueError):
+            gallery.decode_cursor("%%%")
+
+
+class MoodBoardReactionTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="react@example.com", password="password123")
+        self.partner = User.objects.create_user(email="partner@example.com", password="password123")
+        self.couple = Couple.objects.create(name="React Couple")
+        for user, role in ((self.user, "bride"), (self.partner, "groom")):
+            CoupleMember.objects.create(couple=self.couple, user=user, status="active", role=role)
+        event = Event.objects.create(
+            couple=self.couple,
+            event_type=EventType.objects.create(key="wedding", name_en="Wedding"),
+            title="Wedding",
+        )
+        self.board = MoodBoard.objects.create(event=event)
+        media = MediaFile.objects.create(couple=self.couple, storage_key="content/pin.jpg", size_bytes=1)
+        self.item = MoodBoardItem.objects.create(mood_board=self.board, media=media)
+        self.url = f"/api/moodboard/items/{self.item.id}/reactions/"
+
+    def auth(self, user):
+        return {"HTTP_AUTHORIZATION": f"Bearer {str(AccessToken.for_user(user))}"}
+
+    def test_counts_follow_adds_and_removes(self):
+        res = self.client.post(self.url, {"reaction_type": "heart"}, **self.auth(self.user))
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.json()["data"]["my_reactions"], ["heart"])
+        res = self.client.post(self.url, {"reaction_type": "heart"}, **self.auth(self.user))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.client.post(self.url, {"reaction_type": "heart"}, **self.auth(self.partner))
+        res = self.client.post(self.url, {"reaction_type": "like"}, **self.auth(self.partner))
+        self.assertEqual(res.json()["data"]["reaction_counts"], {"heart": 2, "like": 1})
+
+        res = self.client.delete(f"{self.url}like/", **self.auth(self.partner))
+        self.assertEqual(res.json()["data"]["reaction_counts"], {"heart": 2})
+        self.assertEqual(res.json()["data"]["my_reactions"], ["heart"])
+
+        res = self.client.post(self.url, {"reaction_type": "shrug"}, **self.auth(self.user))
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_board_serves_counts_without_counting(self):
+        MoodBoardReaction.objects.create(mood_board_item=self.item, user=self.partner)
+        self.client.get(f"/api/moodboard/{self.board.event_id}/", **self.auth(self.user))
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(f"/api/moodboard/{self.board.event_id}/", **self.auth(self.user))
+        self.assertEqual(res.json()["data"]["items"][0]["reaction_counts"], {"heart": 1})
+        self.assertFalse(any("planner_moodboardreaction" in q["sql"] for q in queries))
+
+    def test_recount_repairs_counters(self):
+        MoodBoardReaction.objects.create(mood_board_item=self.item, user=self.user)
+        MoodBoardItem.objects.update(reaction_counts={"like": 3})
+        self.assertEqual(reactions.recount(), 1)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.reaction_counts, {"heart": 1})
@@ -0,0 +1,311 @@
+"""
+Resumable chunked uploads.
+
+Protocol (all under ``/api/media/uploads/``):
+
+1. ``POST`` ``{filename, size, mime_type}`` opens an ``UploadSession``.
+2. ``PUT <id>/`` with a raw body and ``Content-Range: bytes start-end/size``
+   appends a chunk. Chunks must arrive in order; a chunk that overlaps what
+   was already received is trimmed, one that leaves a gap gets 409 with the
+   current offset. ``GET <id>/`` reports the offset so a client can resume.
+3. ``POST <id>/finalize/`` (optionally with the expected ``sha256``) stores
+   the assembled file through ``planner.media.store_media`` and only then
+   creates the ``MediaFile`` row, or returns the couple's existing one for
+   the same content. While that runs the session is ``finalizing`` and
+   further chunks, finalize calls and deletes get 409.
+
+Each chunk body is staged in its own ``.chunk`` file and then appended to
+``MEDIA_UPLOAD_TEMP_DIR/<id>.part`` under a row lock. The SHA-256 is computed
+as chunks arrive; the running hash object is kept in process memory and
+rebuilt from the part file when a chunk lands on a different worker.
+Sessions idle past ``MEDIA_UPLOAD_SESSION_TTL`` are removed by
+``manage.py cleanup_upload_sessions``.
+"""
+
+import hashlib
+import io
+import os
+import re
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from . import quota
+from .media import store_media
+from .models import UploadSession
+
+READ_BLOCK = 64 * 1024
+CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+# session id -> (offset, running sha256)
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+def part_path(session_id):
+    return os.path.join(settings.MEDIA_UPLOAD_TEMP_DIR, f"{session_id}.part")
+
+
+def _hasher(session):
+    with _hashers_lock:
+        entry = _hashers.get(session.id)
+    if entry is not None and entry[0] == session.received_bytes:
+        return entry[1]
+    # Another worker took the previous chunks: catch up from the part file.
+    hasher = hashlib.sha256()
+    with open(part_path(session.id), "rb") as part:
+        remaining = session.received_bytes
+        while remaining:
+            block = part.read(min(READ_BLOCK, remaining))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+    return hasher
+
+
+def _forget(session_id):
+    with _hashers_lock:
+        _hashers.pop(session_id, None)
+
+
+def _remove_part(session_id):
+    _forget(session_id)
+    try:
+        os.remove(part_path(session_id))
+    except FileNotFoundError:
+        pass
+
+
+def create_session(couple_id, user, filename, size, mime_type=""):
+    if not filename:
+        raise UploadError("filename is required")
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError("size must be an integer")
+    if size <= 0 or size > settings.MEDIA_UPLOAD_MAX_BYTES:
+        raise UploadError(f"size must be between 1 and {settings.MEDIA_UPLOAD_MAX_BYTES} bytes")
+    try:
+        quota.check(couple_id, size)
+    except quota.QuotaExceeded as exc:
+        raise UploadError(str(exc), status=413)
+    session = UploadSession.objects.create(
+        couple_id=couple_id,
+        created_by=user,
+        filename=os.path.basename(filename)[:255],
+        mime_type=mime_type or "",
+        size_bytes=size,
+        expires_at=timezone.now() + timedelta(seconds=settings.MEDIA_UPLOAD_SESSION_TTL),
+    )
+    os.makedirs(settings.MEDIA_UPLOAD_TEMP_DIR, exist_ok=True)
+    open(part_path(session.id), "wb").close()
+    return session
+
+
+def _chunk_path(session_id):
+    return os.path.join(
+        settings.MEDIA_UPLOAD_TEMP_DIR, f"{session_id}.{uuid.uuid4().hex}.chunk"
+    )
+
+
+def _locked_session(session_id, couple_id):
+    session = (
+        UploadSession.objects.select_for_update()
+        .filter(id=session_id, couple_id=couple_id)
+        .first()
+    )
+    if session is None:
+        raise UploadError("Upload not found", status=404)
+    return session
+
+
+def _check_range(session, start, end, total):
+    if session.status != "receiving":
+        raise UploadError(
+            "Upload is being finalized", status=409, offset=session.received_bytes
+        )
+    if total != session.size_bytes or end >= session.size_bytes:
+        raise UploadError("Content-Range does not match the upload size")
+    if start > session.received_bytes:
+        raise UploadError("Chunk leaves a gap", status=409, offset=session.received_bytes)
+
+
+def append_chunk(session_id, couple_id, content_range, stream):
+    """Append the bytes in ``stream`` at the offset given by ``content_range``.
+
+    The body is staged in a ``.chunk`` file before the session row is locked,
+    so a slow client never holds the lock; only the local copy into the part
+    file happens under it.
+    """
+    match = CONTENT_RANGE.match(content_range or "")
+    if not match:
+        raise UploadError("Content-Range: bytes start-end/size is required")
+    start, end, total = (int(part) for part in match.groups())
+    length = end - start + 1
+    if length <= 0 or length > settings.MEDIA_UPLOAD_MAX_CHUNK_BYTES:
+        raise UploadError(
+            f"chunks must be 1 to {settings.MEDIA_UPLOAD_MAX_CHUNK_BYTES} bytes"
+        )
+    if stream is None:
+        # DRF leaves ``request.stream`` unset for an empty or unsized body.
+        stream = io.BytesIO()
+
+    session = get_session(session_id, couple_id)
+    _check_range(session, start, end, total)
+
+    chunk_path = _chunk_path(session.id)
+    try:
+        remaining = length
+        with open(chunk_path, "wb") as chunk:
+            while remaining:
+                block = stream.read(min(READ_BLOCK, remaining))
+                if not block:
+                    break
+                chunk.write(block)
+                remaining -= len(block)
+        if remaining:
+            raise UploadError("Body is shorter than Content-Range", offset=session.received_bytes)
+
+        with transaction.atomic():
+            # Serializes concurrent PUTs for the same session; the offset may
+            # have moved while the body was read, so check the range again.
+            session = _locked_session(session_id, couple_id)
+            _check_range(session, start, end, total)
+            skip = session.received_bytes - start  # already received (retransmit)
+            if skip < length:
+                hasher = _hasher(session).copy()
+                with open(chunk_path, "rb") as chunk, open(
+                    part_path(session.id), "r+b"
+                ) as part:
+                    chunk.seek(skip)
+                    part.seek(session.received_bytes)
+                    part.truncate()  # leftovers of an interrupted copy
+                    while True:
+                        block = chunk.read(READ_BLOCK)
+                        if not block:
+                            break
+                        part.write(block)
+                        hasher.update(block)
+                session.received_bytes += length - skip
+            session.expires_at = timezone.now() + timedelta(
+                seconds=settings.MEDIA_UPLOAD_SESSION_TTL
+            )
+            session.save(update_fields=["received_bytes", "expires_at"])
+            if skip < length:
+                with _hashers_lock:
+                    _hashers[session.id] = (session.received_bytes, hasher)
+    finally:
+        try:
+            os.remove(chunk_path)
+        except FileNotFoundError:
+            pass
+    return session
+
+
+def get_session(session_id, couple_id):
+    session = UploadSession.objects.filter(id=session_id, couple_id=couple_id).first()
+    if session is None:
+        raise UploadError("Upload not found", status=404)
+    return session
+
+
+def finalize(request, session_id, couple_id, expected_sha256=None):
+    """Store the completed upload; returns ``(media, created)``.
+
+    The session is only locked long enough to mark it ``finalizing``; hashing
+    and copying into storage run after that commit, and a failure puts the
+    session back to ``receiving`` so the client can retry.
+    """
+    with transaction.atomic():
+        session = _locked_session(session_id, couple_id)
+        if session.received_bytes != session.size_bytes:
+            raise UploadError(
+                "Upload is incomplete", status=409, offset=session.received_bytes
+            )
+        if session.status != "receiving":
+            raise UploadError("Upload is already being finalized", status=409)
+        session.status = "finalizing"
+        session.expires_at = timezone.now() + timedelta(
+            seconds=settings.MEDIA_UPLOAD_SESSION_TTL
+        )
+        session.save(update_fields=["status", "expires_at"])
+
+    try:
+        digest = _hasher(session).hexdigest()
+        if expected_sha256 and expected_sha256.lower() != digest:
+            raise UploadError("sha256 does not match the uploaded bytes")
+        with open(part_path(session.id), "rb") as part:
+            try:
+                media, created = store_media(
+                    request,
+                    couple_id,
+                    File(part),
+                    session.filename,
+                    session.mime_type,
+                    session.size_bytes,
+                    sha256=digest,
+                )
+            except quota.QuotaExceeded as exc:
+                raise UploadError(str(exc), status=413)
+    except Exception:
+        UploadSession.objects.filter(id=session.id).update(status="receiving")
+        raise
+    session.delete()
+    _remove_part(session_id)
+    return media, created
+
+
+def discard(session_id, couple_id):
+    sessions = UploadSession.objects.filter(id=session_id, couple_id=couple_id)
+    deleted, _ = sessions.filter(status="receiving").delete()
+    if not deleted:
+        if sessions.exists():
+            raise UploadError("Upload is being finalized", status=409)
+        raise UploadError("Upload not found", status=404)
+    _remove_part(session_id)
+
+
+def cleanup_expired(now=None):
+    """Delete expired sessions and their part files; returns how many.
+
+    Part files without a session (e.g. the couple was deleted) and chunk
+    files left by an interrupted request are removed once they have been idle
+    for ``MEDIA_UPLOAD_SESSION_TTL``.
+    """
+    now = now or timezone.now()
+    count = 0
+    for session_id in UploadSession.objects.filter(expires_at__lt=now).values_list(
+        "id", flat=True
+    ):
+        if UploadSession.objects.filter(id=session_id, expires_at__lt=now).delete()[0]:
+            _remove_part(session_id)
+            count += 1
+
+    if os.path.isdir(settings.MEDIA_UPLOAD_TEMP_DIR):
+        idle_before = now.timestamp() - settings.MEDIA_UPLOAD_SESSION_TTL
+        live = {
+            str(session_id)
+            for session_id in UploadSession.objects.values_list("id", flat=True)
+        }
+        for entry in os.scandir(settings.MEDIA_UPLOAD_TEMP_DIR):
+            session_id = entry.name.split(".", 1)[0]
+            orphaned = entry.name.endswith(".part") and session_id not in live
+            # ``.chunk`` files belong to a single PUT and outlive it only on a crash.
+            stale = entry.stat().st_mtime < idle_before
+            if stale and (orphaned or entry.name.endswith(".chunk")):
+                os.remove(entry.path)
+    return count
@@ -1,23 +1,40 @@
 from django.urls import path
 from .views import (
     ActivityLogView,
+    BudgetExportView,
+    BudgetForecastView,
+    BudgetSpendAnalyticsView,
     CalendarView,
     CommentDetailView,
     CommentView,
+    EventBudgetCategoryItemsBatchView,
     EventBudgetCategoryItemsView,
     EventBudgetView,
     EventSelectionView,
     EventTypesView,
     EventsListView,
+    GalleryView,
     HoneymoonItemView,
     HoneymoonPlanView,
+    MediaBatchUploadView,
+    MediaContentView,
+    MediaSignedContentView,
+    MediaSimilarView,
     MediaUploadView,
+    MediaUsageView,
     MoodBoardItemDeleteView,
+    MoodBoardItemMoveView,
+    MoodBoardItemReactionView,
+    MoodBoardOrderView,
+    MoodBoardSimilarView,
     MoodBoardView,
     NotificationListView,
     PlannerPingView,
     TaskDetailView,
     TaskListView,
+    UploadSessionFinalizeView,
+    UploadSessionListView,
+    UploadSessionView,
     DashboardSummaryView,
 )
 
@@ -35,6 +52,18 @@ urlpatterns = [
         EventBudgetCategoryItemsView.as_view(),
         name="budget-line-item",
     ),
+    path(
+        "budget/categories/<int:category_id>/items/batch/",
+        EventBudgetCategoryItemsBatchView.as_view(),
+        name="budget-line-item-batch",
+    ),
+    path("budget/export.csv", BudgetExportView.as_view(), name="budget-export"),
+    path(
+        "budget/analytics/spend/",
+        BudgetSpendAnalyticsView.as_view(),
+        name="budget-spend-analytics",
+    ),
+    path("budget/forecast/", BudgetForecastView.as_view(), name="budget-forecast"),
     path(
         "events/<int:event_id>/honeymoon/",
         HoneymoonPlanView.as_view(),
@@ -45,8 +74,40 @@ urlpatterns = [
         HoneymoonItemView.as_view(),
         name="honeymoon-item",
     ),
+    path("media/usage/", MediaUsageView.as_view(), name="media-usage"),
+    path("media/<int:media_id>/similar/", MediaSimilarView.as_view(), name="media-similar"),
     path("media/upload/", MediaUploadView.as_view(), name="media-upload"),
+    path("media/upload/batch/", MediaBatchUploadView.as_view(), name="media-upload-batch"),
+    path("media/<int:media_id>/content/", MediaContentView.as_view(), name="media-content"),
+    path(
+        "media/<int:media_id>/derivatives/<int:derivative_id>/",
+        MediaContentView.as_view(),
+        name="media-derivative-content",
+    ),
+    path(
+        "media/signed/<path:storage_key>",
+        MediaSignedContentView.as_view(),
+        name="media-signed-content",
+    ),
+    path("media/uploads/", UploadSessionListView.as_view(), name="upload-sessions"),
+    path(
+        "media/uploads/<uuid:session_id>/",
+        UploadSessionView.as_view(),
+        name="upload-session",
+    ),
+    path(
+        "media/uploads/<uuid:session_id>/finalize/",
+        UploadSessionFinalizeView.as_view(),
+        name="upload-session-finalize",
+    ),
+    path("gallery/", GalleryView.as_view(), name="gallery"),
+    path("moodboard/similar/", MoodBoardSimilarView.as_view(), name="moodboard-similar"),
     path("moodboard/<int:event_id>/", MoodBoardView.as_view(), name="moodboard"),
+    path(
+        "moodboard/<int:event_id>/order/",
+        MoodBoardOrderView.as_view(),
+        name="moodboard-order",
+    ),
     path(
         "moodboard/<int:event_id>/items/",
         MoodBoardView.as_view(),
@@ -57,6 +118,21 @@ urlpatterns = [
         MoodBoardItemDeleteView.as_view(),
         name="moodboard-item-delete",
     ),
+    path(
+        "moodboard/items/<int:item_id>/move/",
+        MoodBoardItemMoveView.as_view(),
+        name="moodboard-item-move",
+    ),
+    path(
+        "moodboard/items/<int:item_id>/reactions/",
+        MoodBoardItemReactionView.as_view(),
+        name="moodboard-item-reactions",
+    ),
+    path(
+        "moodboard/items/<int:item_id>/reactions/<str:reaction_type>/",
+        MoodBoardItemReactionView.as_view(),
+        name="moodboard-item-reaction",
+    ),
     path("comments/", CommentView.as_view(), name="comments"),
     path(
         "comments/<int:comment_id>/", CommentDetailView.as_view(), name="comment-detail"
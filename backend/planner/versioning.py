@@ -0,0 +1,91 @@
+"""
+Per-couple write versions and conditional GET support.
+
+Every write to a couple's planner data bumps the matching counter on
+``CoupleVersion`` (and ``total``) via the model signals in ``planner.signals``;
+code that bypasses signals calls ``bump`` itself. Read endpoints decorated with
+``conditional(...)`` derive a strong ETag from the versions they depend on and
+answer ``If-None-Match`` with 304 straight from the cache, without touching
+the data tables.
+"""
+
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import CoupleVersion
+
+CACHE_KEY = "planner:versions:{couple_id}"
+FIELDS = ("total",) + CoupleVersion.RESOURCES
+
+
+def _cache_key(couple_id):
+    return CACHE_KEY.format(couple_id=couple_id)
+
+
+def versions(couple_id):
+    """Return ``{resource: version}`` for the couple, cached."""
+    data = cache.get(_cache_key(couple_id))
+    if data is None:
+        row, _ = CoupleVersion.objects.get_or_create(couple_id=couple_id)
+        data = {name: getattr(row, name) for name in FIELDS}
+        cache.set(_cache_key(couple_id), data, settings.COUPLE_VERSION_CACHE_TTL)
+    return data
+
+
+def bump(couple_id, *resources):
+    """Increment the given resource counters (and ``total``) for a couple."""
+    if couple_id is None:
+        return
+    CoupleVersion.objects.filter(couple_id=couple_id).update(
+        total=F("total") + 1, **{name: F(name) + 1 for name in set(resources)}
+    )
+    key = _cache_key(couple_id)
+    cache.delete(key)
+    # Again after commit, in case a concurrent read cached the old values.
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def etag(couple_id, resources, request, *extra):
+    current = versions(couple_id)
+    parts = [request.get_full_path(), str(couple_id)]
+    parts += [f"{name}:{current[name]}" for name in resources]
+    parts += [str(value) for value in extra]
+    return '"%s"' % hashlib.sha256("|".join(parts).encode()).hexdigest()[:32]
+
+
+def conditional(*resources, extra=None):
+    """
+    Decorate an ``APIView`` GET handler with ETag / ``If-None-Match`` support.
+
+    ``resources`` are the ``CoupleVersion`` counters the response depends on;
+    ``extra`` is an optional callable returning additional ETag inputs.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            couple_id = getattr(request, "couple_id", None)
+            if not couple_id:
+                return method(self, request, *args, **kwargs)
+            tag = etag(couple_id, resources, request, *(extra() if extra else ()))
+            if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+            if if_none_match:
+                tags = parse_etags(if_none_match)
+                if tag in tags or "*" in tags:
+                    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": tag})
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                response["ETag"] = tag
+            return response
+
+        return wrapper
+
+    return decorator
@@ -1,32 +1,53 @@
+import copy
+import csv
+
 from django.conf import settings
-from django.core.files.storage import FileSystemStorage
-from django.http import Http404
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.contrib.contenttypes.models import ContentType
-from django.db.models import Sum
 from django.utils import timezone
+from django.contrib.contenttypes.models import ContentType
 from rest_framework import permissions, status, views
+from rest_framework.negotiation import DefaultContentNegotiation
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.permissions import IsAuthenticated
 
+from . import (
+    analytics,
+    budget_json,
+    currency,
+    dashboard,
+    forecast,
+    gallery,
+    quota,
+    ranking,
+    rollups,
+    serving,
+    similarity,
+    storage,
+    uploads,
+    versioning,
+)
+from .authentication import CoupleJWTAuthentication
+from .media import store_media, store_media_batch
 from .models import (
     ActivityLog,
     BudgetCategory,
     BudgetLineItem,
     Comment,
-    Couple,
-    CoupleMember,
     Event,
     EventBudget,
     EventBudgetCategory,
     EventType,
     HoneymoonItem,
     HoneymoonPlan,
+    MediaDerivative,
     MediaFile,
     MoodBoard,
     MoodBoardItem,
+    MoodBoardReaction,
     Notification,
     Task,
 )
@@ -48,15 +69,6 @@ from .serializers import (
 )
 
 
-def _active_couple_id(user_id):
-    membership = (
-        CoupleMember.objects.filter(user_id=user_id, status="active")
-        .order_by("created_at")
-        .first()
-    )
-    return membership.couple_id if membership else None
-
-
 def _get_target_for_couple(couple_id, target_type, target_id):
     if target_type == "event":
         return get_object_or_404(
@@ -105,7 +117,7 @@ class PlannerPingView(views.APIView):
 
 
 class EventTypesView(views.APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CoupleJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
@@ -122,11 +134,12 @@ class EventTypesView(views.APIView):
 
 
 class EventsListView(views.APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CoupleJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
+    @versioning.conditional("events")
     def get(self, request):
-        couple_id = _active_couple_id(request.user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response({"data": [], "error": None})
         events = Event.objects.filter(
@@ -138,7 +151,7 @@ class EventsListView(views.APIView):
 
 
 class EventSelectionView(views.APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CoupleJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
@@ -147,7 +160,7 @@ class EventSelectionView(views.APIView):
         Engagement is ignored for onboarding (calendar-only).
         """
         user = request.user
-        couple_id = _active_couple_id(user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response(
                 {"data": None, "error": "No active couple membership"}, status=404
@@ -188,6 +201,8 @@ class EventSelectionView(views.APIView):
         Event.objects.filter(couple_id=couple_id).exclude(
             event_type__key="engagement"
         ).exclude(id__in=keep_ids).update(is_active=False)
+        versioning.bump(couple_id, "events")
+        dashboard.refresh_sections(couple_id, "upcoming_events")
 
         events = Event.objects.filter(
             couple_id=couple_id, is_active=True, is_deleted=False
@@ -198,11 +213,12 @@ class EventSelectionView(views.APIView):
 
 
 class CalendarView(views.APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CoupleJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
+    @versioning.conditional("events")
     def get(self, request):
-        couple_id = _active_couple_id(request.user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response({"data": [], "error": None})
         events = Event.objects.filter(
@@ -221,33 +237,44 @@ class CalendarView(views.APIView):
         return Response({"data": data, "error": None})
 
 
+def _serialized_budget(budget_id):
+    budget = EventBudget.objects.prefetch_related(
+        Prefetch(
+            "categories",
+            queryset=EventBudgetCategory.objects.select_related("category").order_by("id"),
+        ),
+        Prefetch(
+            "categories__line_items",
+            queryset=BudgetLineItem.objects.filter(is_deleted=False).order_by("id"),
+        ),
+    ).get(id=budget_id)
+    return EventBudgetSerializer(budget).data
+
+
 class EventBudgetView(views.APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CoupleJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
+    @versioning.conditional("events", "budget")
     def get(self, request, event_id):
-        couple_id = _active_couple_id(request.user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response(
                 {"data": None, "error": "No active couple membership"}, status=404
             )
+        if budget_json.supported():
+            # One statement for budgets that already exist.
+            data = budget_json.budget_json(event_id, couple_id)
+            if data is not None:
+                return Response({"data": data, "error": None})
         event = get_object_or_404(
             Event.objects.filter(id=event_id, couple_id=couple_id, is_deleted=False)
         )
         budget, _ = EventBudget.objects.get_or_create(event=event)
-        from django.db.models import Prefetch
-
-        budget = EventBudget.objects.prefetch_related(
-            "categories",
-            Prefetch(
-                "categories__line_items",
-                queryset=BudgetLineItem.objects.filter(is_deleted=False),
-            ),
-        ).get(id=budget.id)
-        return Response({"data": EventBudgetSerializer(budget).data, "error": None})
+        return Response({"data": _serialized_budget(budget.id), "error": None})
 
     def post(self, request, event_id):
-        couple_id = _active_couple_id(request.user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response(
                 {"data": None, "error": "No active couple membership"}, status=404
@@ -265,27 +292,17 @@ class EventBudgetView(views.APIView):
                 event_budget=budget, category=category
             )
 
-        budget.refresh_from_db()
-        from django.db.models import Prefetch
-
-        budget = EventBudget.objects.prefetch_related(
-            "categories",
-            Prefetch(
-                "categories__line_items",
-                queryset=BudgetLineItem.objects.filter(is_deleted=False),
-            ),
-        ).get(id=budget.id)
         return Response(
-            {"data": EventBudgetSerializer(budget).data, "error": None}, status=201
+            {"data": _serialized_budget(budget.id), "error": None}, status=201
         )
 
 
 class EventBudgetCategoryItemsView(views.APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CoupleJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request, category_id):
-        couple_id = _active_couple_id(request.user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response(
                 {"data": None, "error": "No active couple membership"}, status=404
@@ -308,12 +325,224 @@ class EventBudgetCategoryItemsView(views.APIView):
         )
 
 
+class EventBudgetCategoryItemsBatchView(views.APIView):
+    authentication_classes = [CoupleJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, category_id):
+        """
+        Body: { operations: [
+            { op: "create", label, planned_amount?, actual_amount?, ... },
+            { op: "update", id, <fields to change> },
+            { op: "delete", id },
+        ] }
+        All operations are applied in one transaction, or none are.
+        """
+        couple_id = request.couple_id
+        if not couple_id:
+            return Response(
+                {"data": None, "error": "No active couple membership"}, status=404
+            )
+        cat = get_object_or_404(
+            EventBudgetCategory.objects.select_related("event_budget__event"),
+            id=category_id,
+        )
+        if (
+            cat.event_budget.event.couple_id != couple_id
+            or cat.event_budget.event.is_deleted
+        ):
+            return Response({"data": None, "error": "Not found"}, status=404)
+
+        operations = request.data.get("operations")
+        if not isinstance(operations, list) or not all(
+            isinstance(op, dict) for op in operations
+        ):
+            return Response(
+                {"data": None, "error": "operations must be a list of objects"},
+                status=400,
+            )
+        if len(operations) > settings.BUDGET_BATCH_MAX_OPERATIONS:
+            return Response(
+                {
+                    "data": None,
+                    "error": f"At most {settings.BUDGET_BATCH_MAX_OPERATIONS} operations per batch",
+                },
+                status=400,
+            )
+
+        creates, updates, delete_ids = [], [], []
+        for op in operations:
+            kind = op.get("op")
+            if kind == "create":
+                creates.append({k: v for k, v in op.items() if k != "op"})
+            elif kind in ("update", "delete") and isinstance(op.get("id"), int):
+                if kind == "update":
+                    updates.append(op)
+                else:
+                    delete_ids.append(op["id"])
+            else:
+                return Response(
+                    {"data": None, "error": "each operation needs op create/update/delete and an id for update/delete"},
+                    status=400,
+                )
+        target_ids = [op["id"] for op in updates] + delete_ids
+        if len(set(target_ids)) != len(target_ids):
+            return Response(
+                {"data": None, "error": "a line item may appear in one operation only"},
+                status=400,
+            )
+
+        create_serializer = BudgetLineItemSerializer(data=creates, many=True)
+        create_serializer.is_valid(raise_exception=True)
+        update_serializer = BudgetLineItemSerializer(
+            data=[{k: v for k, v in op.items() if k not in ("op", "id")} for op in updates],
+            many=True,
+            partial=True,
+        )
+        update_serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            existing = BudgetLineItem.objects.select_for_update().in_bulk(target_ids)
+            missing = [
+                item_id
+                for item_id in target_ids
+                if item_id not in existing
+                or existing[item_id].event_budget_category_id != cat.id
+                or existing[item_id].is_deleted
+            ]
+            if missing:
+                return Response(
+                    {"data": None, "error": f"Unknown line items: {missing}"}, status=404
+                )
+            before = [copy.copy(item) for item in existing.values()]
+
+            now = timezone.now()
+            changed_fields = {"updated_at"}
+            for op, data in zip(updates, update_serializer.validated_data):
+                item = existing[op["id"]]
+                for field, value in data.items():
+                    setattr(item, field, value)
+                changed_fields.update(data)
+                item.updated_at = now
+            for item_id in delete_ids:
+                existing[item_id].is_deleted = True
+                existing[item_id].updated_at = now
+            if delete_ids:
+                changed_fields.add("is_deleted")
+
+            created = BudgetLineItem.objects.bulk_create(
+                [
+                    BudgetLineItem(event_budget_category=cat, created_by=request.user, **data)
+                    for data in create_serializer.validated_data
+                ]
+            )
+            if existing:
+                BudgetLineItem.objects.bulk_update(
+                    list(existing.values()), sorted(changed_fields)
+                )
+            # bulk_* skip save() and the model signals.
+            rollups.shift_for_bulk_write(before, created + list(existing.values()))
+            versioning.bump(couple_id, "budget")
+            dashboard.refresh_sections(couple_id, "budget")
+
+        return Response(
+            {
+                "data": {
+                    "created": BudgetLineItemSerializer(created, many=True).data,
+                    "updated": BudgetLineItemSerializer(
+                        [existing[op["id"]] for op in updates], many=True
+                    ).data,
+                    "deleted": delete_ids,
+                },
+                "error": None,
+            }
+        )
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the line back to ``csv.writer``."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_safe(value):
+    # Stop spreadsheet apps from evaluating user-entered text as a formula.
+    if isinstance(value, str) and value[:1] in ("=", "+", "-", "@", "\t", "\r"):
+        return "'" + value
+    return value
+
+
+BUDGET_EXPORT_COLUMNS = (
+    "event_id",
+    "event",
+    "currency",
+    "category",
+    "line_item_id",
+    "label",
+    "planned_amount",
+    "actual_amount",
+    "paid_on",
+    "notes",
+)
+
+
+class BudgetExportView(views.APIView):
+    authentication_classes = [CoupleJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """CSV of every line item across the couple's events, streamed in chunks."""
+        couple_id = request.couple_id
+        if not couple_id:
+            return Response(
+                {"data": None, "error": "No active couple membership"}, status=404
+            )
+        rows = (
+            BudgetLineItem.objects.filter(
+                event_budget_category__event_budget__event__couple_id=couple_id,
+                event_budget_category__event_budget__event__is_deleted=False,
+                is_deleted=False,
+            )
+            .order_by(
+                "event_budget_category__event_budget__event__start_date",
+                "event_budget_category__event_budget__event_id",
+                "event_budget_category__category__sort_order",
+                "event_budget_category_id",
+                "id",
+            )
+            .values_list(
+                "event_budget_category__event_budget__event_id",
+                "event_budget_category__event_budget__event__title",
+                "event_budget_category__event_budget__currency_code",
+                "event_budget_category__category__label",
+                "id",
+                "label",
+                "planned_amount",
+                "actual_amount",
+                "paid_on",
+                "notes",
+            )
+            .iterator(chunk_size=settings.BUDGET_EXPORT_CHUNK_SIZE)
+        )
+        writer = csv.writer(_Echo())
+
+        def stream():
+            yield writer.writerow(BUDGET_EXPORT_COLUMNS)
+            for row in rows:
+                yield writer.writerow([_csv_safe(value) for value in row])
+
+        response = StreamingHttpResponse(stream(), content_type="text/csv")
+        response["Content-Disposition"] = 'attachment; filename="budget.csv"'
+        return response
+
+
 class HoneymoonPlanView(views.APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CoupleJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request, event_id):
-        couple_id = _active_couple_id(request.user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response(
                 {"data": None, "error": "No active couple membership"}, status=404
@@ -330,7 +559,7 @@ class HoneymoonPlanView(views.APIView):
         return Response({"data": HoneymoonPlanSerializer(plan).data, "error": None})
 
     def post(self, request, event_id):
-        couple_id = _active_couple_id(request.user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response(
                 {"data": None, "error": "No active couple membership"}, status=404
@@ -351,11 +580,11 @@ class HoneymoonPlanView(views.APIView):
 
 
 class HoneymoonItemView(views.APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CoupleJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request, plan_id):
-        couple_id = _active_couple_id(request.user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response(
                 {"data": None, "error": "No active couple membership"}, status=404
@@ -374,13 +603,12 @@ class HoneymoonItemView(views.APIView):
 
 
 class MediaUploadView(views.APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CoupleJWTAuthentication]
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
 
     def post(self, request):
-        user = request.user
-        couple_id = _active_couple_id(user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response(
                 {"data": None, "error": "No active couple membership"}, status=404
@@ -390,30 +618,283 @@ class MediaUploadView(views.APIView):
         if not file_obj:
             return Response({"data": None, "error": "file is required"}, status=400)
 
-        storage = FileSystemStorage(location=settings.MEDIA_ROOT)
-        filename = storage.save(file_obj.name, file_obj)
-        url = request.build_absolute_uri(settings.MEDIA_URL + filename)
+        try:
+            media, created = store_media(
+                request,
+                couple_id,
+                file_obj,
+                file_obj.name,
+                file_obj.content_type,
+                file_obj.size,
+            )
+        except quota.QuotaExceeded as exc:
+            return Response({"data": None, "error": str(exc)}, status=413)
+        return Response(
+            {"data": MediaFileSerializer(media).data, "error": None},
+            status=201 if created else 200,
+        )
+
+
+class MediaUsageView(views.APIView):
+    authentication_classes = [CoupleJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        couple_id = request.couple_id
+        if not couple_id:
+            return Response(
+                {"data": None, "error": "No active couple membership"}, status=404
+            )
+        return Response(
+            {
+                "data": {
+                    "bytes_used": quota.bytes_used(couple_id),
+                    "quota_bytes": settings.MEDIA_COUPLE_QUOTA_BYTES or None,
+                },
+                "error": None,
+            }
+        )
+
+
+class MediaBatchUploadView(views.APIView):
+    authentication_classes = [CoupleJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        """Multipart body: files (repeated), event_id? to add them to its mood board."""
+        couple_id = request.couple_id
+        if not couple_id:
+            return Response(
+                {"data": None, "error": "No active couple membership"}, status=404
+            )
+
+        files = request.FILES.getlist("files")
+        if not files:
+            return Response({"data": None, "error": "files are required"}, status=400)
+        if len(files) > settings.MEDIA_BATCH_UPLOAD_MAX_FILES:
+            return Response(
+                {
+                    "data": None,
+                    "error": f"At most {settings.MEDIA_BATCH_UPLOAD_MAX_FILES} files per request",
+                },
+                status=400,
+            )
+
+        board = None
+        event_id = request.data.get("event_id")
+        if event_id:
+            event = None
+            if str(event_id).isdigit():
+                event = Event.objects.filter(
+                    id=event_id, couple_id=couple_id, is_deleted=False
+                ).first()
+            if event is None:
+                return Response({"data": None, "error": "Event not found"}, status=404)
+            board, _ = MoodBoard.objects.get_or_create(
+                event=event, defaults={"is_enabled": True}
+            )
+
+        try:
+            media, items, created = store_media_batch(request, couple_id, files, board)
+        except quota.QuotaExceeded as exc:
+            return Response({"data": None, "error": str(exc)}, status=413)
+        return Response(
+            {
+                "data": {
+                    "media": MediaFileSerializer(media, many=True).data,
+                    "items": MoodBoardItemSerializer(items, many=True).data,
+                },
+                "error": None,
+            },
+            status=201 if created else 200,
+        )
+
+
+class _AnyAccept(DefaultContentNegotiation):
+    """Browsers ask for media with image/video ``Accept`` headers; errors are JSON anyway."""
 
-        media = MediaFile.objects.create(
-            couple_id=couple_id,
-            storage_key=filename,
-            url=url,
-            mime_type=file_obj.content_type or "",
-            size_bytes=file_obj.size,
-            uploaded_by=user,
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class MediaContentView(views.APIView):
+    """The bytes of a media file, or of one of its derivatives (see planner.serving)."""
+
+    authentication_classes = [CoupleJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    content_negotiation_class = _AnyAccept
+
+    def get(self, request, media_id, derivative_id=None):
+        couple_id = request.couple_id
+        if not couple_id:
+            return Response(
+                {"data": None, "error": "No active couple membership"}, status=404
+            )
+        media = MediaFile.objects.filter(id=media_id, couple_id=couple_id).first()
+        if media is None:
+            return Response({"data": None, "error": "Not found"}, status=404)
+        if derivative_id is None:
+            key, mime_type = media.storage_key, media.mime_type
+            version = media.sha256 or f"{media.id}-{media.size_bytes}"
+        else:
+            derivative = media.derivatives.filter(id=derivative_id).first()
+            if derivative is None:
+                return Response({"data": None, "error": "Not found"}, status=404)
+            key, mime_type = derivative.storage_key, derivative.mime_type
+            version = f"{media.id}-{derivative.id}-{derivative.size_bytes}"
+        response = serving.serve(request, key, mime_type, version)
+        if response is None:
+            return Response({"data": None, "error": "Not found"}, status=404)
+        return response
+
+
+class MediaSignedContentView(views.APIView):
+    """Media by storage key for URLs signed by ``planner.storage`` (e.g. a CDN origin)."""
+
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    content_negotiation_class = _AnyAccept
+
+    def get(self, request, storage_key):
+        if not storage.verify(
+            storage_key, request.GET.get("expires"), request.GET.get("signature")
+        ):
+            return Response({"data": None, "error": "Invalid or expired signature"}, status=403)
+        # The recorded type: the key's extension is whatever the uploader chose.
+        mime_type = (
+            MediaFile.objects.filter(storage_key=storage_key)
+            .values_list("mime_type", flat=True)
+            .first()
+        ) or (
+            MediaDerivative.objects.filter(storage_key=storage_key)
+            .values_list("mime_type", flat=True)
+            .first()
         )
+        # Keys never change content, so the key itself is the version.
+        response = serving.serve(request, storage_key, mime_type, storage_key, public=True)
+        if response is None:
+            return Response({"data": None, "error": "Not found"}, status=404)
+        return response
+
+
+def _upload_error(exc):
+    data = {"offset": exc.offset} if exc.offset is not None else None
+    return Response({"data": data, "error": str(exc)}, status=exc.status)
+
+
+def _upload_session_data(session):
+    return {
+        "id": str(session.id),
+        "filename": session.filename,
+        "size": session.size_bytes,
+        "offset": session.received_bytes,
+        "status": session.status,
+        "max_chunk_bytes": settings.MEDIA_UPLOAD_MAX_CHUNK_BYTES,
+        "expires_at": session.expires_at,
+    }
+
+
+class UploadSessionListView(views.APIView):
+    authentication_classes = [CoupleJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """Body: { filename, size, mime_type? }; see planner.uploads."""
+        couple_id = request.couple_id
+        if not couple_id:
+            return Response(
+                {"data": None, "error": "No active couple membership"}, status=404
+            )
+        try:
+            session = uploads.create_session(
+                couple_id,
+                request.user,
+                request.data.get("filename"),
+                request.data.get("size"),
+                request.data.get("mime_type"),
+            )
+        except uploads.UploadError as exc:
+            return _upload_error(exc)
+        return Response({"data": _upload_session_data(session), "error": None}, status=201)
+
+
+class UploadSessionView(views.APIView):
+    authentication_classes = [CoupleJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    # Chunk bodies are raw bytes read straight from the request stream.
+    parser_classes = []
+
+    def get(self, request, session_id):
+        couple_id = request.couple_id
+        if not couple_id:
+            return Response(
+                {"data": None, "error": "No active couple membership"}, status=404
+            )
+        try:
+            session = uploads.get_session(session_id, couple_id)
+        except uploads.UploadError as exc:
+            return _upload_error(exc)
+        return Response({"data": _upload_session_data(session), "error": None})
+
+    def put(self, request, session_id):
+        couple_id = request.couple_id
+        if not couple_id:
+            return Response(
+                {"data": None, "error": "No active couple membership"}, status=404
+            )
+        try:
+            session = uploads.append_chunk(
+                session_id, couple_id, request.META.get("HTTP_CONTENT_RANGE"), request.stream
+            )
+        except uploads.UploadError as exc:
+            return _upload_error(exc)
+        return Response({"data": _upload_session_data(session), "error": None})
+
+    def delete(self, request, session_id):
+        couple_id = request.couple_id
+        if not couple_id:
+            return Response(
+                {"data": None, "error": "No active couple membership"}, status=404
+            )
+        try:
+            uploads.discard(session_id, couple_id)
+        except uploads.UploadError as exc:
+            return _upload_error(exc)
+        return Response({"data": {"deleted": True}, "error": None})
+
+
+class UploadSessionFinalizeView(views.APIView):
+    authentication_classes = [CoupleJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, session_id):
+        """Body: { sha256? } -- the expected hex digest of the whole file."""
+        couple_id = request.couple_id
+        if not couple_id:
+            return Response(
+                {"data": None, "error": "No active couple membership"}, status=404
+            )
+        try:
+            media, created = uploads.finalize(
+                request, session_id, couple_id, request.data.get("sha256")
+            )
+        except uploads.UploadError as exc:
+            return _upload_error(exc)
         return Response(
-            {"data": MediaFileSerializer(media).data, "error": None}, status=201
+            {"data": MediaFileSerializer(media).data, "error": None},
+            status=201 if created else 200,
         )
 
 
 class MoodBoardView(views.APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CoupleJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
+    @versioning.conditional("events", "moodboard", extra=lambda: (storage.url_version(),))
     def get(self, request, event_id):
         user = request.user
-        couple_id = _active_couple_id(user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response(
                 {"data": None, "error": "No active couple membership"}, status=404
@@ -430,16 +911,17 @@ class MoodBoardView(views.APIView):
         board = MoodBoard.objects.prefetch_related(
             Prefetch(
                 "items",
-                queryset=MoodBoardItem.objects.filter(is_deleted=False).select_related(
-                    "media"
-                ),
+                queryset=MoodBoardItem.objects.filter(is_deleted=False)
+                .order_by("position", "id")
+                .select_related("media")
+                .prefetch_related("media__derivatives"),
             )
         ).get(id=board.id)
         return Response({"data": MoodBoardSerializer(board).data, "error": None})
 
     def post(self, request, event_id):
         user = request.user
-        couple_id = _active_couple_id(user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response(
                 {"data": None, "error": "No active couple membership"}, status=404
@@ -452,19 +934,174 @@ class MoodBoardView(views.APIView):
 
         serializer = MoodBoardItemSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        item = serializer.save(mood_board=board, created_by=user)
+        item = serializer.save(
+            mood_board=board,
+            created_by=user,
+            position=ranking.after(ranking.last(board.id)),
+        )
         return Response(
             {"data": MoodBoardItemSerializer(item).data, "error": None}, status=201
         )
 
 
+class MoodBoardOrderView(views.APIView):
+    authentication_classes = [CoupleJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def put(self, request, event_id):
+        """Body: item_ids, every live item on the board in the new order."""
+        couple_id = request.couple_id
+        if not couple_id:
+            return Response(
+                {"data": None, "error": "No active couple membership"}, status=404
+            )
+        board = get_object_or_404(
+            MoodBoard, event_id=event_id, event__couple_id=couple_id, event__is_deleted=False
+        )
+        item_ids = request.data.get("item_ids")
+        if not isinstance(item_ids, list) or not all(
+            isinstance(item_id, int) for item_id in item_ids
+        ):
+            return Response(
+                {"data": None, "error": "item_ids must be a list of item ids"}, status=400
+            )
+        items = ranking.reorder(board.id, item_ids)
+        if items is None:
+            return Response(
+                {"data": None, "error": "item_ids must list every item on the board once"},
+                status=400,
+            )
+        # bulk_update skips the model signals.
+        versioning.bump(couple_id, "moodboard")
+        return Response(
+            {
+                "data": [{"id": item.id, "position": item.position} for item in items],
+                "error": None,
+            }
+        )
+
+
+class GalleryView(views.APIView):
+    authentication_classes = [CoupleJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @versioning.conditional("events", "moodboard", extra=lambda: (storage.url_version(),))
+    def get(self, request):
+        """Mood board images across events, newest first.
+
+        Query: limit, cursor (``next_cursor`` of the previous page), event_id.
+        """
+        couple_id = request.couple_id
+        if not couple_id:
+            return Response(
+                {"data": None, "error": "No active couple membership"}, status=404
+            )
+        limit = request.query_params.get("limit", str(settings.GALLERY_PAGE_SIZE))
+        if not limit.isdigit() or not 1 <= int(limit) <= settings.GALLERY_MAX_PAGE_SIZE:
+            return Response(
+                {
+                    "data": None,
+                    "error": f"limit must be an integer from 1 to {settings.GALLERY_MAX_PAGE_SIZE}",
+                },
+                status=400,
+            )
+        event_id = request.query_params.get("event_id")
+        if event_id is not None and not event_id.isdigit():
+            return Response({"data": None, "error": "event_id must be an integer"}, status=400)
+        try:
+            rows, next_cursor = gallery.page(
+                couple_id,
+                int(limit),
+                cursor=request.query_params.get("cursor") or None,
+                event_id=int(event_id) if event_id else None,
+            )
+        except ValueError as exc:
+            return Response({"data": None, "error": str(exc)}, status=400)
+        return Response(
+            {"data": {"items": rows, "next_cursor": next_cursor}, "error": None}
+        )
+
+
+def _similarity_threshold(request):
+    raw = request.query_params.get("threshold")
+    if raw is None:
+        return settings.MEDIA_SIMILARITY_THRESHOLD
+    if not raw.isdigit() or int(raw) > 64:
+        return None
+    return int(raw)
+
+
+class MoodBoardSimilarView(views.APIView):
+    authentication_classes = [CoupleJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @versioning.conditional("events", "moodboard")
+    def get(self, request):
+        """Clusters of near-duplicate images on the couple's mood boards.
+
+        Query: threshold (bits, 0-64), event_id to look at one board.
+        """
+        couple_id = request.couple_id
+        if not couple_id:
+            return Response(
+                {"data": None, "error": "No active couple membership"}, status=404
+            )
+        threshold = _similarity_threshold(request)
+        if threshold is None:
+            return Response(
+                {"data": None, "error": "threshold must be an integer from 0 to 64"}, status=400
+            )
+        event_id = request.query_params.get("event_id")
+        if event_id is not None and not event_id.isdigit():
+            return Response({"data": None, "error": "event_id must be an integer"}, status=400)
+        groups = similarity.clusters(
+            couple_id, threshold, int(event_id) if event_id else None
+        )
+        return Response(
+            {"data": {"threshold": threshold, "clusters": groups}, "error": None}
+        )
+
+
+class MediaSimilarView(views.APIView):
+    authentication_classes = [CoupleJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @versioning.conditional("events", "moodboard")
+    def get(self, request, media_id):
+        """Mood board items that look like this image, closest first. Query: threshold."""
+        couple_id = request.couple_id
+        if not couple_id:
+            return Response(
+                {"data": None, "error": "No active couple membership"}, status=404
+            )
+        media = MediaFile.objects.filter(id=media_id, couple_id=couple_id).first()
+        if media is None:
+            return Response({"data": None, "error": "Not found"}, status=404)
+        threshold = _similarity_threshold(request)
+        if threshold is None:
+            return Response(
+                {"data": None, "error": "threshold must be an integer from 0 to 64"}, status=400
+            )
+        matches = []
+        if media.dhash is not None:
+            matches = similarity.similar_to(
+                couple_id, media.dhash, threshold, exclude_media_id=media.id
+            )
+        return Response(
+            {
+                "data": {"hashed": media.dhash is not None, "threshold": threshold, "matches": matches},
+                "error": None,
+            }
+        )
+
+
 class MoodBoardItemDeleteView(views.APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CoupleJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def delete(self, request, item_id):
         user = request.user
-        couple_id = _active_couple_id(user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response(
                 {"data": None, "error": "No active couple membership"}, status=404
@@ -483,12 +1120,132 @@ class MoodBoardItemDeleteView(views.APIView):
         return Response({"data": {"deleted": True}, "error": None})
 
 
+class MoodBoardItemMoveView(views.APIView):
+    authentication_classes = [CoupleJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, item_id):
+        """Body: after_id and/or before_id, the items to land between."""
+        couple_id = request.couple_id
+        if not couple_id:
+            return Response(
+                {"data": None, "error": "No active couple membership"}, status=404
+            )
+        item = MoodBoardItem.objects.filter(
+            id=item_id,
+            is_deleted=False,
+            mood_board__event__couple_id=couple_id,
+            mood_board__event__is_deleted=False,
+        ).first()
+        if item is None:
+            return Response({"data": None, "error": "Not found"}, status=404)
+
+        neighbours = {}
+        for field in ("after_id", "before_id"):
+            value = request.data.get(field)
+            if value is None:
+                continue
+            if not isinstance(value, int) or value == item.id:
+                return Response(
+                    {"data": None, "error": f"{field} must be another item's id"}, status=400
+                )
+            neighbours[field] = MoodBoardItem.objects.filter(
+                id=value, mood_board_id=item.mood_board_id, is_deleted=False
+            ).first()
+            if neighbours[field] is None:
+                return Response(
+                    {"data": None, "error": f"{field} is not on this mood board"}, status=400
+                )
+        if not neighbours:
+            return Response(
+                {"data": None, "error": "after_id or before_id is required"}, status=400
+            )
+        try:
+            ranking.move(
+                item,
+                place_after=neighbours.get("after_id"),
+                place_before=neighbours.get("before_id"),
+            )
+        except ValueError as exc:
+            return Response({"data": None, "error": str(exc)}, status=400)
+        # One-row update: no signals, and the dashboard does not show order.
+        versioning.bump(couple_id, "moodboard")
+        return Response({"data": {"id": item.id, "position": item.position}, "error": None})
+
+
+class MoodBoardItemReactionView(views.APIView):
+    authentication_classes = [CoupleJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def _item(self, request, item_id):
+        return MoodBoardItem.objects.filter(
+            id=item_id,
+            is_deleted=False,
+            mood_board__event__couple_id=request.couple_id,
+            mood_board__event__is_deleted=False,
+        ).first()
+
+    def _data(self, request, item_id):
+        item = MoodBoardItem.objects.only("reaction_counts").get(id=item_id)
+        mine = MoodBoardReaction.objects.filter(
+            mood_board_item_id=item_id, user=request.user
+        ).values_list("reaction_type", flat=True)
+        return {
+            "id": item_id,
+            "reaction_counts": item.reaction_counts,
+            "my_reactions": sorted(mine),
+        }
+
+    def post(self, request, item_id):
+        """Body: reaction_type (one of ``MOODBOARD_REACTION_TYPES``)."""
+        if not request.couple_id:
+            return Response(
+                {"data": None, "error": "No active couple membership"}, status=404
+            )
+        item = self._item(request, item_id)
+        if item is None:
+            return Response({"data": None, "error": "Not found"}, status=404)
+        reaction_type = request.data.get("reaction_type", "heart")
+        if reaction_type not in settings.MOODBOARD_REACTION_TYPES:
+            return Response(
+                {
+                    "data": None,
+                    "error": "reaction_type must be one of "
+                    + ", ".join(settings.MOODBOARD_REACTION_TYPES),
+                },
+                status=400,
+            )
+        _, created = MoodBoardReaction.objects.get_or_create(
+            mood_board_item=item, user=request.user, reaction_type=reaction_type
+        )
+        return Response(
+            {"data": self._data(request, item.id), "error": None},
+            status=201 if created else 200,
+        )
+
+    def delete(self, request, item_id, reaction_type):
+        if not request.couple_id:
+            return Response(
+                {"data": None, "error": "No active couple membership"}, status=404
+            )
+        item = self._item(request, item_id)
+        if item is None:
+            return Response({"data": None, "error": "Not found"}, status=404)
+        # Deleting instances (not the queryset) runs the signals that keep
+        # the counts current.
+        for reaction in MoodBoardReaction.objects.filter(
+            mood_board_item=item, user=request.user, reaction_type=reaction_type
+        ):
+            reaction.delete()
+        return Response({"data": self._data(request, item.id), "error": None})
+
+
 class CommentView(views.APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CoupleJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        couple_id = _active_couple_id(request.user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response({"data": [], "error": None})
         target_type = request.query_params.get("target_type")
@@ -508,7 +1265,7 @@ class CommentView(views.APIView):
         )
 
     def post(self, request):
-        couple_id = _active_couple_id(request.user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response(
                 {"data": None, "error": "No active couple membership"}, status=404
@@ -530,11 +1287,11 @@ class CommentView(views.APIView):
 
 
 class CommentDetailView(views.APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CoupleJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def delete(self, request, comment_id):
-        couple_id = _active_couple_id(request.user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response(
                 {"data": None, "error": "No active couple membership"}, status=404
@@ -548,11 +1305,11 @@ class CommentDetailView(views.APIView):
 
 
 class ActivityLogView(views.APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CoupleJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        couple_id = _active_couple_id(request.user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response({"data": [], "error": None})
         limit = int(request.query_params.get("limit", 50))
@@ -564,7 +1321,7 @@ class ActivityLogView(views.APIView):
         )
 
     def post(self, request):
-        couple_id = _active_couple_id(request.user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response(
                 {"data": None, "error": "No active couple membership"}, status=404
@@ -582,11 +1339,12 @@ class ActivityLogView(views.APIView):
 
 
 class TaskListView(views.APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CoupleJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
+    @versioning.conditional("tasks")
     def get(self, request):
-        couple_id = _active_couple_id(request.user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response({"data": [], "error": None})
         event_id = request.query_params.get("event_id")
@@ -597,7 +1355,7 @@ class TaskListView(views.APIView):
         return Response({"data": TaskSerializer(tasks, many=True).data, "error": None})
 
     def post(self, request):
-        couple_id = _active_couple_id(request.user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response(
                 {"data": None, "error": "No active couple membership"}, status=404
@@ -612,11 +1370,11 @@ class TaskListView(views.APIView):
 
 
 class TaskDetailView(views.APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CoupleJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def patch(self, request, task_id):
-        couple_id = _active_couple_id(request.user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response(
                 {"data": None, "error": "No active couple membership"}, status=404
@@ -628,7 +1386,7 @@ class TaskDetailView(views.APIView):
         return Response({"data": TaskSerializer(task).data, "error": None})
 
     def delete(self, request, task_id):
-        couple_id = _active_couple_id(request.user.id)
+        couple_id = request.couple_id
         if not couple_id:
             return Response(
                 {"data": None, "error": "No active couple membership"}, status=404
@@ -639,7 +1397,7 @@ class TaskDetailView(views.APIView):
 
 
 class NotificationListView(views.APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CoupleJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
@@ -662,124 +1420,50 @@ class NotificationListView(views.APIView):
         return Response({"data": {"updated": len(ids)}, "error": None})
 
 
-class DashboardSummaryView(views.APIView):
-    authentication_classes = [JWTAuthentication]
+class BudgetSpendAnalyticsView(views.APIView):
+    authentication_classes = [CoupleJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        couple_id = _active_couple_id(request.user.id)
+        """Query: ?bucket=week|month (default month)."""
+        couple_id = request.couple_id
         if not couple_id:
             return Response(
-                {
-                    "data": {
-                        "couple_name": None,
-                        "upcoming_events": [],
-                        "budget": {"planned": "0.00", "spent": "0.00"},
-                        "honeymoon": None,
-                        "moodboard_highlights": [],
-                        "recent_activity": [],
-                    },
-                    "error": None,
-                }
-            )
-
-        today = timezone.now().date()
-        events = (
-            Event.objects.filter(couple_id=couple_id, is_active=True, is_deleted=False)
-            .select_related("event_type")
-            .order_by("start_date")
-        )
-        upcoming = [
-            {
-                "id": e.id,
-                "title": e.title or e.event_type.name_en,
-                "event_type": e.event_type.key,
-                "start_date": e.start_date,
-                "end_date": e.end_date,
-            }
-            for e in events.filter(start_date__gte=today)[:5]
-        ]
-
-        budget_totals = EventBudgetCategory.objects.filter(
-            event_budget__event__couple_id=couple_id
-        ).aggregate(planned=Sum("planned_amount"), spent=Sum("spent_amount"))
-        budget_summary = {
-            "planned": str(budget_totals.get("planned") or 0),
-            "spent": str(budget_totals.get("spent") or 0),
-        }
-
-        honeymoon = (
-            HoneymoonPlan.objects.filter(
-                event__couple_id=couple_id, event__is_deleted=False
+                {"data": None, "error": "No active couple membership"}, status=404
             )
-            .select_related("event")
-            .order_by("-updated_at")
-            .first()
-        )
-        honeymoon_summary = (
-            {
-                "id": honeymoon.id,
-                "event_id": honeymoon.event_id,
-                "destination_country": honeymoon.destination_country,
-                "destination_city": honeymoon.destination_city,
-                "start_date": honeymoon.start_date,
-                "end_date": honeymoon.end_date,
-                "total_planned": honeymoon.total_planned,
-                "total_spent": honeymoon.total_spent,
-            }
-            if honeymoon
-            else None
+        bucket = request.query_params.get("bucket", "month")
+        if bucket not in analytics.BUCKETS:
+            return Response(
+                {"data": None, "error": "bucket must be week or month"}, status=400
+            )
+        return Response(
+            {"data": analytics.spend_analytics(couple_id, bucket), "error": None}
         )
 
-        mood_items = (
-            MoodBoardItem.objects.filter(
-                mood_board__event__couple_id=couple_id,
-                mood_board__event__is_deleted=False,
-                is_deleted=False,
+
+class BudgetForecastView(views.APIView):
+    authentication_classes = [CoupleJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        couple_id = request.couple_id
+        if not couple_id:
+            return Response(
+                {"data": None, "error": "No active couple membership"}, status=404
             )
-            .select_related("media", "mood_board__event")
-            .order_by("-created_at")[:5]
-        )
-        moodboard_highlights = [
-            {
-                "id": item.id,
-                "event_id": item.mood_board.event_id,
-                "caption": item.caption,
-                "media_url": item.media.url,
-                "created_at": item.created_at,
-            }
-            for item in mood_items
-        ]
+        return Response({"data": forecast.couple_forecast(couple_id), "error": None})
 
-        activity = ActivityLog.objects.filter(couple_id=couple_id).order_by(
-            "-created_at"
-        )[:10]
-        activity_items = [
-            {
-                "id": a.id,
-                "verb": a.verb,
-                "actor_id": a.actor_id,
-                "target_type": a.content_type.model if a.content_type else None,
-                "target_id": a.object_id,
-                "metadata": a.metadata,
-                "created_at": a.created_at,
-            }
-            for a in activity
-        ]
 
-        couple = Couple.objects.filter(id=couple_id).first()
-        couple_name = couple.name if couple else None
+class DashboardSummaryView(views.APIView):
+    authentication_classes = [CoupleJWTAuthentication]
+    permission_classes = [IsAuthenticated]
 
-        return Response(
-            {
-                "data": {
-                    "couple_name": couple_name,
-                    "upcoming_events": upcoming,
-                    "budget": budget_summary,
-                    "honeymoon": honeymoon_summary,
-                    "moodboard_highlights": moodboard_highlights,
-                    "recent_activity": activity_items,
-                },
-                "error": None,
-            }
-        )
+    @versioning.conditional(
+        "total",
+        extra=lambda: (timezone.now().date(), currency.rates_version(), storage.url_version()),
+    )
+    def get(self, request):
+        couple_id = request.couple_id
+        if not couple_id:
+            return Response({"data": dict(dashboard.EMPTY_SUMMARY), "error": None})
+        return Response({"data": dashboard.get_summary(couple_id), "error": None})
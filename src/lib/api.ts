@@ -374,7 +374,8 @@ export type MoodBoardItem = {
   media: MediaFile;
   media_id?: number;
   caption: string;
-  position: number | null;
+  position: string;
+  reaction_counts: Record<string, number>;
   created_by: number | null;
   created_at: string;
 };
@@ -390,6 +391,31 @@ export async function fetchMoodboard(token: string | null, eventId: number) {
   return request<MoodBoard>(`/moodboard/${eventId}/`, { token });
 }
 
+export type GalleryItem = {
+  id: number;
+  event_id: number;
+  caption: string;
+  media_id: number;
+  mime_type: string;
+  url: string;
+  srcset: Record<string, string>;
+  width: number | null;
+  height: number | null;
+  placeholder: string;
+  reaction_counts: Record<string, number>;
+  created_at: string;
+};
+
+export type GalleryFeedPage = {
+  items: GalleryItem[];
+  next_cursor: string | null;
+};
+
+export async function fetchGallery(token: string | null, cursor?: string | null) {
+  const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+  return request<GalleryFeedPage>(`/gallery/${query}`, { token });
+}
+
 export async function uploadMedia(token: string | null, file: File) {
   const formData = new FormData();
   formData.append("file", file);
@@ -406,7 +432,6 @@ export async function createMoodboardItem(
   data: {
     media_id: number;
     caption?: string;
-    position?: number;
   }
 ) {
   return request<MoodBoardItem>(`/moodboard/${eventId}/`, {
@@ -416,6 +441,47 @@ export async function createMoodboardItem(
   });
 }
 
+export async function moveMoodboardItem(
+  token: string | null,
+  itemId: number,
+  data: { after_id?: number; before_id?: number }
+) {
+  return request<{ id: number; position: string }>(`/moodboard/items/${itemId}/move/`, {
+    method: "POST",
+    token,
+    body: data,
+  });
+}
+
+export type MoodBoardReactions = {
+  id: number;
+  reaction_counts: Record<string, number>;
+  my_reactions: string[];
+};
+
+export async function addMoodboardReaction(token: string | null, itemId: number, reactionType = "heart") {
+  return request<MoodBoardReactions>(`/moodboard/items/${itemId}/reactions/`, {
+    method: "POST",
+    token,
+    body: { reaction_type: reactionType },
+  });
+}
+
+export async function removeMoodboardReaction(token: string | null, itemId: number, reactionType = "heart") {
+  return request<MoodBoardReactions>(`/moodboard/items/${itemId}/reactions/${reactionType}/`, {
+    method: "DELETE",
+    token,
+  });
+}
+
+export async function reorderMoodboard(token: string | null, eventId: number, itemIds: number[]) {
+  return request<{ id: number; position: string }[]>(`/moodboard/${eventId}/order/`, {
+    method: "PUT",
+    token,
+    body: { item_ids: itemIds },
+  });
+}
+
 export async function deleteMoodboardItem(token: string | null, itemId: number) {
   return request<{ deleted: boolean }>(`/moodboard/items/${itemId}/`, {
     method: "DELETE",
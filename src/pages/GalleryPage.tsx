@@ -4,7 +4,7 @@ import { ImageWithFallback } from '../components/figma/ImageWithFallback';
 import { X, Heart, Download, Loader2 } from 'lucide-react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
-import { fetchAllEvents, fetchMoodboard, type ApiEvent, type MoodBoardItem } from '../lib/api';
+import { fetchAllEvents, fetchGallery, type ApiEvent, type GalleryItem as ApiGalleryItem } from '../lib/api';
 
 type GalleryItem = {
   id: number;
@@ -13,6 +13,9 @@ type GalleryItem = {
   eventName: string;
   eventType: string;
   caption: string;
+  width: number | null;
+  height: number | null;
+  placeholder: string;
 };
 
 export function GalleryPage() {
@@ -23,8 +26,41 @@ export function GalleryPage() {
   const [galleryItems, setGalleryItems] = useState<GalleryItem[]>([]);
   const [events, setEvents] = useState<ApiEvent[]>([]);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [error, setError] = useState<string | null>(null);
 
+  function toGalleryItems(items: ApiGalleryItem[], eventList: ApiEvent[]): GalleryItem[] {
+    return items.map((item) => {
+      const event = eventList.find((e) => e.id === item.event_id);
+      return {
+        id: item.id,
+        src: item.url,
+        eventId: item.event_id,
+        eventName: event ? event.title || event.event_type.name_en : '',
+        eventType: event ? event.event_type.key : '',
+        caption: item.caption || '',
+        width: item.width,
+        height: item.height,
+        placeholder: item.placeholder,
+      };
+    });
+  }
+
+  async function loadMore() {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const page = await fetchGallery(accessToken, nextCursor);
+      setGalleryItems((current) => [...current, ...toGalleryItems(page.items, events)]);
+      setNextCursor(page.next_cursor);
+    } catch (err) {
+      setError(err instanceof Error ? err.message : 'Failed to load gallery');
+    } finally {
+      setLoadingMore(false);
+    }
+  }
+
   useEffect(() => {
     if (authLoading) return;
     if (!accessToken) {
@@ -37,30 +73,13 @@ export function GalleryPage() {
         setLoading(true);
         setError(null);
         
-        const eventsData = await fetchAllEvents(accessToken);
+        const [eventsData, page] = await Promise.all([
+          fetchAllEvents(accessToken),
+          fetchGallery(accessToken),
+        ]);
         setEvents(eventsData);
-        
-        // Fetch moodboard items for all events
-        const allItems: GalleryItem[] = [];
-        for (const event of eventsData) {
-          try {
-            const moodboard = await fetchMoodboard(accessToken, event.id);
-            for (const item of moodboard.items) {
-              allItems.push({
-                id: item.id,
-                src: item.media.url,
-                eventId: event.id,
-                eventName: event.title || event.event_type.name_en,
-                eventType: event.event_type.key,
-                caption: item.caption || '',
-              });
-            }
-          } catch (err) {
-            // Skip events without moodboards
-          }
-        }
-        
-        setGalleryItems(allItems);
+        setGalleryItems(toGalleryItems(page.items, eventsData));
+        setNextCursor(page.next_cursor);
       } catch (err) {
         setError(err instanceof Error ? err.message : 'Failed to load gallery');
       } finally {
@@ -149,10 +168,16 @@ export function GalleryPage() {
                 onClick={() => setFullscreenImage(image)}
                 className="group relative break-inside-avoid mb-6 w-full"
               >
-                <div className="rounded-2xl overflow-hidden shadow-soft group-hover:shadow-medium transition-all aspect-square">
+                <div
+                  className="rounded-2xl overflow-hidden shadow-soft group-hover:shadow-medium transition-all aspect-square bg-cover bg-center"
+                  style={image.placeholder ? { backgroundImage: `url(${image.placeholder})` } : undefined}
+                >
                   <ImageWithFallback
                     src={image.src}
                     alt={image.caption || `${image.eventName} inspiration`}
+                    width={image.width ?? undefined}
+                    height={image.height ?? undefined}
+                    loading="lazy"
                     className="w-full h-full object-cover group-hover:scale-105 transition-transform duration-300"
                   />
                 </div>
@@ -163,6 +188,19 @@ export function GalleryPage() {
             ))}
           </div>
         )}
+
+        {nextCursor && (
+          <div className="mt-8 flex justify-center">
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="px-6 py-3 bg-white rounded-xl shadow-soft hover:bg-grey-100 transition-colors flex items-center gap-2"
+            >
+              {loadingMore && <Loader2 className="w-4 h-4 animate-spin" />}
+              <span className="text-grey-800">Load more</span>
+            </button>
+          </div>
+        )}
       </div>
       
       {/* Fullscreen Viewer */}